@@ -0,0 +1,175 @@
+"""
+Caché en disco del audio sintetizado, direccionada por contenido.
+
+Cada entrada guarda el PCM crudo devuelto por el modelo junto con su mime_type,
+indexada por un hash de (texto, modelo, voz, temperatura, mime_type). Las
+entradas se expulsan por antigüedad de uso (LRU) cuando se supera el tamaño máximo.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO
+
+from wav_io import copy_file_data
+
+
+DEFAULT_CACHE_DIR = ".tts_cache"
+DEFAULT_CACHE_MAX_MB = 2048
+
+
+def make_cache_key(text: str, model_name: str, voice_name: str, temperature: float, mime_type: str) -> str:
+    """
+    Calcula la clave de caché (sha256) para una síntesis concreta.
+    Cualquier cambio en el texto o en la configuración de voz produce una clave distinta.
+    """
+    payload = json.dumps(
+        {
+            "text": text,
+            "model": model_name,
+            "voice": voice_name,
+            "temperature": float(temperature),
+            "mime_type": mime_type,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Caché LRU de audio PCM en disco, segura para usar desde varios hilos.
+
+    Estructura en disco:
+        {cache_dir}/{clave[:2]}/{clave}.pcm   -> PCM crudo
+        {cache_dir}/{clave[:2]}/{clave}.json  -> metadatos (mime_type, tamaño)
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # clave -> tamaño en bytes; el orden refleja el uso (el primero es el menos reciente)
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        folder = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(folder, f"{key}.pcm"), os.path.join(folder, f"{key}.json")
+
+    def _load_index(self):
+        """Reconstruye el índice LRU a partir de los archivos existentes, usando mtime como último acceso."""
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".pcm"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def open_entry(self, key: str) -> tuple[BinaryIO, int, str] | None:
+        """
+        Abre el PCM en caché para la clave dada.
+        Devuelve (archivo_abierto, tamaño, mime_type) o None si no está en caché.
+        El llamador debe cerrar el archivo; abrirlo mientras se tiene el lock evita
+        que una expulsión concurrente lo borre antes de leerlo.
+        """
+        pcm_path, meta_path = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                pcm_file = open(pcm_path, "rb")
+            except (OSError, ValueError):
+                # Entrada corrupta o borrada externamente: descartarla
+                self._remove(key)
+                return None
+
+            size = os.fstat(pcm_file.fileno()).st_size
+            if size != meta.get("size", size):
+                pcm_file.close()
+                self._remove(key)
+                return None
+
+            # Marcar como usada recientemente (en memoria y en disco para próximas ejecuciones)
+            self._index.move_to_end(key)
+            try:
+                now = time.time()
+                os.utime(pcm_path, (now, now))
+            except OSError:
+                pass
+
+            return pcm_file, size, meta["mime_type"]
+
+    def put_from_file(self, key: str, src_path: str, offset: int, size: int, mime_type: str):
+        """
+        Guarda en caché `size` bytes de PCM leídos de `src_path` a partir de `offset`
+        (típicamente el bloque data de un WAV recién escrito) con copy_file_data, sin pasar por Python.
+        Expulsa entradas antiguas si se supera el tamaño máximo.
+        """
+        if size == 0 or size > self.max_bytes:
+            return
+
+        pcm_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(pcm_path), exist_ok=True)
+
+        # Escritura atómica: primero a un temporal y luego os.replace
+        tmp_suffix = f".tmp{os.getpid()}_{threading.get_ident()}"
+        try:
+            with open(src_path, "rb") as src, open(pcm_path + tmp_suffix, "wb") as dst:
+                copy_file_data(src, offset, size, dst, 0)
+        except OSError:
+            try:
+                os.remove(pcm_path + tmp_suffix)
+            except OSError:
+                pass
+            raise
+        with open(meta_path + tmp_suffix, "w", encoding="utf-8") as f:
+            json.dump({"mime_type": mime_type, "size": size, "created": time.time()}, f)
+        os.replace(meta_path + tmp_suffix, meta_path)
+        os.replace(pcm_path + tmp_suffix, pcm_path)
+
+        with self._lock:
+            if key in self._index:
+                self._total_bytes -= self._index[key]
+            self._index[key] = size
+            self._index.move_to_end(key)
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de max_bytes. Requiere el lock."""
+        while self._total_bytes > self.max_bytes and self._index:
+            oldest_key = next(iter(self._index))
+            self._remove(oldest_key)
+
+    def _remove(self, key: str):
+        """Borra una entrada del índice y del disco. Requiere el lock."""
+        size = self._index.pop(key, 0)
+        self._total_bytes -= size
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Devuelve el número de entradas y el tamaño total ocupado."""
+        with self._lock:
+            return {"entries": len(self._index), "total_bytes": self._total_bytes}
@@ -0,0 +1,149 @@
+"""
+Codificación de los WAV de salida a formatos comprimidos (FLAC u Opus).
+
+La codificación es CPU y se ejecuta en un pool de procesos (EncoderPool): cada
+archivo individual se envía en cuanto termina su síntesis, así que se codifica
+mientras siguen los streams de la API en lugar de después. El audio se lee y se
+codifica por bloques, con memoria acotada.
+
+Opus va en contenedor Ogg, que admite encadenar streams completos (RFC 7845,
+sección 3): el archivo combinado se obtiene concatenando los segmentos ya
+codificados, sin volver a codificar. FLAC no lo admite y se codifica el WAV combinado.
+soundfile es opcional: sin él, SOUNDFILE_AVAILABLE es False y solo se puede usar WAV.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:  # pragma: no cover - depende del entorno
+    sf = None
+    SOUNDFILE_AVAILABLE = False
+
+from wav_io import copy_file_data
+
+
+OUTPUT_FORMATS = ("wav", "flac", "opus")
+FORMAT_EXTENSIONS = {"wav": ".wav", "flac": ".flac", "opus": ".opus"}
+CONCATENABLE_FORMATS = ("opus",)  # formatos cuyos archivos se pueden encadenar byte a byte
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+ENCODE_BLOCK_FRAMES = 65536
+
+# Formato -> (formato contenedor, subtipo) de libsndfile
+_SOUNDFILE_TYPES = {"flac": ("FLAC", "PCM_16"), "opus": ("OGG", "OPUS")}
+# Subtipo del WAV de origen -> subtipo FLAC con la misma profundidad (FLAC no tiene 8 bits sin signo)
+_FLAC_SUBTYPES = {"PCM_U8": "PCM_S8", "PCM_S8": "PCM_S8", "PCM_16": "PCM_16", "PCM_24": "PCM_24"}
+
+
+def encoded_path(wav_path: str, output_format: str) -> str:
+    """Ruta del archivo codificado que corresponde a `wav_path`."""
+    return os.path.splitext(wav_path)[0] + FORMAT_EXTENSIONS[output_format]
+
+
+def encode_wav_file(wav_path: str, output_path: str, output_format: str, compression_level: float | None = None) -> int:
+    """
+    Codifica `wav_path` (WAV o RF64) a `output_path` en el formato dado, por bloques,
+    y devuelve el tamaño del archivo codificado. Se escribe en un temporal que se
+    renombra al terminar, para no dejar archivos a medias.
+    compression_level (0-1) es el de libsndfile: en Opus, más alto es menos bitrate.
+    """
+    if not SOUNDFILE_AVAILABLE:
+        raise RuntimeError("La codificación a FLAC/Opus requiere soundfile (pip install soundfile)")
+    container, subtype = _SOUNDFILE_TYPES[output_format]
+    temp_path = f"{output_path}.tmp"
+    with sf.SoundFile(wav_path) as source:
+        if output_format == "opus" and source.samplerate not in OPUS_SAMPLE_RATES:
+            raise ValueError(f"Opus no admite {source.samplerate} Hz (admite {', '.join(map(str, OPUS_SAMPLE_RATES))})")
+        if output_format == "flac" and source.subtype in _FLAC_SUBTYPES:
+            subtype = _FLAC_SUBTYPES[source.subtype]  # FLAC conserva la profundidad de bits (8, 16 o 24)
+        try:
+            with sf.SoundFile(
+                temp_path, "w", source.samplerate, source.channels, subtype, format=container, compression_level=compression_level,
+            ) as target:
+                for block in source.blocks(ENCODE_BLOCK_FRAMES, dtype="float32", always_2d=True):
+                    target.write(block)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+    return os.path.getsize(output_path)
+
+
+def concatenate_encoded(paths: list[str], output_path: str) -> int:
+    """
+    Une archivos ya codificados encadenándolos byte a byte (válido para Ogg Opus:
+    cada archivo es un stream lógico completo con su propio número de serie).
+    Devuelve el tamaño del archivo resultante.
+    """
+    temp_path = f"{output_path}.tmp"
+    position = 0
+    with open(temp_path, "wb") as out:
+        for path in paths:
+            with open(path, "rb") as src:
+                position += copy_file_data(src, 0, os.fstat(src.fileno()).st_size, out, position)
+    os.replace(temp_path, output_path)
+    return position
+
+
+class EncoderPool:
+    """
+    Etapa de codificación en procesos separados, alimentada a medida que terminan las síntesis.
+
+    submit(index, wav_path) puede llamarse desde cualquier hilo; results() espera
+    a todas las codificaciones enviadas. Los procesos se crean con 'spawn' porque el
+    pipeline tiene hilos en marcha cuando arranca el pool.
+    """
+
+    def __init__(self, output_format: str, max_workers: int | None = None, compression_level: float | None = None):
+        if not SOUNDFILE_AVAILABLE:
+            raise RuntimeError("La codificación a FLAC/Opus requiere soundfile (pip install soundfile)")
+        self.output_format = output_format
+        self.compression_level = compression_level
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._futures: dict[int, tuple[str, str, Future]] = {}
+        self._futures_by_path: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, index: int, wav_path: str) -> Future:
+        """
+        Encola la codificación del WAV del índice dado (junto a él, con la extensión del
+        formato). Si otro índice ya envió el mismo archivo, se reutiliza su codificación.
+        """
+        output_path = encoded_path(wav_path, self.output_format)
+        with self._lock:
+            future = self._futures_by_path.get(wav_path)
+            if future is None:
+                future = self._executor.submit(encode_wav_file, wav_path, output_path, self.output_format, self.compression_level)
+                self._futures_by_path[wav_path] = future
+            self._futures[index] = (wav_path, output_path, future)
+        return future
+
+    def encode(self, wav_path: str) -> str:
+        """Codifica un archivo en el pool y espera al resultado; devuelve la ruta codificada."""
+        output_path = encoded_path(wav_path, self.output_format)
+        self._executor.submit(encode_wav_file, wav_path, output_path, self.output_format, self.compression_level).result()
+        return output_path
+
+    def results(self) -> list[tuple[int, str, str, BaseException | None]]:
+        """Espera a las codificaciones enviadas y devuelve (índice, wav, codificado, error) en orden de índice."""
+        with self._lock:
+            pending = sorted(self._futures.items())
+        results = []
+        for index, (wav_path, output_path, future) in pending:
+            try:
+                future.result()
+                error = None
+            except Exception as e:
+                error = e
+            results.append((index, wav_path, output_path, error))
+        return results
+
+    def shutdown(self, cancel: bool = False):
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del pipeline generar → escribir → combinar (main.py) y de join_wav.py.
+
+Genera corpus JSON sintéticos ({'id', 'title', 'content'}) de distintos tamaños,
+ejecuta main.py contra el backend simulado (--backend fake) en un proceso aparte
+y guarda los resultados en JSON para poder comparar entre commits.
+
+Ejemplos:
+  python benchmark.py pipeline --sizes 10 100 1000 --max_workers 5 10 -o pipeline.json
+  python benchmark.py join --files 10 100 --file_mb 1 10 -o join.json
+  python benchmark.py compare pipeline_antes.json pipeline.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from wav_io import WavStreamWriter
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = os.path.join(SCRIPT_DIR, "main.py")
+JOIN_SCRIPT = os.path.join(SCRIPT_DIR, "join_wav.py")
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_SECTION_CHARS = [400]
+DEFAULT_BYTES_PER_CHAR = 100  # PCM por carácter en el backend simulado; bajo para que 10.000 secciones quepan en disco
+
+_WORDS = (
+    "el la los las un una de del en con por para sobre entre desde hasta audio texto voz "
+    "documento sección capítulo análisis resumen concepto principal modelo síntesis archivo "
+    "proceso resultado tiempo ejemplo detalle contenido sistema usuario datos calidad"
+).split()
+
+
+def generate_corpus(num_sections: int, section_chars: int, seed: int = 0) -> list[dict]:
+    """Genera secciones {'id', 'title', 'content'} deterministas de unos section_chars caracteres."""
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(1, num_sections + 1):
+        sentences = []
+        length = 0
+        while length < section_chars:
+            words = rng.choices(_WORDS, k=rng.randint(6, 18))
+            sentence = " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        corpus.append({"id": str(n), "title": f"Sección {n}", "content": " ".join(sentences)[:section_chars]})
+    return corpus
+
+
+def run_measured(command: list[str], cwd: str) -> dict:
+    """
+    Ejecuta un comando en un proceso hijo y devuelve su tiempo de pared,
+    código de salida y pico de memoria residente (RSS) en MB.
+    """
+    # stderr va a un archivo temporal: con un pipe, un hijo muy verboso podría bloquearse
+    with tempfile.TemporaryFile() as stderr_file:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=stderr_file)
+        if hasattr(os, "wait4"):
+            # wait4 devuelve el uso de recursos de este hijo concreto (no el acumulado de todos)
+            _pid, status, usage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss está en KB en Linux y en bytes en macOS
+            divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+            peak_rss_mb = usage.ru_maxrss / divisor
+        else:
+            process.wait()
+            wall = time.perf_counter() - start
+            peak_rss_mb = None
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode("utf-8", "replace")
+    return {"wall_seconds": wall, "returncode": process.returncode, "peak_rss_mb": peak_rss_mb, "stderr": stderr[-2000:]}
+
+
+def git_revision() -> str | None:
+    """Devuelve el commit actual (con '-dirty' si hay cambios sin commitear), o None fuera de git."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=SCRIPT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize_runs(runs: list[dict]) -> dict:
+    """Mediana del tiempo de pared y máximo de RSS de varias repeticiones del mismo caso."""
+    walls = [run["wall_seconds"] for run in runs]
+    rss_values = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None]
+    return {
+        "wall_seconds": statistics.median(walls),
+        "wall_seconds_min": min(walls),
+        "wall_seconds_max": max(walls),
+        "peak_rss_mb": max(rss_values) if rss_values else None,
+    }
+
+
+def benchmark_pipeline(args) -> list[dict]:
+    """Ejecuta main.py con el backend simulado para cada combinación de parámetros."""
+    results = []
+    cases = itertools.product(args.sizes, args.section_chars, args.max_workers, args.engines)
+    for num_sections, section_chars, max_workers, engine in cases:
+        workdir = tempfile.mkdtemp(prefix="bench_pipeline_", dir=args.workdir)
+        try:
+            json_path = os.path.join(workdir, "corpus.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(generate_corpus(num_sections, section_chars, args.seed), f, ensure_ascii=False)
+
+            runs = []
+            stats = {}
+            for repetition in range(args.repeat):
+                stats_path = os.path.join(workdir, f"stats_{repetition}.json")
+                command = [
+                    sys.executable, MAIN_SCRIPT, json_path, f"bench_{repetition}",
+                    "--backend", "fake",
+                    "--engine", engine,
+                    "--max_workers", str(max_workers),
+                    "--fake_latency", str(args.fake_latency),
+                    "--fake_realtime_factor", str(args.fake_realtime_factor),
+                    "--fake_bytes_per_char", str(args.fake_bytes_per_char),
+                    "--fake_error_rate", str(args.fake_error_rate),
+                    "--fake_rate_limit_rate", str(args.fake_rate_limit_rate),
+                    "--retry_base_delay", str(args.retry_base_delay),
+                    "--chunk_chars", str(args.chunk_chars),
+                    "--cache_dir", os.path.join(workdir, "cache"),
+                    "--stats_json", stats_path,
+                ]
+                if not args.with_cache:
+                    command.append("--no_cache")
+                print(f"[pipeline] {num_sections} secciones x {section_chars} caracteres, {engine}, max_workers={max_workers} (repetición {repetition + 1}/{args.repeat})")
+                run = run_measured(command, workdir)
+                if run["returncode"] != 0:
+                    print(f"  Error: main.py terminó con código {run['returncode']}\n{run['stderr']}")
+                runs.append(run)
+                if os.path.exists(stats_path):
+                    with open(stats_path, "r", encoding="utf-8") as f:
+                        stats = json.load(f)
+
+            summary = summarize_runs(runs)
+            result = {
+                "params": {
+                    "sections": num_sections,
+                    "section_chars": section_chars,
+                    "max_workers": max_workers,
+                    "engine": engine,
+                    "fake_latency": args.fake_latency,
+                    "fake_realtime_factor": args.fake_realtime_factor,
+                    "fake_bytes_per_char": args.fake_bytes_per_char,
+                    "fake_error_rate": args.fake_error_rate,
+                    "fake_rate_limit_rate": args.fake_rate_limit_rate,
+                    "chunk_chars": args.chunk_chars,
+                    "cache": args.with_cache,
+                },
+                **summary,
+                "items_per_second": num_sections / summary["wall_seconds"] if summary["wall_seconds"] else None,
+                "stats": stats,
+            }
+            print(
+                f"  {summary['wall_seconds']:.2f} s, {result['items_per_second']:.1f} items/s, "
+                f"RSS máx. {summary['peak_rss_mb'] or 0:.1f} MB, "
+                f"stream {stats.get('stream_seconds', 0):.1f} s / espera {stats.get('retry_sleep_seconds', 0) + stats.get('limiter_wait_seconds', 0):.1f} s, "
+                f"{stats.get('bytes_copied', 0) / (1024 * 1024):.1f} MB copiados"
+            )
+            results.append(result)
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def write_test_wav(path: str, size_bytes: int, seed: int):
+    """Escribe un WAV PCM de 16 bits y 24 kHz con size_bytes de datos pseudoaleatorios."""
+    block = random.Random(seed).randbytes(64 * 1024)
+    with WavStreamWriter(path) as writer:
+        remaining = size_bytes - size_bytes % 2
+        while remaining > 0:
+            chunk = block[:min(len(block), remaining)]
+            writer.write(chunk)
+            remaining -= len(chunk)
+
+
+def benchmark_join(args) -> list[dict]:
+    """Ejecuta join_wav.py sobre N archivos de M MB para cada combinación de parámetros."""
+    results = []
+    for num_files, file_mb in itertools.product(args.files, args.file_mb):
+        workdir = tempfile.mkdtemp(prefix="bench_join_", dir=args.workdir)
+        try:
+            size_bytes = int(file_mb * 1024 * 1024)
+            input_paths = []
+            for n in range(num_files):
+                path = os.path.join(workdir, f"parte_{n:05d}.wav")
+                write_test_wav(path, size_bytes, seed=n)
+                input_paths.append(path)
+
+            runs = []
+            for repetition in range(args.repeat):
+                output_path = os.path.join(workdir, "combinado.wav")
+                print(f"[join] {num_files} archivos x {file_mb:g} MB (repetición {repetition + 1}/{args.repeat})")
+                run = run_measured([sys.executable, JOIN_SCRIPT, *input_paths, "-o", output_path], workdir)
+                if run["returncode"] != 0:
+                    print(f"  Error: join_wav.py terminó con código {run['returncode']}\n{run['stderr']}")
+                runs.append(run)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+
+            summary = summarize_runs(runs)
+            total_bytes = num_files * (size_bytes - size_bytes % 2)
+            result = {
+                "params": {"files": num_files, "file_mb": file_mb},
+                **summary,
+                "bytes_copied": total_bytes,
+                "mb_per_second": total_bytes / (1024 * 1024) / summary["wall_seconds"] if summary["wall_seconds"] else None,
+            }
+            print(f"  {summary['wall_seconds']:.2f} s, {result['mb_per_second']:.1f} MB/s, RSS máx. {summary['peak_rss_mb'] or 0:.1f} MB")
+            results.append(result)
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare_results(baseline_path: str, current_path: str) -> int:
+    """Muestra, caso por caso, la variación de tiempo y memoria entre dos archivos de resultados."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, "r", encoding="utf-8") as f:
+        current = json.load(f)
+
+    def key(result):
+        return json.dumps(result["params"], sort_keys=True)
+
+    baseline_by_key = {key(result): result for result in baseline["results"]}
+    print(f"Base: {baseline.get('git_revision')} ({baseline.get('timestamp')})")
+    print(f"Actual: {current.get('git_revision')} ({current.get('timestamp')})\n")
+    for result in current["results"]:
+        previous = baseline_by_key.get(key(result))
+        params = ", ".join(f"{name}={value}" for name, value in result["params"].items())
+        if previous is None:
+            print(f"{params}: sin caso equivalente en la base")
+            continue
+        wall_change = (result["wall_seconds"] / previous["wall_seconds"] - 1) * 100 if previous["wall_seconds"] else 0.0
+        line = f"{params}: {previous['wall_seconds']:.2f} s -> {result['wall_seconds']:.2f} s ({wall_change:+.1f}%)"
+        if result.get("peak_rss_mb") is not None and previous.get("peak_rss_mb") is not None:
+            line += f", RSS {previous['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB"
+        print(line)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de main.py (con el backend simulado) y de join_wav.py.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Mide el pipeline completo de main.py con --backend fake.")
+    pipeline_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help=f"Número de secciones de cada corpus (por defecto: {DEFAULT_SIZES}).")
+    pipeline_parser.add_argument("--section_chars", type=int, nargs="+", default=DEFAULT_SECTION_CHARS, help=f"Caracteres por sección (por defecto: {DEFAULT_SECTION_CHARS}).")
+    pipeline_parser.add_argument("--max_workers", type=int, nargs="+", default=[5], help="Valores de --max_workers a comparar (por defecto: 5).")
+    pipeline_parser.add_argument("--engines", nargs="+", choices=["threads", "async"], default=["threads"], help="Motores a comparar (por defecto: threads).")
+    pipeline_parser.add_argument("--fake_latency", type=float, default=0.0, help="Latencia simulada hasta el primer chunk (por defecto: 0).")
+    pipeline_parser.add_argument("--fake_realtime_factor", type=float, default=0.0, help="Velocidad simulada respecto a tiempo real (por defecto: 0, instantáneo).")
+    pipeline_parser.add_argument("--fake_bytes_per_char", type=int, default=DEFAULT_BYTES_PER_CHAR, help=f"Bytes de PCM por carácter (por defecto: {DEFAULT_BYTES_PER_CHAR}).")
+    pipeline_parser.add_argument("--fake_error_rate", type=float, default=0.0, help="Probabilidad de error transitorio por llamada (por defecto: 0).")
+    pipeline_parser.add_argument("--fake_rate_limit_rate", type=float, default=0.0, help="Probabilidad de 429 por llamada (por defecto: 0).")
+    pipeline_parser.add_argument("--retry_base_delay", type=float, default=0.1, help="Espera base entre reintentos (por defecto: 0.1).")
+    pipeline_parser.add_argument("--chunk_chars", type=int, default=0, help="Valor de --chunk_chars para main.py (por defecto: 0).")
+    pipeline_parser.add_argument("--with_cache", action="store_true", help="Usa la caché de audio (por defecto se ejecuta con --no_cache).")
+
+    join_parser = subparsers.add_parser("join", help="Mide join_wav.py sobre archivos WAV sintéticos.")
+    join_parser.add_argument("--files", type=int, nargs="+", default=[10, 100], help="Número de archivos a unir (por defecto: 10 100).")
+    join_parser.add_argument("--file_mb", type=float, nargs="+", default=[1.0, 10.0], help="Tamaño de cada archivo en MB (por defecto: 1 10).")
+
+    for subparser in (pipeline_parser, join_parser):
+        subparser.add_argument("-o", "--output", help="Archivo JSON de resultados (por defecto: benchmark_<tipo>_<fecha>.json).")
+        subparser.add_argument("--repeat", type=int, default=1, help="Repeticiones de cada caso; se informa la mediana (por defecto: 1).")
+        subparser.add_argument("--seed", type=int, default=0, help="Semilla del corpus sintético (por defecto: 0).")
+        subparser.add_argument("--workdir", help="Carpeta donde crear los directorios temporales (por defecto: la del sistema).")
+        subparser.add_argument("--keep", action="store_true", help="No borra los directorios temporales al terminar.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compara dos archivos de resultados.")
+    compare_parser.add_argument("baseline", help="Resultados de referencia (por ejemplo, del commit anterior).")
+    compare_parser.add_argument("current", help="Resultados a comparar.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        return compare_results(args.baseline, args.current)
+
+    args.repeat = max(1, args.repeat)
+    started = datetime.now()
+    results = benchmark_pipeline(args) if args.command == "pipeline" else benchmark_join(args)
+    report = {
+        "benchmark": args.command,
+        "timestamp": started.isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output_path = args.output or f"benchmark_{args.command}_{started.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Índice de capítulos del audio combinado.
+
+Durante la concatenación se anota dónde empieza cada sección dentro del PCM del
+archivo combinado; con eso se escribe un JSON con el offset en muestras y en bytes
+y la duración de cada id/título (acceso directo a cualquier sección sin los
+archivos individuales) y, opcionalmente, una hoja CUE o un archivo de metadatos
+de ffmpeg (ffmetadata) con los capítulos.
+"""
+
+import json
+import os
+
+
+CUE_FRAMES_PER_SECOND = 75  # los tiempos de una hoja CUE van en minutos:segundos:frames
+
+
+class ChapterIndex:
+    """
+    Capítulos (id, título, posición y tamaño en el PCM) de un audio combinado.
+
+    Las posiciones son relativas al inicio de los datos de audio; data_offset es el
+    tamaño del encabezado del WAV combinado y se suma para dar offsets absolutos.
+    """
+
+    def __init__(self, sample_rate: int, bits_per_sample: int, num_channels: int = 1, data_offset: int = 0):
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits_per_sample
+        self.num_channels = num_channels
+        self.data_offset = data_offset
+        self.block_align = num_channels * (bits_per_sample // 8)
+        self.chapters: list[dict] = []
+
+    def add(self, chapter_id: str, title: str, data_position: int, data_size: int):
+        """Registra un capítulo que ocupa data_size bytes a partir de data_position en el PCM."""
+        self.chapters.append({
+            "id": chapter_id,
+            "title": title,
+            "sample_offset": data_position // self.block_align,
+            "byte_offset": self.data_offset + data_position,
+            "samples": data_size // self.block_align,
+            "start_seconds": round(data_position / (self.sample_rate * self.block_align), 6),
+            "duration_seconds": round(data_size / (self.sample_rate * self.block_align), 6),
+        })
+
+    def as_dict(self, audio_file: str, byte_offsets: bool = True) -> dict:
+        """
+        Índice serializable. Sin byte_offsets (audio comprimido), los offsets en bytes
+        no aplican y se omiten; los offsets en muestras siguen siendo válidos.
+        """
+        chapters = self.chapters
+        if not byte_offsets:
+            chapters = [{key: value for key, value in chapter.items() if key != "byte_offset"} for chapter in chapters]
+        return {
+            "audio_file": os.path.basename(audio_file),
+            "sample_rate": self.sample_rate,
+            "bits_per_sample": self.bits_per_sample,
+            "num_channels": self.num_channels,
+            "data_offset": self.data_offset if byte_offsets else None,
+            "chapters": chapters,
+        }
+
+    def write_json(self, path: str, audio_file: str, byte_offsets: bool = True):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(audio_file, byte_offsets), f, ensure_ascii=False, indent=2)
+
+    def write_cue(self, path: str, audio_file: str):
+        """Hoja CUE con una pista por capítulo (INDEX 01 en minutos:segundos:frames)."""
+        # WAVE es el tipo que los reproductores aceptan también para FLAC u Opus
+        lines = [f'FILE "{os.path.basename(audio_file)}" WAVE']
+        for number, chapter in enumerate(self.chapters, 1):
+            frames = chapter["sample_offset"] * CUE_FRAMES_PER_SECOND // self.sample_rate
+            minutes, rest = divmod(frames, 60 * CUE_FRAMES_PER_SECOND)
+            seconds, frames = divmod(rest, CUE_FRAMES_PER_SECOND)
+            title = chapter["title"].replace('"', "'")
+            lines.append(f"  TRACK {number:02d} AUDIO")
+            lines.append(f'    TITLE "{title}"')
+            lines.append(f"    INDEX 01 {minutes:02d}:{seconds:02d}:{frames:02d}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def write_ffmetadata(self, path: str):
+        """Capítulos en formato ffmetadata (ffmpeg -i audio -i capitulos.txt -map_metadata 1 ...)."""
+        lines = [";FFMETADATA1"]
+        for chapter in self.chapters:
+            title = chapter["title"]
+            for special in ("\\", "=", ";", "#", "\n"):
+                title = title.replace(special, "\\" + special)
+            lines.append("[CHAPTER]")
+            lines.append(f"TIMEBASE=1/{self.sample_rate}")
+            lines.append(f"START={chapter['sample_offset']}")
+            lines.append(f"END={chapter['sample_offset'] + chapter['samples']}")
+            lines.append(f"title={title}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def write_chapter_files(index: ChapterIndex, audio_file: str, cue: bool = False, ffmetadata: bool = False) -> list[str]:
+    """
+    Escribe el índice JSON junto al audio ({base}.chapters.json) y, si se piden, la
+    hoja CUE ({base}.cue) y los metadatos de ffmpeg ({base}.ffmetadata.txt).
+    Devuelve las rutas escritas.
+    """
+    base = os.path.splitext(audio_file)[0]
+    paths = [f"{base}.chapters.json"]
+    index.write_json(paths[0], audio_file, byte_offsets=audio_file.lower().endswith(".wav"))
+    if cue:
+        paths.append(f"{base}.cue")
+        index.write_cue(paths[-1], audio_file)
+    if ffmetadata:
+        paths.append(f"{base}.ffmetadata.txt")
+        index.write_ffmetadata(paths[-1])
+    return paths
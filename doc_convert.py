@@ -0,0 +1,189 @@
+"""
+Conversión de un documento fuente al JSON de secciones (--convert).
+
+El documento se envía junto con prompt.txt a un modelo de texto de Gemini (con el
+mismo genai.Client que la síntesis) y la respuesta, un array JSON, se decodifica
+a medida que llega: cada sección completa se valida y pasa a la cola de síntesis
+mientras el modelo sigue escribiendo las siguientes. Las secciones recibidas se
+guardan además en un JSON normal, para repetir la síntesis sin volver a convertir.
+
+FakeTextModel sustituye al modelo sin red ni API key: divide el documento en
+párrafos y los emite como un array JSON a la velocidad indicada.
+"""
+
+import json
+import mimetypes
+import os
+import re
+import time
+from typing import Iterator, Protocol, TextIO
+
+from json_input import InputReader, iter_json_array
+
+
+DEFAULT_PROMPT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt.txt")
+DEFAULT_TEXT_MODEL = "gemini-2.5-flash"
+# Extensiones que se envían como texto aunque mimetypes no las reconozca como text/*
+TEXT_EXTENSIONS = {".md", ".markdown", ".txt", ".rst", ".csv", ".json", ".html", ".htm", ".xml", ".srt", ".vtt"}
+
+
+class ConversionError(ValueError):
+    """El modelo de texto falló durante la conversión (el mensaje es para el usuario)."""
+
+
+class TextModel(Protocol):
+    """Modelo que convierte un documento en el texto de un array JSON, por chunks."""
+
+    name: str
+
+    def stream_text(self, prompt: str, document_path: str) -> Iterator[str]:
+        """Genera los chunks de texto de la respuesta."""
+        ...
+
+
+def is_text_document(path: str) -> bool:
+    mime_type, _encoding = mimetypes.guess_type(path)
+    return os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS or (mime_type or "").startswith("text/")
+
+
+class GeminiTextModel:
+    """Modelo de texto sobre genai.Client.models.generate_content_stream."""
+
+    def __init__(self, client, model_name: str = DEFAULT_TEXT_MODEL):
+        # Importación diferida, como en GeminiBackend
+        from google.genai import types
+
+        self._types = types
+        self.client = client
+        self.name = model_name
+        self.generate_config = types.GenerateContentConfig(response_mime_type="application/json")
+
+    def _document_part(self, document_path: str):
+        """Los documentos de texto van como texto; el resto (PDF, imágenes, audio...) como bytes con su tipo MIME."""
+        if is_text_document(document_path):
+            with open(document_path, "r", encoding="utf-8") as f:
+                return self._types.Part.from_text(text=f.read())
+        mime_type, _encoding = mimetypes.guess_type(document_path)
+        with open(document_path, "rb") as f:
+            return self._types.Part.from_bytes(data=f.read(), mime_type=mime_type or "application/octet-stream")
+
+    def stream_text(self, prompt: str, document_path: str) -> Iterator[str]:
+        contents = [
+            self._types.Content(
+                role="user",
+                parts=[self._types.Part.from_text(text=prompt), self._document_part(document_path)],
+            ),
+        ]
+        for chunk in self.client.models.generate_content_stream(
+            model=self.name,
+            contents=contents,
+            config=self.generate_config,
+        ):
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeTextModel:
+    """
+    Modelo local y determinista: cada párrafo del documento (separado por líneas en
+    blanco) es una sección; una línea que empieza por '#' es el título de las
+    siguientes. La respuesta se emite entre vallas ```json, como suelen hacer los
+    modelos, en chunks de chunk_chars caracteres.
+
+    Parámetros:
+        latency: segundos hasta el primer chunk.
+        chars_per_second: velocidad de generación (0 = instantáneo).
+    """
+
+    name = "fake-text"
+
+    def __init__(self, latency: float = 0.0, chars_per_second: float = 0.0, chunk_chars: int = 64):
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        self.chunk_chars = max(1, chunk_chars)
+
+    @staticmethod
+    def sections(text: str) -> list[dict]:
+        sections = []
+        title = None
+        for block in re.split(r"\n\s*\n", text):
+            lines = [line.strip() for line in block.splitlines() if line.strip()]
+            if lines and lines[0].startswith("#"):
+                title = lines.pop(0).lstrip("#").strip()
+            if not lines:
+                continue
+            number = len(sections) + 1
+            sections.append({"id": str(number), "title": title or f"Sección {number}", "content": " ".join(lines)})
+        return sections
+
+    def stream_text(self, prompt: str, document_path: str) -> Iterator[str]:
+        with open(document_path, "r", encoding="utf-8") as f:
+            response = "```json\n" + json.dumps(self.sections(f.read()), ensure_ascii=False, indent=4) + "\n```"
+        if self.latency:
+            time.sleep(self.latency)
+        for start in range(0, len(response), self.chunk_chars):
+            chunk = response[start:start + self.chunk_chars]
+            if self.chars_per_second:
+                time.sleep(len(chunk) / self.chars_per_second)
+            yield chunk
+
+
+class ModelTextStream:
+    """
+    Adaptador de archivo sobre los chunks del modelo para iter_json_array: read()
+    devuelve el siguiente chunk en cuanto llega (sin esperar a llenar un bloque) y
+    descarta lo anterior al primer '[' (vallas de código o texto introductorio).
+    """
+
+    def __init__(self, chunks: Iterator[str], model_name: str):
+        self._chunks = chunks
+        self._model_name = model_name
+        self._started = False
+
+    def read(self, size: int = -1) -> str:
+        while True:
+            try:
+                chunk = next(self._chunks, "")
+            except Exception as e:
+                raise ConversionError(f"El modelo de texto {self._model_name} falló durante la conversión: {e}") from e
+            if not chunk or self._started:
+                return chunk
+            start = chunk.find("[")
+            if start >= 0:
+                self._started = True
+                return chunk[start:]
+
+
+class ConvertReader(InputReader):
+    """
+    InputReader sobre la respuesta del modelo: produce las secciones válidas (con el
+    filtro de IDs) a medida que el modelo las escribe. Si se indica json_output, cada
+    sección recibida se añade a ese archivo, que queda como un array JSON válido
+    aunque la conversión se corte.
+    """
+
+    def __init__(self, model: TextModel, document_path: str, prompt: str, target_ids: set[str] | None = None, json_output: str | None = None):
+        super().__init__(document_path, target_ids)
+        self.model = model
+        self.prompt = prompt
+        self.json_output = json_output
+
+    def __iter__(self):
+        stream = ModelTextStream(self.model.stream_text(self.prompt, self.path), self.model.name)
+        output = open(self.json_output, "w", encoding="utf-8") if self.json_output else None
+        if output is not None:
+            output.write("[")
+        try:
+            yield from self._select(self._saved(iter_json_array(stream), output))
+        finally:
+            if output is not None:
+                output.write("\n]\n")
+                output.close()
+
+    @staticmethod
+    def _saved(raw_items: Iterator[object], output: TextIO | None) -> Iterator[object]:
+        for number, raw in enumerate(raw_items):
+            if output is not None:
+                output.write(("\n    " if number == 0 else ",\n    ") + json.dumps(raw, ensure_ascii=False))
+                output.flush()
+            yield raw
@@ -0,0 +1,213 @@
+"""
+Reconstrucción incremental del archivo combinado.
+
+Junto al combinado se guarda un manifiesto ({base}.manifest.json) con el hash del
+texto de cada ID y el rango de bytes que ocupa su audio. En la siguiente ejecución
+con --incremental solo se sintetizan los IDs nuevos o cuyo texto cambió; el resto
+se reutiliza directamente desde el combinado anterior:
+
+- Si la lista de IDs es la misma y cada sección regenerada ocupa exactamente los
+  mismos bytes que antes, se sobrescribe en su sitio (solo se escriben esos bytes).
+- Si no, se reescribe el combinado copiando en el kernel los rangos sin cambios
+  del archivo anterior y las secciones nuevas, y se reemplaza al terminar.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from wav_io import OrderedWavAssembler, WavSegment, copy_file_data, read_wav_info
+
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    """Hash (sha256) del texto de una sección."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def manifest_path(combined_path: str) -> str:
+    return f"{os.path.splitext(combined_path)[0]}.manifest.json"
+
+
+class RebuildManifest:
+    """
+    Contenido del combinado: configuración con la que se generó, mime_type, offset
+    de los datos y, en orden, (id, título, hash del texto, posición y tamaño en el PCM).
+    """
+
+    def __init__(self, config: dict, mime_type: str | None, data_offset: int, sections: list[dict]):
+        self.config = config
+        self.mime_type = mime_type
+        self.data_offset = data_offset
+        self.sections = sections
+
+    @property
+    def data_size(self) -> int:
+        """Tamaño del PCM descrito (hasta el final de la última sección)."""
+        if not self.sections:
+            return 0
+        last = self.sections[-1]
+        return last["position"] + last["size"]
+
+    def save(self, path: str):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "config": self.config,
+                "mime_type": self.mime_type,
+                "data_offset": self.data_offset,
+                "sections": self.sections,
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, combined_path: str, config: dict):
+        """
+        Carga el manifiesto si sigue describiendo el combinado: misma versión y
+        configuración, y el WAV existe con el tamaño de datos esperado.
+        Devuelve None si no existe o no es utilizable (hay que reconstruir todo).
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION or data.get("config") != config:
+                return None
+            manifest = cls(data["config"], data["mime_type"], data["data_offset"], data["sections"])
+            info = read_wav_info(combined_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if info.data_offset != manifest.data_offset or info.data_size != manifest.data_size:
+            return None
+        return manifest
+
+    def reusable_segments(self, combined_path: str, item_ids: list[str], texts: list[str]) -> dict[int, WavSegment]:
+        """
+        Para cada índice de la lista actual cuyo ID y texto coinciden con una sección
+        del manifiesto, devuelve el WavSegment de su rango dentro del combinado.
+        """
+        previous = {}
+        for section in self.sections:
+            previous.setdefault((section["id"], section["hash"]), section)
+        reusable = {}
+        for index, (item_id, text) in enumerate(zip(item_ids, texts)):
+            section = previous.get((item_id, content_hash(text)))
+            if section is not None:
+                reusable[index] = WavSegment(combined_path, self.data_offset + section["position"], section["size"], self.mime_type)
+        return reusable
+
+
+class IncrementalAssembler:
+    """
+    Sustituto de OrderedWavAssembler para --incremental (misma interfaz: add, close
+    y los mismos contadores). Recoge los segmentos sintetizados y, al cerrar, parchea
+    el combinado en su sitio o lo reescribe reutilizando los rangos sin cambios.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        item_ids: list[str],
+        manifest: RebuildManifest,
+        reused: dict[int, WavSegment],
+        segment_filter=None,
+        gap_ms: float = 0,
+    ):
+        self.output_path = output_path
+        self.item_ids = item_ids
+        self.total = len(item_ids)
+        self.manifest = manifest
+        self.reused = reused
+        self.segment_filter = segment_filter
+        self.gap_ms = gap_ms
+        self.mime_type = manifest.mime_type
+        self.bytes_copied = 0
+        self.bytes_filtered_out = 0
+        self.filter_failures = 0
+        self.segment_positions: list[tuple[int, int, int]] = []
+        self.patched_in_place = False
+        self.error = None
+        self._segments: dict[int, WavSegment | None] = dict(reused)
+        self._lock = threading.Lock()
+
+    def add(self, index: int, segment: WavSegment | None):
+        """Registra el resultado de un índice sintetizado (el recorte se aplica aquí, como en el ensamblador)."""
+        if segment is not None and self.segment_filter is not None:
+            try:
+                filtered = self.segment_filter(segment)
+            except Exception:
+                filtered = None
+            with self._lock:
+                if filtered is None:
+                    self.filter_failures += 1
+                else:
+                    self.bytes_filtered_out += segment.data_size - filtered.data_size
+                    segment = filtered
+        with self._lock:
+            self._segments[index] = segment
+            if self.mime_type is None and segment is not None and segment.mime_type:
+                self.mime_type = segment.mime_type
+
+    @property
+    def complete(self) -> bool:
+        with self._lock:
+            return len(self._segments) >= self.total
+
+    def _can_patch_in_place(self) -> bool:
+        sections = self.manifest.sections
+        if [section["id"] for section in sections] != self.item_ids:
+            return False
+        for index, section in enumerate(sections):
+            segment = self._segments.get(index)
+            if segment is None or segment.data_size != section["size"]:
+                return False
+            if index not in self.reused and segment.mime_type != self.manifest.mime_type:
+                return False
+        return True
+
+    def close(self) -> WavSegment | None:
+        """
+        Produce el combinado actualizado y devuelve su WavSegment (None si quedó
+        vacío o hubo un error, que queda en self.error).
+        """
+        with self._lock:
+            if self._can_patch_in_place():
+                return self._patch_in_place()
+            return self._rewrite()
+
+    def _patch_in_place(self) -> WavSegment | None:
+        try:
+            with open(self.output_path, "r+b") as out:
+                for index, section in enumerate(self.manifest.sections):
+                    self.segment_positions.append((index, section["position"], section["size"]))
+                    if index in self.reused:
+                        continue
+                    segment = self._segments[index]
+                    with open(segment.path, "rb") as src:
+                        self.bytes_copied += copy_file_data(
+                            src, segment.data_offset, segment.data_size, out, self.manifest.data_offset + section["position"],
+                        )
+        except Exception as e:
+            self.error = e
+            return None
+        self.patched_in_place = True
+        return WavSegment(self.output_path, self.manifest.data_offset, self.manifest.data_size, self.mime_type)
+
+    def _rewrite(self) -> WavSegment | None:
+        # Los rangos reutilizados se leen del combinado anterior: se escribe en un temporal
+        temp_path = f"{self.output_path}.incremental.tmp"
+        assembler = OrderedWavAssembler(temp_path, self.total, gap_ms=self.gap_ms)
+        for index in range(self.total):
+            assembler.add(index, self._segments.get(index))
+        combined = assembler.close()
+        self.bytes_copied = assembler.bytes_copied
+        self.segment_positions = assembler.segment_positions
+        self.mime_type = assembler.mime_type or self.mime_type
+        self.error = assembler.error
+        if combined is None:
+            return None
+        os.replace(temp_path, self.output_path)
+        return WavSegment(self.output_path, combined.data_offset, combined.data_size, combined.mime_type)
@@ -0,0 +1,235 @@
+"""
+Métricas por ID (o por fragmento) de la síntesis.
+
+Cada llamada a generate_audio_for_text produce un registro con la espera en cola,
+el tiempo hasta el primer chunk de audio, la duración del stream, los chunks y
+bytes de PCM recibidos, los segundos de audio, el factor de tiempo real, los
+reintentos con su motivo y el tiempo de escritura en disco. Los registros se
+guardan en JSONL y se resumen en percentiles (p50/p95/p99) para el archivo de
+resultados y para un snapshot en formato textfile de Prometheus.
+"""
+
+import json
+import os
+import threading
+import time
+
+from wav_io import parse_audio_mime_type
+
+
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+# Campo del registro -> (nombre de la métrica de Prometheus, descripción)
+SUMMARY_FIELDS = {
+    "queue_wait_seconds": ("tts_item_queue_wait_seconds", "Espera desde que el ID se encola hasta que empieza su síntesis"),
+    "limiter_wait_seconds": ("tts_item_limiter_wait_seconds", "Espera por el limitador compartido (huecos y tokens)"),
+    "first_chunk_seconds": ("tts_item_first_chunk_seconds", "Tiempo desde el inicio del stream hasta el primer chunk de audio"),
+    "stream_seconds": ("tts_item_stream_seconds", "Duración del stream que produjo el audio"),
+    "retry_sleep_seconds": ("tts_item_retry_sleep_seconds", "Tiempo dormido entre reintentos"),
+    "disk_write_seconds": ("tts_item_disk_write_seconds", "Tiempo escribiendo el WAV individual y la caché"),
+    "realtime_factor": ("tts_item_realtime_factor", "Segundos de audio producidos por segundo de stream"),
+}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Percentil q (0-1) con interpolación lineal sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class ItemMetrics:
+    """Registro de métricas de una síntesis (un ID o un fragmento de un ID)."""
+
+    __slots__ = (
+        "item_id",
+        "item_index",
+        "title",
+        "queued_at",
+        "started_at",
+        "queue_wait_seconds",
+        "limiter_wait_seconds",
+        "first_chunk_seconds",
+        "stream_seconds",
+        "retry_sleep_seconds",
+        "disk_write_seconds",
+        "chunk_count",
+        "pcm_bytes",
+        "audio_seconds",
+        "realtime_factor",
+        "attempts",
+        "retry_reasons",
+        "cache_hit",
+        "success",
+    )
+
+    def __init__(self, item_id: str, title: str, queued_at: float | None = None, item_index: int | None = None):
+        self.item_id = item_id
+        self.item_index = item_index  # posición en el JSON: distingue IDs repetidos
+        self.title = title
+        self.started_at = time.monotonic()
+        self.queued_at = queued_at if queued_at is not None else self.started_at
+        self.queue_wait_seconds = max(0.0, self.started_at - self.queued_at)
+        self.limiter_wait_seconds = 0.0
+        self.first_chunk_seconds = None
+        self.stream_seconds = 0.0
+        self.retry_sleep_seconds = 0.0
+        self.disk_write_seconds = 0.0
+        self.chunk_count = 0
+        self.pcm_bytes = 0
+        self.audio_seconds = 0.0
+        self.realtime_factor = None
+        self.attempts = 0
+        self.retry_reasons: list[str] = []
+        self.cache_hit = False
+        self.success = False
+
+    def start_attempt(self):
+        """Reinicia los contadores del stream al empezar un intento (se informan los del último)."""
+        self.attempts += 1
+        self.first_chunk_seconds = None
+        self.stream_seconds = 0.0
+        self.chunk_count = 0
+        self.pcm_bytes = 0
+
+    def finish(self, success: bool, mime_type: str | None = None):
+        """Cierra el registro y calcula los segundos de audio y el factor de tiempo real."""
+        self.success = success
+        if success and mime_type and self.pcm_bytes:
+            parameters = parse_audio_mime_type(mime_type)
+            bytes_per_second = (parameters.get("rate") or 24000) * ((parameters.get("bits_per_sample") or 16) // 8)
+            self.audio_seconds = self.pcm_bytes / bytes_per_second
+            if self.stream_seconds > 0:
+                self.realtime_factor = self.audio_seconds / self.stream_seconds
+
+    def as_dict(self) -> dict:
+        record = {name: getattr(self, name) for name in self.__slots__ if name not in ("queued_at", "started_at")}
+        record["retries"] = len(self.retry_reasons)
+        return record
+
+
+class MetricsRecorder:
+    """
+    Recoge los ItemMetrics de toda la ejecución (seguro entre hilos).
+
+    Si se indica jsonl_path, cada registro se añade como una línea JSON en cuanto
+    termina su ID, de modo que el archivo es útil aunque la ejecución se interrumpa.
+    Con job_store (un JobStore), cada registro se acumula además en la fila de su ID.
+    """
+
+    def __init__(self, jsonl_path: str | None = None, job_store=None):
+        self.jsonl_path = jsonl_path
+        self.job_store = job_store
+        self._lock = threading.Lock()
+        self._values: dict[str, list[float]] = {field: [] for field in SUMMARY_FIELDS}
+        self._retry_reasons: dict[str, int] = {}
+        self._totals = {"items": 0, "successful": 0, "failed": 0, "cache_hits": 0, "chunks": 0, "pcm_bytes": 0, "audio_seconds": 0.0}
+        self._jsonl_file = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+
+    def record(self, metrics: ItemMetrics):
+        """Acumula un registro terminado y lo escribe en el JSONL."""
+        record = metrics.as_dict()
+        with self._lock:
+            self._totals["items"] += 1
+            self._totals["successful" if metrics.success else "failed"] += 1
+            self._totals["cache_hits"] += int(metrics.cache_hit)
+            self._totals["chunks"] += metrics.chunk_count
+            self._totals["pcm_bytes"] += metrics.pcm_bytes
+            self._totals["audio_seconds"] += metrics.audio_seconds
+            for reason in metrics.retry_reasons:
+                self._retry_reasons[reason] = self._retry_reasons.get(reason, 0) + 1
+            for field in SUMMARY_FIELDS:
+                value = record[field]
+                # Los aciertos de caché no tienen stream: no deben sesgar los percentiles de la API
+                if value is None or (metrics.cache_hit and field in ("first_chunk_seconds", "stream_seconds", "realtime_factor")):
+                    continue
+                self._values[field].append(value)
+            if self._jsonl_file is not None:
+                self._jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._jsonl_file.flush()
+        if self.job_store is not None:
+            self.job_store.record_synthesis(metrics)
+
+    def close(self):
+        with self._lock:
+            if self._jsonl_file is not None:
+                self._jsonl_file.close()
+                self._jsonl_file = None
+
+    def summary(self) -> dict:
+        """Totales y percentiles de cada métrica temporal."""
+        with self._lock:
+            summary = {"totals": dict(self._totals), "retry_reasons": dict(self._retry_reasons), "quantiles": {}}
+            for field, values in self._values.items():
+                ordered = sorted(values)
+                summary["quantiles"][field] = {
+                    "count": len(ordered),
+                    "sum": sum(ordered),
+                    **{f"p{round(q * 100)}": percentile(ordered, q) for q in SUMMARY_QUANTILES},
+                }
+        return summary
+
+    def summary_lines(self) -> list[str]:
+        """Resumen legible (para el archivo de resultados)."""
+        summary = self.summary()
+        totals = summary["totals"]
+        lines = [
+            f"Síntesis registradas: {totals['items']} (exitosas: {totals['successful']}, fallidas: {totals['failed']}, desde caché: {totals['cache_hits']})",
+            f"Audio producido: {totals['audio_seconds']:.1f} s en {totals['chunks']} chunks ({totals['pcm_bytes']:,} bytes de PCM)",
+        ]
+        if summary["retry_reasons"]:
+            reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(summary["retry_reasons"].items()))
+            lines.append(f"Reintentos por motivo: {reasons}")
+        lines.append(f"{'Métrica':<24}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for field, values in summary["quantiles"].items():
+            if not values["count"]:
+                continue
+            lines.append(f"{field:<24}{values['p50']:>10.3f}{values['p95']:>10.3f}{values['p99']:>10.3f}")
+        return lines
+
+    def write_prometheus(self, path: str):
+        """
+        Escribe un snapshot en formato de exposición de Prometheus (para el textfile
+        collector de node_exporter). Se escribe en un temporal y se renombra, para que
+        el collector nunca lea un archivo a medias.
+        """
+        summary = self.summary()
+        totals = summary["totals"]
+        lines = [
+            "# HELP tts_items_total Síntesis terminadas por resultado.",
+            "# TYPE tts_items_total counter",
+            f'tts_items_total{{result="success"}} {totals["successful"]}',
+            f'tts_items_total{{result="failed"}} {totals["failed"]}',
+            "# HELP tts_cache_hits_total Síntesis servidas desde la caché.",
+            "# TYPE tts_cache_hits_total counter",
+            f"tts_cache_hits_total {totals['cache_hits']}",
+            "# HELP tts_chunks_total Chunks de audio recibidos.",
+            "# TYPE tts_chunks_total counter",
+            f"tts_chunks_total {totals['chunks']}",
+            "# HELP tts_pcm_bytes_total Bytes de PCM recibidos.",
+            "# TYPE tts_pcm_bytes_total counter",
+            f"tts_pcm_bytes_total {totals['pcm_bytes']}",
+            "# HELP tts_audio_seconds_total Segundos de audio producidos.",
+            "# TYPE tts_audio_seconds_total counter",
+            f"tts_audio_seconds_total {totals['audio_seconds']:.6f}",
+            "# HELP tts_retries_total Reintentos por motivo.",
+            "# TYPE tts_retries_total counter",
+        ]
+        for reason, count in sorted(summary["retry_reasons"].items()):
+            lines.append(f'tts_retries_total{{reason="{reason}"}} {count}')
+        for field, (metric_name, description) in SUMMARY_FIELDS.items():
+            values = summary["quantiles"][field]
+            lines.append(f"# HELP {metric_name} {description}.")
+            lines.append(f"# TYPE {metric_name} summary")
+            for q in SUMMARY_QUANTILES:
+                lines.append(f'{metric_name}{{quantile="{q:g}"}} {values[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f"{metric_name}_sum {values['sum']:.6f}")
+            lines.append(f"{metric_name}_count {values['count']}")
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
@@ -0,0 +1,251 @@
+"""
+Conjunto de trabajos compartido entre varios procesos o máquinas (--worker / --merge).
+
+El estado vive en una carpeta en almacenamiento compartido, solo con operaciones
+atómicas de archivos (funcionan igual en NFS/SMB, donde SQLite en modo WAL no):
+
+- leases/{índice}.lease: el ID está reclamado. Se crea con O_EXCL (solo un worker
+  lo consigue) y el worker que lo tiene renueva su mtime mientras sintetiza
+  (heartbeat). Un lease sin renovar durante lease_seconds se considera abandonado
+  (worker caído) y otro worker lo toma; al fallar, el worker lo borra.
+- done/{índice}.json: el ID está terminado (id, hash del texto, archivo y tamaño
+  del audio). Se escribe en un temporal y se renombra.
+
+Los workers sintetizan en la carpeta de audios compartida; el paso --merge une los
+terminados en el orden del JSON.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+from resume_checkpoint import verify_wav_file
+from wav_io import WavSegment
+
+
+DEFAULT_LEASE_SECONDS = 120.0
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseJobSet:
+    """
+    Vista de un worker sobre el conjunto de trabajos de una carpeta.
+
+    item_ids y text_hashes describen los IDs en el orden del JSON; todos los
+    workers deben usar el mismo JSON y los mismos --ids. Un done/ cuyo id o hash no
+    coincide (el texto cambió) no cuenta como terminado. claim_order fija el orden en
+    que se reclaman los índices (por defecto, el del JSON).
+    """
+
+    def __init__(self, directory: str, item_ids: list[str], text_hashes: list[str], worker_id: str | None = None, lease_seconds: float = DEFAULT_LEASE_SECONDS, claim_order: list[int] | None = None):
+        self.directory = directory
+        self.item_ids = item_ids
+        self.text_hashes = text_hashes
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.claim_order = claim_order if claim_order is not None else list(range(len(item_ids)))
+        self.leases_lost = 0
+        self.leases_taken_over = 0
+        self._held: set[int] = set()
+        self._known_done: set[int] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+        os.makedirs(os.path.join(directory, "leases"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "done"), exist_ok=True)
+
+    def _lease_path(self, index: int) -> str:
+        return os.path.join(self.directory, "leases", f"{index:06d}.lease")
+
+    def _done_path(self, index: int) -> str:
+        return os.path.join(self.directory, "done", f"{index:06d}.json")
+
+    # --- Estado de un ID ---
+
+    def done_entry(self, index: int) -> dict | None:
+        """Entrada done/ del índice si corresponde al ID y al texto actuales."""
+        try:
+            with open(self._done_path(index), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("id") != self.item_ids[index] or entry.get("hash") != self.text_hashes[index]:
+            return None
+        return entry
+
+    def _lease_owner(self, index: int) -> str | None:
+        try:
+            with open(self._lease_path(index), "r", encoding="utf-8") as f:
+                return json.load(f).get("worker")
+        except (OSError, ValueError):
+            return None
+
+    def _create_lease(self, index: int) -> bool:
+        try:
+            fd = os.open(self._lease_path(index), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": self.worker_id, "id": self.item_ids[index], "claimed_at": time.time()}, f)
+        return True
+
+    def _take_over_expired(self, index: int) -> bool:
+        """
+        Si el lease del índice caducó, lo aparta con un rename (atómico: solo un worker
+        lo consigue) y lo reclama. Si entre la comprobación y el rename otro worker ya
+        lo había renovado o reclamado, se devuelve a su sitio.
+        """
+        path = self._lease_path(index)
+        try:
+            if time.time() - os.stat(path).st_mtime <= self.lease_seconds:
+                return False
+            expired_path = f"{path}.{self.worker_id}.expired"
+            os.rename(path, expired_path)
+        except OSError:
+            return False
+        try:
+            if time.time() - os.stat(expired_path).st_mtime <= self.lease_seconds:
+                try:
+                    os.link(expired_path, path)
+                except OSError:
+                    pass
+                return False
+        finally:
+            try:
+                os.remove(expired_path)
+            except OSError:
+                pass
+        if not self._create_lease(index):
+            return False
+        self.leases_taken_over += 1
+        return True
+
+    # --- Reclamar y terminar ---
+
+    def claim_next(self, exclude: set[int] = frozenset()) -> int | None:
+        """
+        Reclama el primer ID (en claim_order) sin terminar y sin lease vigente, y
+        devuelve su índice; None si no queda ninguno disponible ahora.
+        """
+        for index in self.claim_order:
+            if index in exclude or index in self._known_done or index in self._held:
+                continue
+            if self.done_entry(index) is not None:
+                self._known_done.add(index)
+                continue
+            if not self._create_lease(index) and not self._take_over_expired(index):
+                continue
+            # Otro worker pudo terminarlo entre la comprobación y el lease
+            if self.done_entry(index) is not None:
+                self._known_done.add(index)
+                self._remove_lease(index)
+                continue
+            with self._lock:
+                self._held.add(index)
+            self._start_heartbeat()
+            return index
+        return None
+
+    def unfinished(self, exclude: set[int] = frozenset()) -> list[int]:
+        """
+        Índices sin terminar (salvo los de exclude), en claim_order: los que tienen un
+        lease (vigente o caducado) y los que aún nadie reclamó.
+        """
+        remaining = []
+        for index in self.claim_order:
+            if index in exclude or index in self._known_done:
+                continue
+            if self.done_entry(index) is not None:
+                self._known_done.add(index)
+                continue
+            remaining.append(index)
+        return remaining
+
+    def complete(self, index: int, segment: WavSegment):
+        """Marca el ID como terminado con el audio de `segment` y libera su lease."""
+        path = self._done_path(index)
+        temp_path = f"{path}.{self.worker_id}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "id": self.item_ids[index],
+                "hash": self.text_hashes[index],
+                # Relativa a la carpeta del conjunto: cada máquina puede montarla en otra ruta
+                "path": os.path.relpath(segment.path, self.directory),
+                "data_size": segment.data_size,
+                "worker": self.worker_id,
+                "finished_at": time.time(),
+            }, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self._known_done.add(index)
+        self.release(index)
+
+    def release(self, index: int):
+        """Libera el lease del índice (tras terminar o fallar) para que otro worker pueda tomarlo."""
+        with self._lock:
+            self._held.discard(index)
+        if self._lease_owner(index) == self.worker_id:
+            self._remove_lease(index)
+
+    def _remove_lease(self, index: int):
+        try:
+            os.remove(self._lease_path(index))
+        except OSError:
+            pass
+
+    # --- Heartbeat ---
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                held = list(self._held)
+            for index in held:
+                if self._lease_owner(index) != self.worker_id:
+                    # Otro worker lo tomó (este no renovó a tiempo): se termina igual, el resultado es el mismo
+                    with self._lock:
+                        if index in self._held:
+                            self._held.discard(index)
+                            self.leases_lost += 1
+                    continue
+                try:
+                    os.utime(self._lease_path(index))
+                except OSError:
+                    pass
+
+    def close(self):
+        """Detiene el heartbeat y libera los leases que queden (por ejemplo, tras Ctrl-C)."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._lock:
+            held = list(self._held)
+        for index in held:
+            self.release(index)
+
+    # --- Coordinador ---
+
+    def completed_segments(self) -> dict[int, WavSegment]:
+        """
+        Para el paso de unión: {índice: WavSegment} de los IDs terminados cuyo archivo
+        existe y está completo (verificado por encabezado, como en --resume).
+        """
+        segments = {}
+        for index in range(len(self.item_ids)):
+            entry = self.done_entry(index)
+            if entry is None:
+                continue
+            segment = verify_wav_file(os.path.normpath(os.path.join(self.directory, entry["path"])), entry.get("data_size"))
+            if segment is not None:
+                segments[index] = segment
+        return segments
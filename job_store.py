@@ -0,0 +1,331 @@
+"""
+Registro de trabajos en SQLite (modo WAL): fuente de verdad del estado de cada ejecución.
+
+Cada ejecución de main.py es una fila de `runs` y cada ID a procesar una fila de
+`jobs` con su estado (pending, running, success, failed, reused), intentos,
+tiempos, ruta de salida y hash del texto. Los mensajes de error van a `events`
+(y se siguen añadiendo a logs.txt para leerlos a mano). El archivo de resultados
+es una vista de esta tabla, y la vista `run_summary` agrega cualquier ejecución:
+
+    sqlite3 tts_jobs.db "SELECT * FROM run_summary ORDER BY run_id DESC LIMIT 10"
+
+Los hilos de síntesis nunca tocan la base de datos: encolan las escrituras y un
+único hilo escritor las aplica por lotes, en una transacción por lote.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+
+DEFAULT_JOB_DB = "tts_jobs.db"
+BATCH_MAX_OPERATIONS = 500
+BATCH_MAX_DELAY = 0.2  # segundos que el escritor espera para juntar más escrituras en un lote
+WRITER_CHECK_INTERVAL = 1.0  # segundos entre comprobaciones de que el escritor sigue vivo en flush()/close()
+
+JOB_STATUSES = ("pending", "running", "success", "failed", "reused")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_name TEXT NOT NULL,
+    json_file TEXT,
+    output_file TEXT,
+    options TEXT,
+    status TEXT NOT NULL DEFAULT 'running',
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    item_index INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    duplicate_of TEXT,
+    syntheses INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cache_hits INTEGER NOT NULL DEFAULT 0,
+    queue_wait_seconds REAL NOT NULL DEFAULT 0,
+    stream_seconds REAL NOT NULL DEFAULT 0,
+    audio_seconds REAL NOT NULL DEFAULT 0,
+    output_path TEXT,
+    error TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    PRIMARY KEY (run_id, item_index)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_item ON jobs (item_id, content_hash);
+CREATE TABLE IF NOT EXISTS events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER,
+    created_at TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE VIEW IF NOT EXISTS run_summary AS
+SELECT
+    runs.run_id,
+    runs.test_name,
+    runs.status,
+    runs.started_at,
+    runs.finished_at,
+    COUNT(jobs.item_index) AS items,
+    COALESCE(SUM(jobs.status = 'success'), 0) AS successful,
+    COALESCE(SUM(jobs.status = 'failed'), 0) AS failed,
+    COALESCE(SUM(jobs.status = 'reused'), 0) AS reused,
+    COALESCE(SUM(jobs.status IN ('pending', 'running')), 0) AS unfinished,
+    COALESCE(SUM(jobs.attempts), 0) AS attempts,
+    COALESCE(SUM(jobs.audio_seconds), 0) AS audio_seconds
+FROM runs LEFT JOIN jobs USING (run_id)
+GROUP BY runs.run_id;
+"""
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Abre la base de datos en modo WAL (lectores y el escritor no se bloquean entre sí)."""
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class JobStore:
+    """
+    Estado de una ejecución en la base de datos de trabajos.
+
+    Todos los métodos de escritura se pueden llamar desde cualquier hilo: solo
+    encolan la operación. flush() espera a que lo encolado esté en disco y close()
+    además detiene el escritor. Si se indica log_path, los mensajes de log() se
+    añaden también a ese archivo (abierto una sola vez, desde el hilo escritor).
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_DB, log_path: str | None = None):
+        self.path = path
+        self.log_path = log_path
+        self.run_id = None
+        self.write_errors = 0
+        self.last_write_error = None
+        # El esquema se crea aquí para que un error de apertura se vea al construir
+        with connect(path) as connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="job-store-writer", daemon=True)
+        self._writer.start()
+
+    # --- Escritor ---
+
+    def _write_loop(self):
+        connection = None
+        log_file = None
+        try:
+            connection = connect(self.path)
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + BATCH_MAX_DELAY
+                # Se juntan escrituras hasta llenar el lote, agotar la espera o llegar a alguien esperando
+                while len(batch) < BATCH_MAX_OPERATIONS and not self._has_waiter(batch[-1]):
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                waiters = []
+                try:
+                    log_lines = []
+                    for kind, *payload in batch:
+                        if kind == "log":
+                            created_at, message = payload
+                            payload = ("INSERT INTO events (run_id, created_at, message) VALUES (?, ?, ?)", (self.run_id, created_at, message), False, None)
+                            log_lines.append(f"[{created_at}] {message}\n")
+                        if kind in ("sql", "log"):
+                            sql, params, many, future = payload
+                            try:
+                                cursor = connection.executemany(sql, params) if many else connection.execute(sql, params)
+                                if future is not None:
+                                    future.set_result(cursor.lastrowid)
+                            except Exception as e:
+                                # No solo sqlite3.Error: un parámetro inválido (p. ej. un entero
+                                # demasiado grande, OverflowError) no debe detener al escritor
+                                self._record_write_error(e)
+                                if future is not None:
+                                    future.set_exception(e)
+                        elif kind == "flush":
+                            waiters.append(payload[0])
+                        elif kind == "stop":
+                            waiters.append(payload[0])
+                            running = False
+                    try:
+                        connection.commit()
+                    except Exception as e:
+                        self._record_write_error(e)
+                    if log_lines and self.log_path:
+                        try:
+                            if log_file is None:
+                                log_file = open(self.log_path, "a", encoding="utf-8")
+                            log_file.writelines(log_lines)
+                            log_file.flush()
+                        except OSError:
+                            pass  # Si no se puede escribir al log, el mensaje sigue en la tabla events
+                finally:
+                    for waiter in waiters:
+                        waiter.set()
+        except Exception as e:
+            self._record_write_error(e)
+        finally:
+            self._fail_pending()
+            if connection is not None:
+                connection.close()
+            if log_file is not None:
+                log_file.close()
+
+    def _record_write_error(self, error: BaseException):
+        self.write_errors += 1
+        self.last_write_error = error
+
+    def _fail_pending(self):
+        """Al terminar el escritor, libera a quien espere operaciones que ya no se aplicarán."""
+        error = RuntimeError(f"El registro de trabajos {self.path} ya no acepta escrituras")
+        while True:
+            try:
+                kind, *payload = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if kind in ("flush", "stop"):
+                payload[0].set()
+            elif kind == "sql" and payload[-1] is not None:
+                payload[-1].set_exception(error)
+
+    @staticmethod
+    def _has_waiter(operation: tuple) -> bool:
+        """Indica si alguien espera a esta operación (flush, stop o una escritura con resultado)."""
+        kind = operation[0]
+        return kind in ("flush", "stop") or (kind == "sql" and operation[-1] is not None)
+
+    def _execute(self, sql: str, params=(), many: bool = False, wait: bool = False):
+        future = Future() if wait else None
+        self._queue.put(("sql", sql, params, many, future))
+        while future is not None:
+            try:
+                return future.result(timeout=WRITER_CHECK_INTERVAL)
+            except FutureTimeoutError:
+                if not self._writer.is_alive() and not future.done():
+                    raise RuntimeError(f"El registro de trabajos {self.path} ya no acepta escrituras")
+        return None
+
+    def _wait_writer(self, done: threading.Event):
+        """Espera a que el escritor marque `done`, sin bloquearse si el hilo terminó antes."""
+        while not done.wait(WRITER_CHECK_INTERVAL):
+            if not self._writer.is_alive():
+                return
+
+    def flush(self):
+        """Espera a que todas las escrituras encoladas estén confirmadas."""
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        self._wait_writer(done)
+
+    def close(self):
+        """Confirma lo pendiente y detiene el hilo escritor."""
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("stop", done))
+        self._wait_writer(done)
+        self._writer.join()
+
+    # --- Ejecución e IDs ---
+
+    def start_run(self, test_name: str, json_file: str, output_file: str, options: dict) -> int:
+        """Registra el inicio de una ejecución y devuelve su run_id."""
+        self.run_id = self._execute(
+            "INSERT INTO runs (test_name, json_file, output_file, options, started_at) VALUES (?, ?, ?, ?, ?)",
+            (test_name, json_file, output_file, json.dumps(options, ensure_ascii=False), _now()),
+            wait=True,
+        )
+        return self.run_id
+
+    def finish_run(self, status: str = "completed"):
+        self._execute(
+            "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+            (status, _now(), self.run_id),
+        )
+
+    def add_items(self, items: list[tuple[int, str, str, str]], duplicate_of: dict[int, str] | None = None):
+        """Registra los IDs de la ejecución como pendientes: (índice, id, título, hash del texto)."""
+        duplicate_of = duplicate_of or {}
+        self._execute(
+            "INSERT INTO jobs (run_id, item_index, item_id, title, content_hash, duplicate_of) VALUES (?, ?, ?, ?, ?, ?)",
+            [(self.run_id, index, item_id, title, text_hash, duplicate_of.get(index)) for index, item_id, title, text_hash in items],
+            many=True,
+        )
+
+    def record_synthesis(self, metrics):
+        """
+        Acumula en su ID (por metrics.item_index, ya que un ID puede repetirse en el
+        JSON) una síntesis terminada (un ItemMetrics; puede ser un fragmento) y lo
+        marca como en curso si seguía pendiente.
+        """
+        started_at = datetime.fromtimestamp(time.time() - (time.monotonic() - metrics.started_at)).strftime("%Y-%m-%d %H:%M:%S")
+        self._execute(
+            "UPDATE jobs SET"
+            " status = CASE WHEN status = 'pending' THEN 'running' ELSE status END,"
+            " syntheses = syntheses + 1, attempts = attempts + ?, cache_hits = cache_hits + ?,"
+            " queue_wait_seconds = queue_wait_seconds + ?, stream_seconds = stream_seconds + ?,"
+            " audio_seconds = audio_seconds + ?, started_at = COALESCE(started_at, ?)"
+            " WHERE run_id = ? AND item_index = ?",
+            (
+                metrics.attempts, int(metrics.cache_hit), metrics.queue_wait_seconds, metrics.stream_seconds,
+                metrics.audio_seconds, started_at, self.run_id, metrics.item_index,
+            ),
+        )
+
+    def finish_item(self, index: int, status: str, output_path: str | None = None, error: str | None = None):
+        """Estado final de un ID (success, failed o reused)."""
+        self._execute(
+            "UPDATE jobs SET status = ?, output_path = COALESCE(?, output_path), error = ?, finished_at = ?"
+            " WHERE run_id = ? AND item_index = ?",
+            (status, output_path, error, _now(), self.run_id, index),
+        )
+
+    def set_output_path(self, index: int, output_path: str):
+        """Actualiza la ruta de salida de un ID (por ejemplo, tras codificarlo a FLAC u Opus)."""
+        self._execute(
+            "UPDATE jobs SET output_path = ? WHERE run_id = ? AND item_index = ?",
+            (output_path, self.run_id, index),
+        )
+
+    def log(self, message: str):
+        """Guarda un mensaje de error con timestamp (y lo añade a log_path, si se indicó)."""
+        self._queue.put(("log", _now(), message))
+
+    # --- Lectura ---
+
+    def items(self) -> list[dict]:
+        """Filas de los IDs de la ejecución actual, en el orden del JSON (tras confirmar lo pendiente)."""
+        self.flush()
+        connection = connect(self.path)
+        try:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute("SELECT * FROM jobs WHERE run_id = ? ORDER BY item_index", (self.run_id,)).fetchall()
+        finally:
+            connection.close()
+        return [dict(row) for row in rows]
+
+    def ids_by_status(self) -> dict[str, list[str]]:
+        """IDs de la ejecución actual agrupados por estado."""
+        grouped = {status: [] for status in JOB_STATUSES}
+        for row in self.items():
+            grouped.setdefault(row["status"], []).append(row["item_id"])
+        return grouped
@@ -1,18 +1,25 @@
 #!/usr/bin/env python3
 """
 Script para combinar múltiples archivos WAV en un solo archivo WAV final.
-Reutiliza el método de unión del script principal.
+Los encabezados se leen con wav_io (RIFF/RF64) y el audio se copia entre archivos
+sin cargarlo en memoria.
 """
 
 import argparse
 import glob
+import io
 import os
 import re
-import struct
 import time
 from datetime import datetime
 from pathlib import Path
 
+from audio_encode import FORMAT_EXTENSIONS, OUTPUT_FORMATS, SOUNDFILE_AVAILABLE, encode_wav_file, encoded_path
+from chapter_index import ChapterIndex, write_chapter_files
+from pcm_convert import NUMPY_AVAILABLE, check_supported, convert_wav_data, converted_data_size, make_params
+from silence_trim import DEFAULT_THRESHOLD_DB, trim_info
+from wav_io import build_wav_header, copy_file_data, preallocate_file, read_wav_info, read_wav_info_from, silence_bytes
+
 
 def log_error(message):
     """Guarda errores en el archivo logs.txt con timestamp."""
@@ -35,90 +42,37 @@ def save_binary_file(file_name, data):
         log_error(f"Error al guardar el archivo {file_name}: {e}")
 
 
+# parse_wav_header, extract_audio_data y load_wav_file trabajan con el archivo entero
+# en memoria; join_wav_files ya no los usa, pero se conservan para quien los importe.
+
 def parse_wav_header(wav_data: bytes) -> dict:
     """
-    Extrae información del encabezado WAV.
+    Extrae información del encabezado WAV (RIFF o RF64).
     Retorna un diccionario con los parámetros del audio.
     """
-    if len(wav_data) < 44:
-        raise ValueError("Archivo WAV demasiado pequeño o corrupto")
-    
-    # Verificar firma RIFF
-    if wav_data[:4] != b'RIFF':
-        raise ValueError("No es un archivo WAV válido (falta RIFF)")
-    
-    # Verificar formato WAVE
-    if wav_data[8:12] != b'WAVE':
-        raise ValueError("No es un archivo WAV válido (falta WAVE)")
-    
-    # Buscar el chunk 'fmt '
-    fmt_pos = wav_data.find(b'fmt ')
-    if fmt_pos == -1:
-        raise ValueError("No se encontró el chunk 'fmt ' en el archivo WAV")
-    
-    # Leer parámetros del fmt chunk (después de 'fmt ' + 4 bytes de tamaño)
-    fmt_data_start = fmt_pos + 8
-    
-    # Desempacar los datos del formato
-    format_data = struct.unpack('<HHIIHH', wav_data[fmt_data_start:fmt_data_start + 16])
-    
-    audio_format = format_data[0]
-    num_channels = format_data[1]
-    sample_rate = format_data[2]
-    byte_rate = format_data[3]
-    block_align = format_data[4]
-    bits_per_sample = format_data[5]
-    
-    return {
-        'audio_format': audio_format,
-        'num_channels': num_channels,
-        'sample_rate': sample_rate,
-        'byte_rate': byte_rate,
-        'block_align': block_align,
-        'bits_per_sample': bits_per_sample
-    }
+    return read_wav_info_from(io.BytesIO(wav_data), None, len(wav_data)).params()
 
 
 def extract_audio_data(wav_data: bytes) -> bytes:
     """
     Extrae solo los datos de audio de un archivo WAV (sin encabezados).
     """
-    # Buscar el chunk 'data'
-    data_pos = wav_data.find(b'data')
-    if data_pos == -1:
-        raise ValueError("No se encontró el chunk 'data' en el archivo WAV")
-    
-    # Los datos de audio comienzan después de 'data' + 4 bytes de tamaño
-    data_size_pos = data_pos + 4
-    data_size = struct.unpack('<I', wav_data[data_size_pos:data_size_pos + 4])[0]
-    audio_data_start = data_size_pos + 4
-    
-    return wav_data[audio_data_start:audio_data_start + data_size]
+    info = read_wav_info_from(io.BytesIO(wav_data), None, len(wav_data))
+    return wav_data[info.data_offset:info.data_offset + info.data_size]
 
 
 def create_wav_header(audio_data_size: int, params: dict) -> bytes:
     """
     Crea un encabezado WAV con los parámetros especificados.
+    Si el audio supera el límite de 4 GB de RIFF, el encabezado es RF64.
     """
-    chunk_size = 36 + audio_data_size
-    
-    header = struct.pack(
-        "<4sI4s4sIHHIIHH4sI",
-        b"RIFF",
-        chunk_size,
-        b"WAVE",
-        b"fmt ",
-        16,  # Tamaño del fmt chunk
-        params['audio_format'],
-        params['num_channels'],
+    return build_wav_header(
+        audio_data_size,
         params['sample_rate'],
-        params['byte_rate'],
-        params['block_align'],
         params['bits_per_sample'],
-        b"data",
-        audio_data_size
+        params['num_channels'],
+        params['audio_format'],
     )
-    return header
 
 
 def load_wav_file(file_path: str) -> tuple[bytes, dict]:
@@ -126,32 +80,68 @@ def load_wav_file(file_path: str) -> tuple[bytes, dict]:
     Carga un archivo WAV y retorna los datos de audio y sus parámetros.
     """
     try:
-        with open(file_path, "rb") as f:
-            wav_data = f.read()
-        
-        params = parse_wav_header(wav_data)
-        audio_data = extract_audio_data(wav_data)
-        
-        return audio_data, params
+        wav_info = read_wav_info(file_path)
+        with open(file_path, "rb") as src:
+            src.seek(wav_info.data_offset)
+            audio_data = src.read(wav_info.data_size)
+        return audio_data, wav_info.params()
     except Exception as e:
         raise Exception(f"Error al cargar {file_path}: {e}")
 
 
-def join_wav_files(input_files: list, output_file: str, force_params: dict = None):
+def join_wav_files(
+    input_files: list,
+    output_file: str,
+    force_params: dict = None,
+    trim_silence: bool = False,
+    silence_threshold_db: float = DEFAULT_THRESHOLD_DB,
+    gap_ms: float = 0,
+    cue: bool = False,
+    ffmetadata: bool = False,
+    index_format: str = "wav",
+):
     """
     Une múltiples archivos WAV en un solo archivo.
     
+    Solo se leen los encabezados (chunks RIFF/RF64) de los archivos de entrada; el audio se copia por
+    offsets directamente en el kernel (copy_file_range/sendfile, o un buffer fijo
+    si no están disponibles), por lo que la memoria usada no depende del número ni
+    del tamaño de los archivos.
+    
+    Los archivos con otra frecuencia, número de canales o bits por muestra se
+    convierten al formato de referencia con NumPy (en bloques, sobre un memmap)
+    en lugar de concatenar su PCM tal cual. Sin NumPy se concatenan con una advertencia.
+    
     Args:
         input_files: Lista de rutas a archivos WAV
         output_file: Ruta del archivo WAV de salida
         force_params: Parámetros a forzar (opcional). Si None, usa los del primer archivo.
+            Puede ser parcial (por ejemplo, solo 'sample_rate'): el resto se toma del primer archivo.
+        trim_silence: Si True, recorta el silencio inicial y final de cada archivo (requiere NumPy).
+        silence_threshold_db: dB por debajo del pico de cada archivo que se consideran silencio.
+        gap_ms: Silencio en milisegundos insertado entre archivos consecutivos.
+        cue: Si True, escribe también una hoja CUE con un capítulo por archivo.
+        ffmetadata: Si True, escribe también los capítulos en formato ffmetadata de ffmpeg.
+        index_format: Formato del audio al que se refiere el índice de capítulos (por ejemplo, 'opus'
+            si el WAV se codificará después); los offsets en bytes solo se incluyen para 'wav'.
+    
+    Si falla la escritura del archivo combinado, se elimina el archivo parcial y se
+    propaga la excepción.
     """
     if not input_files:
         raise ValueError("No se proporcionaron archivos de entrada")
     
-    combined_audio_data = b""
-    reference_params = force_params
+    # (WavInfo, convertir?, tamaño de salida) de cada archivo, en orden
+    data_ranges = []
+    total_data_size = 0
+    reference_params = None
     incompatible_files = []
+    converted_files = 0
+    trimmed_bytes = 0
+    
+    if trim_silence and not NUMPY_AVAILABLE:
+        print("Advertencia: --trim-silence requiere NumPy (pip install numpy); se unen los archivos sin recortar")
+        trim_silence = False
     
     print(f"Procesando {len(input_files)} archivos WAV...")
     
@@ -159,15 +149,34 @@ def join_wav_files(input_files: list, output_file: str, force_params: dict = Non
         try:
             print(f"Procesando archivo {i+1}/{len(input_files)}: {os.path.basename(file_path)}")
             
-            audio_data, params = load_wav_file(file_path)
+            try:
+                wav_info = read_wav_info(file_path)
+            except Exception as e:
+                raise Exception(f"Error al cargar {file_path}: {e}")
+            params = wav_info.params()
+            
+            if trim_silence:
+                try:
+                    trimmed_info = trim_info(wav_info, threshold_db=silence_threshold_db)
+                    trimmed_bytes += wav_info.data_size - trimmed_info.data_size
+                    wav_info = trimmed_info
+                except ValueError as e:
+                    print(f"  ⚠️  ADVERTENCIA: No se recorta el silencio ({e})")
             
             # Usar el primer archivo como referencia si no se especificaron parámetros
             if reference_params is None:
-                reference_params = params
-                print(f"Usando parámetros de referencia del primer archivo:")
-                print(f"  - Canales: {params['num_channels']}")
-                print(f"  - Frecuencia de muestreo: {params['sample_rate']} Hz")
-                print(f"  - Bits por muestra: {params['bits_per_sample']}")
+                reference_params = {**params, **(force_params or {})}
+                reference_params = make_params(
+                    reference_params['sample_rate'],
+                    reference_params['bits_per_sample'],
+                    reference_params['num_channels'],
+                    reference_params['audio_format'],
+                )
+                origin = "especificados" if force_params else "del primer archivo"
+                print(f"Usando parámetros de referencia {origin}:")
+                print(f"  - Canales: {reference_params['num_channels']}")
+                print(f"  - Frecuencia de muestreo: {reference_params['sample_rate']} Hz")
+                print(f"  - Bits por muestra: {reference_params['bits_per_sample']}")
             
             # Verificar compatibilidad
             compatibility_issues = []
@@ -177,22 +186,39 @@ def join_wav_files(input_files: list, output_file: str, force_params: dict = Non
                 compatibility_issues.append(f"frecuencia ({params['sample_rate']} vs {reference_params['sample_rate']})")
             if params['bits_per_sample'] != reference_params['bits_per_sample']:
                 compatibility_issues.append(f"bits por muestra ({params['bits_per_sample']} vs {reference_params['bits_per_sample']})")
+            if params['audio_format'] != reference_params['audio_format']:
+                compatibility_issues.append(f"formato ({params['audio_format']} vs {reference_params['audio_format']})")
             
+            convert = False
             if compatibility_issues:
-                incompatible_files.append(f"{os.path.basename(file_path)}: {', '.join(compatibility_issues)}")
-                print(f"  ⚠️  ADVERTENCIA: Incompatibilidad detectada - {', '.join(compatibility_issues)}")
-                log_error(f"Archivo incompatible {file_path}: {', '.join(compatibility_issues)}")
+                try:
+                    if not NUMPY_AVAILABLE:
+                        raise RuntimeError("NumPy no está instalado")
+                    check_supported(params)
+                    check_supported(reference_params)
+                    convert = True
+                except (RuntimeError, ValueError) as e:
+                    incompatible_files.append(f"{os.path.basename(file_path)}: {', '.join(compatibility_issues)}")
+                    print(f"  ⚠️  ADVERTENCIA: Incompatibilidad detectada y no se puede convertir ({e}) - {', '.join(compatibility_issues)}")
+                    log_error(f"Archivo incompatible {file_path}: {', '.join(compatibility_issues)} (sin conversión: {e})")
             
-            # Agregar los datos de audio (incluso si hay incompatibilidades)
-            combined_audio_data += audio_data
-            print(f"  ✓ Agregado ({len(audio_data):,} bytes)")
+            if convert:
+                output_size = converted_data_size(wav_info, reference_params)
+                converted_files += 1
+                print(f"  ↻ Se convertirá al formato de referencia - {', '.join(compatibility_issues)}")
+            else:
+                # Agregar los datos de audio tal cual (incluso si hay incompatibilidades no convertibles)
+                output_size = wav_info.data_size
+            data_ranges.append((wav_info, convert, output_size))
+            total_data_size += output_size
+            print(f"  ✓ Agregado ({output_size:,} bytes)")
             
         except Exception as e:
             print(f"  ❌ Error al procesar {file_path}: {e}")
             log_error(f"Error al procesar {file_path}: {e}")
             continue
     
-    if not combined_audio_data:
+    if not data_ranges:
         raise ValueError("No se pudieron procesar archivos válidos")
     
     # Mostrar advertencias de compatibilidad
@@ -201,13 +227,19 @@ def join_wav_files(input_files: list, output_file: str, force_params: dict = Non
         for warning in incompatible_files:
             print(f"  - {warning}")
         print("Los archivos se combinaron de todas formas, pero el resultado podría tener problemas de reproducción.\n")
+    if converted_files:
+        print(f"Archivos convertidos al formato de referencia: {converted_files}")
+    if trim_silence:
+        print(f"Silencio recortado: {trimmed_bytes:,} bytes de los archivos de entrada")
+    
+    gap_size = int(reference_params['sample_rate'] * gap_ms / 1000) * reference_params['block_align'] if gap_ms > 0 else 0
+    total_data_size += gap_size * (len(data_ranges) - 1)
     
     # Crear el archivo WAV final
     print(f"Creando archivo WAV combinado...")
-    print(f"Tamaño total de datos de audio: {len(combined_audio_data):,} bytes")
+    print(f"Tamaño total de datos de audio: {total_data_size:,} bytes")
     
-    final_wav_header = create_wav_header(len(combined_audio_data), reference_params)
-    final_wav_data = final_wav_header + combined_audio_data
+    final_wav_header = create_wav_header(total_data_size, reference_params)
     
     # Verificar permisos de escritura
     try:
@@ -222,11 +254,54 @@ def join_wav_files(input_files: list, output_file: str, force_params: dict = Non
         print(f"Advertencia: Problemas de permisos, guardando en: {backup_path}")
         output_file = backup_path
     
-    save_binary_file(output_file, final_wav_data)
+    header_size = len(final_wav_header)
+    chapters = ChapterIndex(
+        reference_params['sample_rate'],
+        reference_params['bits_per_sample'],
+        reference_params['num_channels'],
+        header_size,
+    )
+    
+    try:
+        with open(output_file, "wb") as out:
+            # El tamaño final se conoce de antemano: se reserva todo el archivo de una vez
+            preallocate_file(out, len(final_wav_header) + total_data_size)
+            out.write(final_wav_header)
+            position = len(final_wav_header)
+            for index, (wav_info, convert, _output_size) in enumerate(data_ranges):
+                if index and gap_size:
+                    if reference_params['bits_per_sample'] == 8:
+                        # En PCM de 8 bits (sin signo) el silencio es 0x80, no cero
+                        out.seek(position)
+                        out.write(silence_bytes(gap_size, 8))
+                    # Con más bits el archivo está preasignado: saltar el hueco deja ceros (silencio) sin escribirlos
+                    position += gap_size
+                start = position
+                if convert:
+                    out.seek(position)
+                    position += convert_wav_data(wav_info, reference_params, out)
+                else:
+                    with open(wav_info.path, "rb") as src:
+                        position += copy_file_data(src, wav_info.data_offset, wav_info.data_size, out, position)
+                stem = Path(wav_info.path).stem
+                chapters.add(stem, stem, start - header_size, position - start)
+            out.truncate(position)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error al guardar el archivo {output_file}")
+        log_error(f"Error al guardar el archivo {output_file}: {e}")
+        # No dejar un WAV a medio escribir que parezca un resultado válido
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+        raise
+    print(f"Archivo guardado en: {output_file}")
+    for path in write_chapter_files(chapters, encoded_path(output_file, index_format), cue=cue, ffmetadata=ffmetadata):
+        print(f"Índice de capítulos guardado en: {path}")
     
     # Calcular duración aproximada
     if reference_params['sample_rate'] > 0 and reference_params['block_align'] > 0:
-        duration_seconds = len(combined_audio_data) / (reference_params['sample_rate'] * reference_params['block_align'])
+        duration_seconds = total_data_size / (reference_params['sample_rate'] * reference_params['block_align'])
         duration_minutes = duration_seconds / 60
         print(f"Duración aproximada: {duration_minutes:.1f} minutos ({duration_seconds:.1f} segundos)")
     
@@ -243,6 +318,8 @@ Ejemplos de uso:
   %(prog)s *.wav -o all_combined.wav
   %(prog)s folder/*.wav -o output.wav
   %(prog)s audio1.wav audio2.wav  # Salida automática: audio1_combined.wav
+  %(prog)s *.wav -o output.wav --target-rate 24000 --target-bits 16 --channels 1
+  %(prog)s *.wav -o libro.opus --format opus
         """
     )
     
@@ -269,8 +346,82 @@ Ejemplos de uso:
         help="Ordenar archivos numéricamente (útil para archivos como file1.wav, file2.wav, ...)"
     )
     
+    parser.add_argument(
+        "--target-rate",
+        type=int,
+        help="Frecuencia de muestreo de salida en Hz (por defecto: la del primer archivo). Los archivos distintos se remuestrean."
+    )
+    
+    parser.add_argument(
+        "--target-bits",
+        type=int,
+        choices=[8, 16, 24, 32],
+        help="Bits por muestra de salida (por defecto: los del primer archivo)."
+    )
+    
+    parser.add_argument(
+        "--channels",
+        type=int,
+        help="Número de canales de salida (por defecto: los del primer archivo). Se mezclan o duplican canales según haga falta."
+    )
+    
+    parser.add_argument(
+        "--trim-silence",
+        action="store_true",
+        help="Recortar el silencio inicial y final de cada archivo antes de unirlo (requiere NumPy)."
+    )
+    
+    parser.add_argument(
+        "--silence-threshold-db",
+        type=float,
+        default=DEFAULT_THRESHOLD_DB,
+        help=f"Con --trim-silence, dB por debajo del pico de cada archivo que se consideran silencio (por defecto: {DEFAULT_THRESHOLD_DB:g})."
+    )
+    
+    parser.add_argument(
+        "--gap-ms",
+        type=float,
+        default=0,
+        help="Silencio en milisegundos insertado entre archivos consecutivos (por defecto: 0)."
+    )
+    
+    parser.add_argument(
+        "--cue",
+        action="store_true",
+        help="Además del índice de capítulos JSON, escribir una hoja CUE con un capítulo por archivo."
+    )
+    
+    parser.add_argument(
+        "--ffmetadata",
+        action="store_true",
+        help="Además del índice de capítulos JSON, escribir los capítulos en formato ffmetadata de ffmpeg."
+    )
+    
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="wav",
+        help="Formato del archivo de salida: wav (por defecto), flac u opus. Requiere soundfile para flac/opus."
+    )
+    
+    parser.add_argument(
+        "--compression-level",
+        type=float,
+        help="Nivel de compresión de libsndfile entre 0 y 1 para flac/opus (en opus, más alto es menos bitrate)."
+    )
+    
+    parser.add_argument(
+        "--keep-wav",
+        action="store_true",
+        help="Con --format flac/opus, conserva también el WAV combinado."
+    )
+    
     args = parser.parse_args()
     
+    if args.format != "wav" and not SOUNDFILE_AVAILABLE:
+        print(f"Error: --format {args.format} requiere la biblioteca soundfile (pip install soundfile).")
+        return 1
+    
     # Expandir patrones glob y recopilar todos los archivos
     all_files = []
     for pattern in args.input_files:
@@ -336,7 +487,10 @@ Ejemplos de uso:
     
     # Asegurar extensión .wav (convertir a string si es necesario)
     output_file_str = str(output_file)
-    if not output_file_str.lower().endswith('.wav'):
+    if args.format != "wav" and output_file_str.lower().endswith(FORMAT_EXTENSIONS[args.format]):
+        # El WAV es intermedio: se escribe junto a la salida pedida y después se codifica
+        output_file = os.path.splitext(output_file_str)[0] + '.wav'
+    elif not output_file_str.lower().endswith('.wav'):
         output_file = output_file_str + '.wav'
     else:
         output_file = output_file_str
@@ -348,7 +502,32 @@ Ejemplos de uso:
     print(f"Salida: {output_file}\n")
     
     try:
-        final_output = join_wav_files(wav_files, output_file)
+        force_params = {}
+        if args.target_rate:
+            force_params['sample_rate'] = args.target_rate
+        if args.target_bits:
+            force_params['bits_per_sample'] = args.target_bits
+            force_params['audio_format'] = 1  # PCM entero
+        if args.channels:
+            force_params['num_channels'] = args.channels
+        final_output = join_wav_files(
+            wav_files,
+            output_file,
+            force_params or None,
+            trim_silence=args.trim_silence,
+            silence_threshold_db=args.silence_threshold_db,
+            gap_ms=args.gap_ms,
+            cue=args.cue,
+            ffmetadata=args.ffmetadata,
+            index_format=args.format,
+        )
+        if args.format != "wav":
+            encoded_output = encoded_path(final_output, args.format)
+            print(f"Codificando a {args.format}: {encoded_output}")
+            encode_wav_file(final_output, encoded_output, args.format, args.compression_level)
+            if not args.keep_wav:
+                os.remove(final_output)
+            final_output = encoded_output
         print(f"\n✅ Combinación completada exitosamente!")
         print(f"Archivo final: {final_output}")
         
@@ -0,0 +1,183 @@
+"""
+Lectura incremental del archivo de entrada: un array JSON [{'id', 'title', 'content'}, ...]
+o JSONL (un objeto por línea).
+
+Los elementos se decodifican y validan uno a uno a medida que se leen (el array se
+lee por bloques con JSONDecoder.raw_decode), así que el primero puede enviarse a
+sintetizar antes de terminar de leer el archivo y nunca se tiene el documento
+entero en memoria. El filtro de --ids se aplica durante la lectura: el contenido
+de los elementos descartados no se conserva.
+"""
+
+import json
+from typing import Iterable, Iterator, TextIO
+
+
+READ_BLOCK_SIZE = 1 << 20  # caracteres leídos por bloque del array
+REQUIRED_FIELDS = ("id", "title", "content")
+
+
+class InputFormatError(ValueError):
+    """El archivo se pudo decodificar pero no tiene el formato esperado (el mensaje es para el usuario)."""
+
+
+class TextItem:
+    """Un elemento de la entrada: id, título y contenido."""
+
+    __slots__ = ("item_id", "title", "content")
+
+    def __init__(self, item_id: str, title: str, content: str):
+        self.item_id = item_id
+        self.title = title
+        self.content = content
+
+    def __iter__(self):
+        # Permite desempaquetar como la tupla (id, título, contenido) que usan los motores
+        return iter((self.item_id, self.title, self.content))
+
+    def __repr__(self):
+        return f"TextItem({self.item_id!r}, {self.title!r}, {len(self.content)} caracteres)"
+
+
+def validate_item(item, number: int) -> TextItem:
+    """Valida el elemento número `number` (desde 1) y lo convierte en TextItem."""
+    if not isinstance(item, dict):
+        raise InputFormatError(f"El elemento {number} debe ser un objeto con 'id', 'title' y 'content'.")
+    for field in REQUIRED_FIELDS:
+        if field not in item:
+            raise InputFormatError(f"El elemento {number} debe tener la propiedad '{field}'.")
+    if not isinstance(item["id"], str) or not isinstance(item["title"], str) or not isinstance(item["content"], str):
+        raise InputFormatError(f"'id', 'title' y 'content' del elemento {number} deben ser strings.")
+    return TextItem(item["id"], item["title"], item["content"])
+
+
+class _BlockBuffer:
+    """Texto leído por bloques con una posición de lectura; descarta lo ya consumido."""
+
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, minimum: int = READ_BLOCK_SIZE) -> bool:
+        """Añade al menos `minimum` caracteres (o hasta el final). Devuelve False si ya no hay más."""
+        if self.eof:
+            return False
+        block = self.file.read(max(minimum, READ_BLOCK_SIZE))
+        if not block:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter que no es espacio ('' al final del archivo), sin consumirlo."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read_more():
+                return ""
+
+
+def iter_json_array(file: TextIO) -> Iterator[object]:
+    """Decodifica un array JSON elemento a elemento sin cargar el archivo entero."""
+    decoder = json.JSONDecoder()
+    buffer = _BlockBuffer(file)
+    if buffer.peek() != "[":
+        raise InputFormatError("El archivo JSON debe contener un array de objetos.")
+    buffer.pos += 1
+    if buffer.peek() == "]":
+        return
+    while True:
+        if not buffer.peek():
+            raise json.JSONDecodeError("Fin del archivo dentro del array", buffer.text, buffer.pos)
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer.text, buffer.pos)
+                # Un número al final del bloque (o cortado antes de '.', 'e') podría seguir en
+                # el siguiente; un objeto, un array o un string se entregan sin esperar más
+                if buffer.eof or buffer.text[end - 1] in '}]"' or (end < len(buffer.text) and buffer.text[end] not in ".eE"):
+                    break
+            except json.JSONDecodeError:
+                # El elemento está incompleto: se lee al menos otro tanto (coste lineal
+                # aunque un elemento ocupe muchos bloques)
+                if buffer.eof:
+                    raise
+            if not buffer.read_more(len(buffer.text) - buffer.pos):
+                value, end = decoder.raw_decode(buffer.text, buffer.pos)
+                break
+        buffer.pos = end
+        yield value
+        separator = buffer.peek()
+        buffer.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise json.JSONDecodeError("Se esperaba ',' o ']'", buffer.text, buffer.pos - 1)
+
+
+def iter_jsonl(file: TextIO) -> Iterator[object]:
+    """Decodifica un objeto JSON por línea (se ignoran las líneas vacías)."""
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def is_jsonl(file: TextIO) -> bool:
+    """
+    Indica si el archivo es JSONL: su primera línea no vacía es un objeto JSON completo.
+    Un objeto repartido en varias líneas no lo es (no es JSONL ni el array esperado).
+    Deja el archivo al principio.
+    """
+    try:
+        for line in file:
+            if line.strip():
+                if not line.lstrip().startswith("{"):
+                    return False
+                try:
+                    return isinstance(json.loads(line), dict)
+                except json.JSONDecodeError:
+                    return False
+        return False
+    finally:
+        file.seek(0)
+
+
+def iter_raw_items(file: TextIO) -> Iterator[object]:
+    """Elementos sin validar de un array JSON o de JSONL, según la primera línea del archivo."""
+    if is_jsonl(file):
+        return iter_jsonl(file)
+    return iter_json_array(file)
+
+
+class InputReader:
+    """
+    Itera los elementos válidos de la entrada, en orden, aplicando el filtro de IDs.
+
+    Se lee una sola vez. Tras recorrerlo, found_ids tiene los IDs seleccionados
+    (para avisar de los de target_ids que no aparecieron) y total_read el número de
+    elementos leídos. Los errores de formato se lanzan como InputFormatError y los de
+    sintaxis como json.JSONDecodeError, en el elemento donde aparecen.
+    """
+
+    def __init__(self, path: str, target_ids: set[str] | None = None):
+        self.path = path
+        self.target_ids = target_ids
+        self.found_ids: set[str] = set()
+        self.total_read = 0
+
+    def __iter__(self) -> Iterator[TextItem]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            yield from self._select(iter_raw_items(f))
+
+    def _select(self, raw_items: Iterable[object]) -> Iterator[TextItem]:
+        for raw in raw_items:
+            self.total_read += 1
+            item = validate_item(raw, self.total_read)
+            if self.target_ids is None or item.item_id in self.target_ids:
+                self.found_ids.add(item.item_id)
+                yield item
@@ -0,0 +1,321 @@
+"""
+Pool de API keys (o proyectos) para repartir la carga entre varias cuotas.
+
+KeyPoolBackend implementa la interfaz de TTSBackend sobre varios backends, uno por
+key. Cada llamada va a la key sana con menos carga (menos espera de su cupo de
+peticiones por minuto y menos streams en curso). Una key que devuelve 429 queda
+fuera del reparto durante un enfriamiento (el indicado por el servidor o uno
+creciente), y una key rechazada (401/403) se retira para el resto de la ejecución.
+Si el 429 llega antes del primer chunk y queda otra key sana con cupo, la llamada se
+repite con ella de inmediato, sin consumir un reintento ni reducir la concurrencia global.
+
+Las esperas de una key (enfriamiento o cupo por minuto) se hacen en wait_until_ready()
+/ await_ready(), que el pipeline llama antes de ocupar un hueco del limitador global:
+la key queda reservada para el siguiente stream del mismo hilo o tarea, y mientras
+tanto el hueco sigue libre para otros workers.
+"""
+
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from typing import AsyncIterator, Iterator
+
+from rate_limit import is_rate_limit_error
+from retry_policy import server_retry_after
+
+
+DEFAULT_KEY_COOLDOWN = 30.0  # segundos sin usar una key tras un 429 sin indicación del servidor
+MAX_KEY_COOLDOWN = 900.0
+REJECTED_KEY_STATUSES = {"PERMISSION_DENIED", "UNAUTHENTICATED"}
+
+
+def load_api_keys(path: str | None = None, env_value: str | None = None) -> list[str]:
+    """
+    Lee las keys de un archivo (una por línea; se ignoran líneas vacías y comentarios #)
+    y/o de una variable de entorno separada por comas o espacios. Sin duplicados, en orden.
+    """
+    keys = []
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    keys.append(line)
+    if env_value:
+        keys.extend(key for key in re.split(r"[\s,]+", env_value) if key)
+    return list(dict.fromkeys(keys))
+
+
+def mask_key(key: str) -> str:
+    """Etiqueta para logs y resultados sin exponer la key."""
+    return f"...{key[-4:]}" if len(key) > 4 else "..."
+
+
+def _is_rejected_key_error(exc: BaseException) -> bool:
+    """Indica si el error significa que la key no sirve (no autorizada o sin permisos)."""
+    code = getattr(exc, "code", None)
+    status = getattr(exc, "status", None)
+    return code in (401, 403) or (isinstance(status, str) and status in REJECTED_KEY_STATUSES)
+
+
+class KeyState:
+    """Estado y contadores de una key del pool."""
+
+    __slots__ = (
+        "label",
+        "backend",
+        "in_flight",
+        "requests",
+        "successes",
+        "rate_limited",
+        "errors",
+        "consecutive_rate_limited",
+        "cooldown_until",
+        "disabled",
+        "tokens",
+        "last_refill",
+    )
+
+    def __init__(self, label: str, backend, capacity: float):
+        self.label = label
+        self.backend = backend
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.consecutive_rate_limited = 0
+        self.cooldown_until = 0.0
+        self.disabled = False
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+
+
+class KeyPoolBackend:
+    """
+    Backend que reparte las llamadas entre varios backends (uno por API key).
+
+    requests_per_minute_per_key limita las peticiones de cada key (0 = sin límite);
+    la espera de ese cupo cuenta como carga al elegir key.
+    """
+
+    name = "gemini-pool"
+
+    def __init__(
+        self,
+        backends: list[tuple[str, object]],
+        requests_per_minute_per_key: float = 0,
+        cooldown: float = DEFAULT_KEY_COOLDOWN,
+        max_cooldown: float = MAX_KEY_COOLDOWN,
+    ):
+        if not backends:
+            raise ValueError("El pool necesita al menos una key")
+        self.cache_identity = backends[0][1].cache_identity
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._rate = requests_per_minute_per_key / 60.0 if requests_per_minute_per_key > 0 else 0.0
+        self._capacity = max(1.0, requests_per_minute_per_key / 60.0)
+        self._keys = [KeyState(label, backend, self._capacity) for label, backend in backends]
+        self._lock = threading.Lock()
+        # Key reservada por wait_until_ready()/await_ready() para el próximo stream (por hilo o tarea)
+        self._reserved = contextvars.ContextVar(f"key_pool_reserved_{id(self)}", default=None)
+
+    def _token_wait(self, state: KeyState, now: float) -> float:
+        """Segundos hasta que la key tenga cupo (sin consumirlo). Requiere el lock."""
+        if not self._rate:
+            return 0.0
+        state.tokens = min(self._capacity, state.tokens + (now - state.last_refill) * self._rate)
+        state.last_refill = now
+        return 0.0 if state.tokens >= 1 else (1 - state.tokens) / self._rate
+
+    def _acquire(self, exclude: set[int], immediate: bool = False) -> tuple[int | None, float]:
+        """
+        Elige la key sana con menos carga y la reserva. Devuelve (índice, espera): la
+        espera de su cupo por minuto, o (None, segundos hasta que acabe el primer
+        enfriamiento) si ahora no hay ninguna disponible. Con immediate=True solo
+        sirve una key con cupo ya (si no hay, devuelve (None, 0)). Sin keys utilizables, lanza.
+        """
+        with self._lock:
+            now = time.monotonic()
+            usable = [n for n, state in enumerate(self._keys) if not state.disabled and n not in exclude]
+            if not usable:
+                raise RuntimeError("No queda ninguna API key utilizable en el pool")
+            healthy = [n for n in usable if self._keys[n].cooldown_until <= now]
+            if immediate:
+                healthy = [n for n in healthy if self._token_wait(self._keys[n], now) == 0]
+                if not healthy:
+                    return None, 0.0
+            if not healthy:
+                return None, min(self._keys[n].cooldown_until for n in usable) - now
+            chosen = min(healthy, key=lambda n: (self._token_wait(self._keys[n], now), self._keys[n].in_flight, self._keys[n].requests))
+            state = self._keys[chosen]
+            wait = self._token_wait(state, now)
+            if self._rate:
+                state.tokens -= 1
+            state.in_flight += 1
+            state.requests += 1
+            return chosen, wait
+
+    def _unreserve(self, index: int):
+        """Deshace la reserva de una key que no llegó a usarse (devuelve su cupo)."""
+        with self._lock:
+            state = self._keys[index]
+            state.in_flight -= 1
+            state.requests -= 1
+            if self._rate:
+                state.tokens = min(self._capacity, state.tokens + 1)
+
+    def wait_until_ready(self):
+        """
+        Reserva la key del próximo stream de este hilo, esperando su enfriamiento o su
+        cupo por minuto. Se llama antes de ocupar un hueco del limitador global.
+        """
+        self.discard_reservation()
+        while True:
+            index, wait = self._acquire(set())
+            if index is not None:
+                break
+            time.sleep(max(0.0, wait))
+        try:
+            if wait > 0:
+                time.sleep(wait)
+        except BaseException:
+            self._unreserve(index)
+            raise
+        self._reserved.set(index)
+
+    async def await_ready(self):
+        """Versión asyncio de wait_until_ready() (la reserva es de la tarea actual)."""
+        self.discard_reservation()
+        while True:
+            index, wait = self._acquire(set())
+            if index is not None:
+                break
+            await asyncio.sleep(max(0.0, wait))
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._unreserve(index)
+            raise
+        self._reserved.set(index)
+
+    def discard_reservation(self):
+        """Libera la key reservada y no usada (por ejemplo, si se canceló la espera del limitador)."""
+        index = self._reserved.get()
+        if index is not None:
+            self._reserved.set(None)
+            self._unreserve(index)
+
+    def _take_reservation(self) -> int | None:
+        index = self._reserved.get()
+        if index is not None:
+            self._reserved.set(None)
+        return index
+
+    def _release(self, index: int, exc: BaseException | None, started: bool, tried: set[int]) -> bool:
+        """
+        Libera la key y registra el resultado. Devuelve True si la llamada puede repetirse
+        en otra key (429 o key rechazada antes del primer chunk, con otra key sana no probada).
+        """
+        with self._lock:
+            state = self._keys[index]
+            state.in_flight -= 1
+            if exc is None:
+                state.successes += 1
+                state.consecutive_rate_limited = 0
+                return False
+            if is_rate_limit_error(exc):
+                state.rate_limited += 1
+                state.consecutive_rate_limited += 1
+                hint = server_retry_after(exc)
+                backoff = self.cooldown * 2 ** (state.consecutive_rate_limited - 1)
+                state.cooldown_until = time.monotonic() + min(self.max_cooldown, hint if hint is not None else backoff)
+            elif _is_rejected_key_error(exc):
+                state.errors += 1
+                state.disabled = True
+            else:
+                state.errors += 1
+                return False
+            now = time.monotonic()
+            others_available = any(
+                not other.disabled and other.cooldown_until <= now and self._token_wait(other, now) == 0
+                for n, other in enumerate(self._keys) if n != index and n not in tried
+            )
+            return not started and others_available
+
+    def stream(self, text: str) -> Iterator[tuple[bytes, str]]:
+        tried: set[int] = set()
+        index = self._take_reservation()
+        if index is None:
+            # Sin wait_until_ready() previo (uso directo del backend): se espera aquí
+            self.wait_until_ready()
+            index = self._take_reservation()
+        while True:
+            started = False
+            try:
+                for chunk in self._keys[index].backend.stream(text):
+                    started = True
+                    yield chunk
+            except BaseException as e:
+                # GeneratorExit o cancelación también liberan la key (cuentan como error)
+                if self._release(index, e, started, tried) and isinstance(e, Exception):
+                    tried.add(index)
+                    # Solo se cambia de key si hay una con cupo ya: esperar aquí retendría
+                    # el hueco del limitador global
+                    index, _wait = self._acquire(tried, immediate=True)
+                    if index is not None:
+                        continue
+                raise
+            self._release(index, None, started, tried)
+            return
+
+    async def astream(self, text: str) -> AsyncIterator[tuple[bytes, str]]:
+        tried: set[int] = set()
+        index = self._take_reservation()
+        if index is None:
+            await self.await_ready()
+            index = self._take_reservation()
+        while True:
+            started = False
+            try:
+                async for chunk in self._keys[index].backend.astream(text):
+                    started = True
+                    yield chunk
+            except BaseException as e:
+                # GeneratorExit o cancelación también liberan la key (cuentan como error)
+                if self._release(index, e, started, tried) and isinstance(e, Exception):
+                    tried.add(index)
+                    index, _wait = self._acquire(tried, immediate=True)
+                    if index is not None:
+                        continue
+                raise
+            self._release(index, None, started, tried)
+            return
+
+    def stats(self) -> list[dict]:
+        """Contadores por key (para el archivo de resultados y --stats_json)."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "key": state.label,
+                    "requests": state.requests,
+                    "successes": state.successes,
+                    "rate_limited": state.rate_limited,
+                    "errors": state.errors,
+                    "disabled": state.disabled,
+                    "cooling_down": state.cooldown_until > now,
+                }
+                for state in self._keys
+            ]
+
+    def summary_lines(self) -> list[str]:
+        """Resumen legible por key."""
+        lines = [f"{'Key':<10}{'Peticiones':>12}{'Éxitos':>10}{'429':>8}{'Errores':>10}  Estado"]
+        for key in self.stats():
+            status = "retirada" if key["disabled"] else ("en enfriamiento" if key["cooling_down"] else "activa")
+            lines.append(f"{key['key']:<10}{key['requests']:>12}{key['successes']:>10}{key['rate_limited']:>8}{key['errors']:>10}  {status}")
+        return lines
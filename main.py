@@ -2,19 +2,37 @@
 # pip install google-genai (según el comentario original del usuario)
 
 import argparse
+import asyncio
 import glob
 import json
 import os
 import re # Para limpiar nombres de archivo
-import struct # Para convert_to_wav
-import time # Para el espaciado entre generaciones
-from concurrent.futures import ThreadPoolExecutor
+import time # Para el espaciado entre reintentos
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import nullcontext
 from datetime import datetime
 
-# Asumiendo que estas importaciones son correctas para la biblioteca 'google-genai'
-# que el usuario tiene, basándose en su script original.
-from google import genai
-from google.genai import types
+from rate_limit import AdaptiveRateLimiter, DEFAULT_MIN_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE
+from retry_policy import FATAL, RATE_LIMITED, ItemDeadlineExceeded, RetryPolicy, DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY, DEFAULT_MAX_RETRIES
+from audio_cache import AudioCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_MB, make_cache_key
+from pipeline_stats import PipelineStats
+from item_metrics import ItemMetrics, MetricsRecorder
+from job_store import DEFAULT_JOB_DB, JobStore
+from key_pool import KeyPoolBackend, load_api_keys, mask_key
+from tts_backends import FakeBackend, GeminiBackend, TTSBackend
+from text_chunker import DEFAULT_CHUNK_CHARS, split_text
+from incremental_build import IncrementalAssembler, RebuildManifest, content_hash, manifest_path
+from text_dedup import DuplicateFinder
+from scheduling import DEFAULT_LOOKAHEAD, DEFAULT_SCHEDULE, SCHEDULES, estimate_cost, lookahead_order, schedule_order
+from json_input import InputReader, TextItem
+from doc_convert import DEFAULT_PROMPT_FILE, DEFAULT_TEXT_MODEL, ConvertReader, FakeTextModel, GeminiTextModel
+from job_leases import DEFAULT_LEASE_SECONDS, LeaseJobSet
+from resume_checkpoint import ResumeCheckpoint, checkpoint_path, load_checkpoint, verify_wav_file
+from chapter_index import ChapterIndex, write_chapter_files
+from audio_encode import CONCATENABLE_FORMATS, FORMAT_EXTENSIONS, OUTPUT_FORMATS, SOUNDFILE_AVAILABLE, EncoderPool, concatenate_encoded
+from silence_trim import DEFAULT_THRESHOLD_DB, NUMPY_AVAILABLE, trim_segment
+from wav_io import OrderedWavAssembler, WavSegment, WavStreamWriter, copy_segment_data, parse_audio_mime_type
 
 
 # Parámetros del modelo y de generación (del script original)
@@ -22,11 +40,19 @@ from google.genai import types
 MODEL_NAME = "gemini-2.5-flash-preview-tts"
 VOICE_NAME = "Zephyr"
 TEMPERATURE = 1
+# Formato PCM que devuelve el modelo TTS; forma parte de la clave de caché
+AUDIO_MIME_TYPE = "audio/L16;codec=pcm;rate=24000"
+
+# Registro de trabajos de la ejecución en curso: si está activo, log_error solo encola el mensaje
+error_log_store: JobStore | None = None
 
 # --- Funciones de Ayuda (directamente del script original del usuario) ---
 
 def log_error(message):
-    """Guarda errores en el archivo logs.txt con timestamp."""
+    """Guarda errores en el archivo logs.txt con timestamp (a través del registro de trabajos, si está activo)."""
+    if error_log_store is not None:
+        error_log_store.log(message)
+        return
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
         with open("logs.txt", "a", encoding="utf-8") as log_file:
@@ -34,88 +60,13 @@ def log_error(message):
     except Exception:
         pass  # Si no se puede escribir al log, continuar silenciosamente
 
-def save_binary_file(file_name, data):
-    """Guarda datos binarios en un archivo."""
-    try:
-        with open(file_name, "wb") as f:
-            f.write(data)
-        print(f"Archivo guardado en: {file_name}")
-    except IOError as e:
-        print(f"Error al guardar el archivo {file_name}")
-        log_error(f"Error al guardar el archivo {file_name}: {e}")
-
-def parse_audio_mime_type(mime_type: str) -> dict[str, int | None]:
-    """
-    Analiza los bits por muestra y la tasa de muestreo de una cadena de tipo MIME de audio.
-    (Función original del usuario)
-    """
-    bits_per_sample = 16
-    rate = 24000
-
-    # Extract rate from parameters
-    parts = mime_type.split(";")
-    for param in parts: # Skip the main type part
-        param = param.strip()
-        if param.lower().startswith("rate="):
-            try:
-                rate_str = param.split("=", 1)[1]
-                rate = int(rate_str)
-            except (ValueError, IndexError):
-                # Handle cases like "rate=" with no value or non-integer value
-                pass # Keep rate as default
-        elif param.startswith("audio/L"):
-            try:
-                bits_per_sample = int(param.split("L", 1)[1])
-            except (ValueError, IndexError):
-                pass # Keep bits_per_sample as default if conversion fails
-
-    return {"bits_per_sample": bits_per_sample, "rate": rate}
-
-def convert_to_wav(audio_data: bytes, mime_type: str) -> bytes:
-    """
-    Genera un encabezado de archivo WAV para los datos de audio y parámetros dados.
-    Asume que audio_data es PCM crudo.
-    (Función original del usuario)
-    """
-    parameters = parse_audio_mime_type(mime_type)
-    bits_per_sample = parameters.get("bits_per_sample", 16) # Default si no se encuentra
-    sample_rate = parameters.get("rate", 24000)       # Default si no se encuentra
-    
-    if bits_per_sample is None or sample_rate is None: # Chequeo básico
-        print(f"Advertencia: No se pudieron determinar los parámetros de audio desde mime_type: {mime_type}. Usando defaults.")
-        bits_per_sample = bits_per_sample or 16
-        sample_rate = sample_rate or 24000
-
-    num_channels = 1  # Asumimos mono para TTS
-    data_size = len(audio_data)
-    bytes_per_sample = bits_per_sample // 8
-    block_align = num_channels * bytes_per_sample
-    byte_rate = sample_rate * block_align
-    chunk_size = 36 + data_size  # 36 bytes para campos de encabezado antes del tamaño del chunk de datos
-
-    header = struct.pack(
-        "<4sI4s4sIHHIIHH4sI",
-        b"RIFF",
-        chunk_size,
-        b"WAVE",
-        b"fmt ",
-        16,
-        1,
-        num_channels,
-        sample_rate,
-        byte_rate,
-        block_align,
-        bits_per_sample,
-        b"data",
-        data_size
-    )
-    return header + audio_data
-
 # --- Lógica Modificada para los Requisitos ---
 
-def create_results_file(filename: str, successful_ids: list, failed_ids: list, target_ids: set = None):
+def create_results_file(filename: str, successful_ids: list, failed_ids: list, target_ids: set = None, metrics_summary: list[str] = None, key_summary: list[str] = None):
     """
     Crea un archivo de texto con los resultados del procesamiento.
+    Si se pasa metrics_summary, se añaden esas líneas (percentiles de latencia) al final,
+    y con key_summary, el uso de cada API key del pool.
     """
     try:
         with open(filename, 'w', encoding='utf-8') as f:
@@ -150,6 +101,16 @@ def create_results_file(filename: str, successful_ids: list, failed_ids: list, t
             if len(successful_ids) + len(failed_ids) > 0:
                 success_rate = (len(successful_ids) / (len(successful_ids) + len(failed_ids))) * 100
                 f.write(f"  Tasa de éxito: {success_rate:.1f}%\n")
+
+            if metrics_summary:
+                f.write(f"\nMétricas de síntesis (segundos, por llamada):\n")
+                for line in metrics_summary:
+                    f.write(f"  {line}\n")
+
+            if key_summary:
+                f.write(f"\nUso por API key:\n")
+                for line in key_summary:
+                    f.write(f"  {line}\n")
         
         print(f"Archivo de resultados creado: {filename}")
         
@@ -157,203 +118,1009 @@ def create_results_file(filename: str, successful_ids: list, failed_ids: list, t
         print(f"Error al crear archivo de resultados: {e}")
         log_error(f"Error al crear archivo de resultados {filename}: {e}")
 
+def report_input_error(json_file: str, error: Exception):
+    """Muestra el error de lectura o de formato del archivo de entrada."""
+    if isinstance(error, FileNotFoundError):
+        print(f"Error: Archivo JSON no encontrado en {json_file}")
+    elif isinstance(error, json.JSONDecodeError):
+        print(f"Error: No se pudo decodificar JSON desde {json_file} ({error})")
+    else:
+        print(f"Error: {error}")
+
+
+def check_input_selection(reader: InputReader, item_count: int) -> bool:
+    """Tras leer la entrada, avisa de los IDs pedidos que no aparecieron; devuelve False si no hay textos que procesar."""
+    # Verificar si algunos IDs especificados no se encontraron
+    if reader.target_ids:
+        missing_ids = reader.target_ids - reader.found_ids
+        if missing_ids:
+            print(f"Advertencia: Los siguientes IDs no se encontraron en el JSON: {sorted(missing_ids)}")
+    if not item_count:
+        if reader.target_ids:
+            print("No se encontraron textos para procesar con los IDs especificados.")
+        else:
+            print("El archivo JSON está vacío o no contiene textos para procesar.")
+        return False
+    return True
+
+def individual_wav_path(title: str, item_id: str, output_folder: str) -> str:
+    """
+    Devuelve la ruta del archivo WAV individual de un ID ({id}_{título}.wav).
+    """
+    # Usar el título como nombre base del archivo
+    clean_title = re.sub(r'[<>:"/\\|?*]', '_', title)
+    clean_title = clean_title.strip()
+    if not clean_title:
+        clean_title = f"audio_{item_id}"
+    
+    individual_filename = f"{item_id}_{clean_title}.wav"
+    return os.path.join(output_folder, individual_filename)
+
+def restore_from_cache(cache: AudioCache, cache_key: str, file_path: str, item_id: str, title: str, stats: PipelineStats | None = None) -> WavSegment | None:
+    """
+    Si el audio está en caché, lo escribe como WAV en file_path y devuelve su WavSegment.
+    Devuelve None si no está en caché o no se pudo recuperar.
+    """
+    cached = cache.open_entry(cache_key)
+    if cached is None:
+        return None
+    cached_file, cached_size, cached_mime_type = cached
+    try:
+        with cached_file, WavStreamWriter(file_path) as writer:
+            writer.set_format_from_mime(cached_mime_type)
+            copied = copy_segment_data(WavSegment(cached_file.name, 0, cached_size, cached_mime_type), writer)
+        if stats is not None:
+            stats.add(cache_hits=1, bytes_copied=copied)
+        print(f"Audio recuperado de la caché para ID '{item_id}': '{title}'")
+        print(f"Archivo individual guardado: {file_path}")
+        return writer.close()
+    except Exception as e:
+        # Si falla la lectura de la caché, se genera el audio normalmente
+        log_error(f"Error al recuperar de la caché el audio de ID '{item_id}': '{title}': {e}")
+        return None
+
+def finish_item_metrics(metrics: ItemMetrics, metrics_recorder: MetricsRecorder | None, success: bool, mime_type: str | None = None):
+    """Cierra las métricas de una síntesis y las entrega al registrador, si lo hay."""
+    metrics.finish(success, mime_type)
+    if metrics_recorder is not None:
+        metrics_recorder.record(metrics)
+
+class SynthesisAttempts:
+    """
+    Contabilidad de los intentos de síntesis de un texto, común a generate_audio_for_text
+    y agenerate_audio_for_text: escritor del WAV, métricas, estadísticas, caché, avisos
+    al limitador y cálculo de la espera entre reintentos. Las dos funciones solo se
+    diferencian en cómo consumen el stream y cómo duermen.
+    """
+
+    def __init__(
+        self,
+        text_input: str,
+        title: str,
+        item_id: str,
+        text_index: int,
+        file_path: str,
+        retry_policy: RetryPolicy | None,
+        cache: AudioCache | None,
+        cache_key: str | None,
+        rate_limiter: AdaptiveRateLimiter | None,
+        stats: PipelineStats | None,
+        metrics_recorder: MetricsRecorder | None,
+        queued_at: float | None,
+    ):
+        self.text_input = text_input
+        self.title = title
+        self.item_id = item_id
+        self.file_path = file_path
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.max_retries = self.retry_policy.max_retries
+        self.cache = cache if cache_key is not None else None
+        self.cache_key = cache_key
+        self.rate_limiter = rate_limiter
+        self.stats = stats
+        self.metrics_recorder = metrics_recorder
+        self.metrics = ItemMetrics(item_id, title, queued_at, item_index=text_index)
+        self.deadline = None
+        self.attempts_made = 0
+        self.writer = None
+        self.mime_type = None
+        self.stream_start = None
+        self.close_start = None
+
+    def restored(self, cached_segment: WavSegment | None, restore_start: float) -> tuple[WavSegment, str | None, bool] | None:
+        """Resultado de un audio recuperado de la caché (o None si no estaba)."""
+        if cached_segment is None:
+            return None
+        self.metrics.cache_hit = True
+        self.metrics.pcm_bytes = cached_segment.data_size
+        self.metrics.disk_write_seconds = time.monotonic() - restore_start
+        finish_item_metrics(self.metrics, self.metrics_recorder, True, cached_segment.mime_type)
+        return cached_segment, cached_segment.mime_type, True
+
+    def start_retries(self):
+        """Fija el plazo del ID (--item_deadline) al empezar el primer intento."""
+        self.deadline = self.retry_policy.start()
+
+    def start_attempt(self, attempt: int) -> WavStreamWriter:
+        self.writer = None
+        self.mime_type = None
+        self.stream_start = None
+        self.attempts_made = attempt + 1
+        self.metrics.start_attempt()
+        print(f"Generando audio para ID '{self.item_id}': '{self.title}' - Intento {attempt + 1}/{self.max_retries}")
+        self.writer = WavStreamWriter(self.file_path)
+        return self.writer
+
+    def start_stream(self, waited: float):
+        self.metrics.limiter_wait_seconds += waited
+        self.stream_start = time.monotonic()
+
+    def write_chunk(self, audio_data: bytes, mime_type: str):
+        # Un stream que se cuelga entre chunks o avanza muy despacio no puede pasarse del plazo del ID
+        self.retry_policy.check_deadline(self.deadline)
+        if self.mime_type is None: # Captura el mime_type del primer chunk de datos
+            self.mime_type = mime_type
+            self.writer.set_format_from_mime(mime_type)
+            self.metrics.first_chunk_seconds = time.monotonic() - self.stream_start
+        write_start = time.monotonic()
+        self.writer.write(audio_data)
+        self.metrics.disk_write_seconds += time.monotonic() - write_start
+        self.metrics.chunk_count += 1
+
+    def end_stream(self, waited: float):
+        stream_seconds = time.monotonic() - self.stream_start
+        self.metrics.stream_seconds = stream_seconds
+        self.metrics.pcm_bytes = self.writer.data_size
+        if self.stats is not None:
+            self.stats.add(
+                api_calls=1,
+                limiter_wait_seconds=waited,
+                stream_seconds=stream_seconds,
+                pcm_bytes_streamed=self.writer.data_size,
+            )
+
+    def close_writer(self, attempt: int) -> WavSegment | None:
+        """Cierra el WAV si el intento trajo audio y devuelve su WavSegment; si no, lo descarta y devuelve None."""
+        if not self.writer.data_size:
+            self.writer.abort()
+            print(f"Advertencia: No se recibieron datos de audio para ID '{self.item_id}': '{self.title}' en intento {attempt + 1}")
+            log_error(f"No se recibieron datos de audio para ID '{self.item_id}': '{self.title}' (contenido: '{self.text_input[:30]}...') en intento {attempt + 1}")
+            return None
+        self.close_start = time.monotonic()
+        segment = self.writer.close()
+        print(f"Audio generado exitosamente en intento {attempt + 1}.")
+        print(f"Archivo individual guardado: {self.file_path}")
+        return segment
+
+    def store_in_cache(self, segment: WavSegment):
+        try:
+            self.cache.put_from_file(self.cache_key, segment.path, segment.data_offset, segment.data_size, self.mime_type)
+            if self.stats is not None:
+                self.stats.add(bytes_copied=segment.data_size)
+        except Exception as e:
+            log_error(f"Error al guardar en caché el audio de ID '{self.item_id}': '{self.title}': {e}")
+
+    def succeeded(self, segment: WavSegment) -> tuple[WavSegment, str | None, bool]:
+        self.metrics.disk_write_seconds += time.monotonic() - self.close_start
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_success()
+        finish_item_metrics(self.metrics, self.metrics_recorder, True, self.mime_type)
+        return segment, self.mime_type, True
+
+    def attempt_failed(self, attempt: int, error: BaseException):
+        if self.writer is not None:
+            self.writer.abort()
+        print(f"Error durante la llamada API para ID '{self.item_id}': '{self.title}' en intento {attempt + 1}")
+        log_error(f"Error durante la llamada API para ID '{self.item_id}': '{self.title}' (contenido: '{self.text_input[:30]}...') en intento {attempt + 1}: {error}")
+
+    def retry_delay(self, attempt: int, last_error: BaseException | None) -> float | None:
+        """Segundos a esperar antes del siguiente intento, o None si no se reintenta."""
+        error_class = self.retry_policy.classify(last_error)
+        if error_class == RATE_LIMITED and self.rate_limiter is not None:
+            self.rate_limiter.record_rate_limited()
+
+        delay = self.retry_policy.next_delay(attempt, error_class, last_error, self.deadline)
+        if delay is None:
+            if error_class == FATAL:
+                print(f"Error no recuperable para ID '{self.item_id}': '{self.title}', no se reintentará")
+            elif attempt < self.max_retries - 1:
+                print(f"Plazo máximo agotado para ID '{self.item_id}': '{self.title}', no se reintentará")
+            return None
+        print(f"Esperando {delay:.1f} segundos antes del siguiente intento ({error_class})...")
+        if self.stats is not None:
+            self.stats.add(retries=1, retry_sleep_seconds=delay)
+        self.metrics.retry_reasons.append(error_class if last_error is not None else "empty_response")
+        self.metrics.retry_sleep_seconds += delay
+        return delay
+
+    def failed(self) -> tuple[None, None, bool]:
+        # Si llegamos aquí, todos los intentos fallaron
+        print(f"Error: No se pudo generar audio para ID '{self.item_id}': '{self.title}' después de {self.attempts_made} intentos")
+        log_error(f"Error: No se pudo generar audio para ID '{self.item_id}': '{self.title}' (contenido: '{self.text_input[:30]}...') después de {self.attempts_made} intentos")
+        finish_item_metrics(self.metrics, self.metrics_recorder, False)
+        return None, None, False
+
 def generate_audio_for_text(
     text_input: str,
     title: str,
     item_id: str,
-    client: genai.Client, # Usando genai.Client como en el script original
-    model_name: str,
-    base_generate_config: types.GenerateContentConfig,
+    backend: TTSBackend,
     text_index: int,
     output_folder: str,
-    max_retries: int = 3
-) -> tuple[bytes | None, str | None, bool]:
+    retry_policy: RetryPolicy | None = None,
+    cache: AudioCache | None = None,
+    cache_key: str | None = None,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    output_path: str | None = None,
+    stats: PipelineStats | None = None,
+    metrics_recorder: MetricsRecorder | None = None,
+    queued_at: float | None = None
+) -> tuple[WavSegment | None, str | None, bool]:
     """
-    Genera un chunk de audio para un texto dado usando la estructura de API original.
-    Devuelve los bytes de audio crudos, el mime_type y un booleano indicando éxito.
-    Incluye sistema de reintentos con espera de 1 minuto en caso de fallo.
+    Genera el audio para un texto dado con el backend TTS indicado (Gemini o el simulado).
+    Cada chunk recibido se escribe directamente en el WAV individual del ID, cuyo
+    encabezado se completa al cerrar; no se acumula el audio en memoria.
+    Devuelve un WavSegment (ruta, offset y tamaño del PCM en el WAV individual),
+    el mime_type y un booleano indicando éxito.
+    Los reintentos siguen la política dada: los errores fatales no se reintentan y el
+    resto espera con backoff exponencial y jitter (o lo que indique el servidor).
+    Si se pasa una caché y el audio ya está en ella, no se llama a la API.
+    Si se pasa un limitador compartido, cada llamada espera un hueco libre en él
+    (en lugar de dormir un tiempo fijo tras cada generación).
+    Con output_path se escribe en esa ruta en lugar del WAV individual del ID
+    (se usa para los fragmentos de un texto dividido).
+    Con stats se acumulan los tiempos de stream, esperas y bytes de la ejecución, y con
+    metrics_recorder se registran las métricas de esta síntesis (queued_at: instante
+    time.monotonic() en que se encoló, para medir la espera en cola).
     """
-    contents = [
-        types.Content(
-            role="user",
-            parts=[
-                types.Part.from_text(text=text_input),
-            ],
-        ),
-    ]
-
-    for attempt in range(max_retries):
-        accumulated_audio_data = b""
-        first_mime_type = None
-        
-        print(f"Generando audio para ID '{item_id}': '{title}' - Intento {attempt + 1}/{max_retries}")
+    file_path = output_path or individual_wav_path(title, item_id, output_folder)
+    run = SynthesisAttempts(text_input, title, item_id, text_index, file_path, retry_policy, cache, cache_key, rate_limiter, stats, metrics_recorder, queued_at)
+
+    if run.cache is not None:
+        restore_start = time.monotonic()
+        restored = run.restored(restore_from_cache(cache, cache_key, file_path, item_id, title, stats), restore_start)
+        if restored is not None:
+            return restored
+
+    run.start_retries()
+    for attempt in range(run.max_retries):
+        last_error = None
         try:
-            # Usando client.models.generate_content_stream como en el script original
-            for chunk in client.models.generate_content_stream(
-                model=model_name,
-                contents=contents,
-                config=base_generate_config, # Pasa la configuración completa
-            ):
-                if (
-                    chunk.candidates is None
-                    or not chunk.candidates # Asegura que la lista de candidatos no esté vacía
-                    or chunk.candidates[0].content is None
-                    or chunk.candidates[0].content.parts is None
-                    or not chunk.candidates[0].content.parts # Asegura que la lista de parts no esté vacía
-                ):
-                    continue
-                
-                part = chunk.candidates[0].content.parts[0]
-                if part.inline_data and part.inline_data.data:
-                    if first_mime_type is None: # Captura el mime_type del primer chunk de datos
-                        first_mime_type = part.inline_data.mime_type
-                    accumulated_audio_data += part.inline_data.data
-                # En el script original, se imprimía chunk.text aquí si no era inline_data
-                # elif part.text:
-                #     print(f"Texto recibido en chunk (no audio): {part.text}")
+            run.start_attempt(attempt)
+            if isinstance(backend, KeyPoolBackend):
+                # La espera de una key (enfriamiento tras un 429 o cupo por minuto) no ocupa hueco del limitador
+                backend.wait_until_ready()
+            # El stream ocupa un hueco del limitador compartido solo mientras dura la llamada
+            with rate_limiter.request_slot() if rate_limiter is not None else nullcontext() as waited:
+                run.start_stream(waited or 0.0)
+                try:
+                    for audio_data, mime_type in backend.stream(text_input):
+                        run.write_chunk(audio_data, mime_type)
+                finally:
+                    run.end_stream(waited or 0.0)
 
             # Si llegamos aquí sin excepción y tenemos datos de audio, el intento fue exitoso
-            if accumulated_audio_data:
-                print(f"Audio generado exitosamente en intento {attempt + 1}.")
-                
-                # Guardar archivo individual
+            segment = run.close_writer(attempt)
+            if segment is not None:
+                if run.cache is not None:
+                    run.store_in_cache(segment)
+                return run.succeeded(segment)
+        except Exception as e:
+            last_error = e
+            run.attempt_failed(attempt, e)
+
+        delay = run.retry_delay(attempt, last_error)
+        if delay is None:
+            break
+        time.sleep(delay)
+
+    return run.failed()
+
+
+async def agenerate_audio_for_text(
+    text_input: str,
+    title: str,
+    item_id: str,
+    backend: TTSBackend,
+    text_index: int,
+    output_folder: str,
+    retry_policy: RetryPolicy | None = None,
+    cache: AudioCache | None = None,
+    cache_key: str | None = None,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    output_path: str | None = None,
+    stats: PipelineStats | None = None,
+    metrics_recorder: MetricsRecorder | None = None,
+    queued_at: float | None = None
+) -> tuple[WavSegment | None, str | None, bool]:
+    """
+    Versión asyncio de generate_audio_for_text sobre backend.astream (para Gemini,
+    client.aio.models.generate_content_stream).
+    Las esperas entre reintentos y del limitador no bloquean el bucle de eventos, y una
+    cancelación (Ctrl-C) interrumpe el stream en curso y borra el archivo parcial.
+    """
+    file_path = output_path or individual_wav_path(title, item_id, output_folder)
+    run = SynthesisAttempts(text_input, title, item_id, text_index, file_path, retry_policy, cache, cache_key, rate_limiter, stats, metrics_recorder, queued_at)
+
+    if run.cache is not None:
+        restore_start = time.monotonic()
+        cached_segment = await asyncio.to_thread(restore_from_cache, cache, cache_key, file_path, item_id, title, stats)
+        restored = run.restored(cached_segment, restore_start)
+        if restored is not None:
+            return restored
+
+    run.start_retries()
+    for attempt in range(run.max_retries):
+        last_error = None
+        try:
+            run.start_attempt(attempt)
+            if isinstance(backend, KeyPoolBackend):
+                # La espera de una key (enfriamiento tras un 429 o cupo por minuto) no ocupa hueco del limitador
+                await backend.await_ready()
+            waited = await rate_limiter.acquire_async() if rate_limiter is not None else 0.0
+            run.start_stream(waited)
+            deadline_scope = asyncio.timeout(run.retry_policy.remaining(run.deadline))
+            try:
+                # El plazo del ID también corta un stream colgado, aunque no llegue ningún chunk
+                async with deadline_scope:
+                    async for audio_data, mime_type in backend.astream(text_input):
+                        run.write_chunk(audio_data, mime_type)
+            except TimeoutError as e:
+                if deadline_scope.expired():
+                    raise ItemDeadlineExceeded("Plazo máximo del ID agotado durante el stream") from e
+                raise
+            finally:
+                if rate_limiter is not None:
+                    rate_limiter.release()
+                run.end_stream(waited)
+
+            segment = run.close_writer(attempt)
+            if segment is not None:
+                if run.cache is not None:
+                    await asyncio.to_thread(run.store_in_cache, segment)
+                return run.succeeded(segment)
+        except asyncio.CancelledError:
+            if run.writer is not None:
+                run.writer.abort()
+            if isinstance(backend, KeyPoolBackend):
+                backend.discard_reservation()
+            raise
+        except Exception as e:
+            last_error = e
+            run.attempt_failed(attempt, e)
+
+        delay = run.retry_delay(attempt, last_error)
+        if delay is None:
+            break
+        await asyncio.sleep(delay)
+
+    return run.failed()
+
+
+def stitch_wav_parts(
+    part_results: list[WavSegment | None],
+    final_path: str,
+    chunk_silence_ms: float,
+    item_id: str,
+    title: str,
+    stats: PipelineStats | None = None
+) -> tuple[WavSegment | None, str | None, bool]:
+    """
+    Une en orden los fragmentos sintetizados de un ID en su WAV individual, con
+    silencio opcional entre ellos, y borra los archivos de los fragmentos.
+    Devuelve el mismo resultado que generate_audio_for_text.
+    """
+    try:
+        if any(part is None for part in part_results):
+            print(f"Error: Fallaron fragmentos del ID '{item_id}': '{title}'")
+            log_error(f"Error: Fallaron {sum(part is None for part in part_results)} de {len(part_results)} fragmentos del ID '{item_id}': '{title}'")
+            return None, None, False
+        mime_type = part_results[0].mime_type
+        with WavStreamWriter(final_path) as writer:
+            writer.set_format_from_mime(mime_type)
+            for n, part in enumerate(part_results):
+                if n > 0 and chunk_silence_ms > 0:
+                    writer.write_silence(chunk_silence_ms)
+                copied = copy_segment_data(part, writer)
+                if stats is not None:
+                    stats.add(bytes_copied=copied)
+        print(f"Archivo individual guardado: {final_path} ({len(part_results)} fragmentos)")
+        return writer.close(), mime_type, True
+    except Exception as e:
+        log_error(f"Error al unir los fragmentos del ID '{item_id}': '{title}': {e}")
+        return None, None, False
+    finally:
+        # Los fragmentos correctos quedan en la caché: al reintentar solo se regeneran los fallidos
+        for part in part_results:
+            if part is not None:
                 try:
-                    # Usar el título como nombre base del archivo
-                    clean_title = re.sub(r'[<>:"/\\|?*]', '_', title)
-                    clean_title = clean_title.strip()
-                    if not clean_title:
-                        clean_title = f"audio_{item_id}"
-                    
-                    individual_filename = f"{item_id}_{clean_title}.wav"
-                    individual_file_path = os.path.join(output_folder, individual_filename)
-                    individual_wav_data = convert_to_wav(accumulated_audio_data, first_mime_type)
-                    
-                    with open(individual_file_path, "wb") as f:
-                        f.write(individual_wav_data)
-                    print(f"Archivo individual guardado: {individual_file_path}")
-                    
-                except Exception as e:
-                    log_error(f"Error al guardar archivo individual para ID '{item_id}': '{title}': {e}")
-                    print(f"Advertencia: No se pudo guardar el archivo individual para ID '{item_id}': '{title}'")
-                
-                print(f"Esperando 5 segundos antes de la siguiente generación...")
-                time.sleep(5)
-                return accumulated_audio_data, first_mime_type, True
+                    os.remove(part.path)
+                except OSError:
+                    pass
+
+
+def copy_duplicate_audio(
+    outcome,
+    item_id: str,
+    title: str,
+    output_folder: str,
+    stats: PipelineStats | None = None
+) -> tuple[WavSegment | None, str | None, bool]:
+    """
+    Reparte a un ID el audio ya sintetizado para otro ID con el mismo texto: copia
+    su WAV individual (outcome es el resultado de aquel ID, o la excepción que lo
+    hizo fallar). Devuelve el mismo resultado que generate_audio_for_text.
+    """
+    if isinstance(outcome, BaseException) or outcome is None or not outcome[2] or outcome[0] is None:
+        print(f"Error: No hay audio para ID '{item_id}': '{title}' porque falló la síntesis de su texto (repetido en otro ID)")
+        log_error(f"Error: No hay audio para ID '{item_id}': '{title}' porque falló la síntesis de su texto (repetido en otro ID)")
+        return None, None, False
+    segment, mime_type, _success = outcome
+    file_path = individual_wav_path(title, item_id, output_folder)
+    try:
+        if os.path.abspath(file_path) == os.path.abspath(segment.path):
+            result = segment  # Mismo ID y título: el archivo individual ya es este
+            copied = 0
+        else:
+            with WavStreamWriter(file_path) as writer:
+                writer.set_format_from_mime(mime_type)
+                copied = copy_segment_data(segment, writer)
+            result = writer.close()
+            print(f"Archivo individual guardado: {file_path}")
+        if stats is not None:
+            parameters = parse_audio_mime_type(mime_type or "")
+            bytes_per_second = (parameters.get("rate") or 24000) * ((parameters.get("bits_per_sample") or 16) // 8)
+            stats.add(bytes_copied=copied, deduplicated_items=1, deduplicated_audio_seconds=segment.data_size / bytes_per_second)
+        print(f"ID '{item_id}': '{title}' reutiliza el audio de un texto idéntico de otro ID")
+        return result, mime_type, True
+    except Exception as e:
+        log_error(f"Error al copiar el audio repetido para ID '{item_id}': '{title}': {e}")
+        return None, None, False
+
+
+def submit_duplicate(
+    original_future: Future,
+    item_id: str,
+    title: str,
+    output_folder: str,
+    stats: PipelineStats | None = None
+) -> Future:
+    """
+    Devuelve un Future que se completa, cuando termina la síntesis del texto original,
+    con el resultado de copy_duplicate_audio para este ID (sin llamar a la API).
+    """
+    item_future = Future()
+    item_future.set_running_or_notify_cancel()
+
+    def on_original_done(future):
+        try:
+            outcome = future.result()
+        except Exception as e:
+            outcome = e
+        item_future.set_result(copy_duplicate_audio(outcome, item_id, title, output_folder, stats))
+
+    original_future.add_done_callback(on_original_done)
+    return item_future
+
+
+def submit_item_synthesis(
+    executor: ThreadPoolExecutor,
+    content: str,
+    title: str,
+    item_id: str,
+    text_index: int,
+    output_folder: str,
+    synthesis_args: tuple,
+    synthesis_kwargs: dict,
+    cache_key_fn,
+    chunk_chars: int = 0,
+    chunk_silence_ms: float = 0
+) -> Future:
+    """
+    Envía al pool la síntesis de un ID y devuelve un Future con el mismo resultado
+    que generate_audio_for_text: (WavSegment | None, mime_type | None, éxito).
+
+    Si chunk_chars > 0 y el texto es más largo, se divide en fragmentos por oraciones
+    que se sintetizan en paralelo (cada uno con sus propios reintentos y su entrada de
+    caché) y se unen en orden en el WAV individual, con silencio opcional entre ellos.
+    """
+    pieces = split_text(content, chunk_chars) if chunk_chars > 0 else [content]
+    if len(pieces) <= 1:
+        return executor.submit(
+            generate_audio_for_text, content, title, item_id, *synthesis_args, text_index, output_folder,
+            cache_key=cache_key_fn(content),
+            queued_at=time.monotonic(),
+            **synthesis_kwargs,
+        )
+
+    print(f"ID '{item_id}': '{title}' dividido en {len(pieces)} fragmentos")
+    item_future = Future()
+    item_future.set_running_or_notify_cancel()
+    final_path = individual_wav_path(title, item_id, output_folder)
+    part_results: list[WavSegment | None] = [None] * len(pieces)
+    pending = [len(pieces)]
+    lock = threading.Lock()
+
+    def on_part_done(part_index, part_future):
+        try:
+            segment, _mime_type, success = part_future.result()
+        except Exception as e:
+            log_error(f"Error al procesar el fragmento {part_index + 1} del ID '{item_id}': '{title}': {e}")
+            segment, success = None, False
+        with lock:
+            part_results[part_index] = segment if success else None
+            pending[0] -= 1
+            finished = pending[0] == 0
+        if finished:
+            item_future.set_result(stitch_wav_parts(part_results, final_path, chunk_silence_ms, item_id, title, synthesis_kwargs.get("stats")))
+
+    for n, piece in enumerate(pieces):
+        part_future = executor.submit(
+            generate_audio_for_text, piece, f"{title} [fragmento {n + 1}/{len(pieces)}]", item_id, *synthesis_args, text_index, output_folder,
+            cache_key=cache_key_fn(piece),
+            output_path=f"{final_path}.fragmento{n + 1:03d}",
+            queued_at=time.monotonic(),
+            **synthesis_kwargs,
+        )
+        part_future.add_done_callback(lambda f, n=n: on_part_done(n, f))
+    return item_future
+
+
+async def run_async_synthesis(
+    items: list[tuple[str, str, str]],
+    output_folder: str,
+    synthesis_args: tuple,
+    synthesis_kwargs: dict,
+    cache_key_fn,
+    max_concurrency: int,
+    outcomes: list,
+    assembler: OrderedWavAssembler | None = None,
+    encoder: EncoderPool | None = None,
+    chunk_chars: int = 0,
+    chunk_silence_ms: float = 0,
+    skip: set[int] = frozenset(),
+    duplicates: dict[int, int] | None = None,
+    checkpoint: ResumeCheckpoint | None = None,
+    order: list[int] | None = None,
+) -> list:
+    """
+    Motor asyncio: sintetiza todos los items (id, título, contenido) con como mucho
+    max_concurrency síntesis en curso (semáforo acotado). A medida que terminan,
+    guarda en outcomes[i] el resultado de cada item o la excepción que lo hizo fallar
+    (los items no terminados quedan en None) y devuelve esa misma lista.
+    Los índices de skip (reutilizados de una ejecución anterior) no se sintetizan, y
+    los de duplicates ({índice: índice original}) copian el audio de su texto original.
+    Con checkpoint, cada item terminado con audio se anota en él. order fija el orden
+    en que las síntesis toman el semáforo (por defecto, el de items).
+    Si se cancela (Ctrl-C), cancela todas las síntesis pendientes antes de propagar.
+    """
+    semaphore = asyncio.BoundedSemaphore(max_concurrency)
+
+    async def synthesize(text, title, item_id, index, output_path=None):
+        queued_at = time.monotonic()
+        async with semaphore:
+            return await agenerate_audio_for_text(
+                text, title, item_id, *synthesis_args, index, output_folder,
+                cache_key=cache_key_fn(text),
+                output_path=output_path,
+                queued_at=queued_at,
+                **synthesis_kwargs,
+            )
+
+    async def process_item(index, item_id, title, content, original_task=None):
+        try:
+            pieces = split_text(content, chunk_chars) if chunk_chars > 0 else [content]
+            if original_task is not None:
+                await asyncio.wait([original_task])
+                original = (duplicates or {})[index]
+                result = await asyncio.to_thread(copy_duplicate_audio, outcomes[original], item_id, title, output_folder, synthesis_kwargs.get("stats"))
+            elif len(pieces) <= 1:
+                result = await synthesize(content, title, item_id, index)
             else:
-                print(f"Advertencia: No se recibieron datos de audio para ID '{item_id}': '{title}' en intento {attempt + 1}")
-                log_error(f"No se recibieron datos de audio para ID '{item_id}': '{title}' (contenido: '{text_input[:30]}...') en intento {attempt + 1}")
-                
+                print(f"ID '{item_id}': '{title}' dividido en {len(pieces)} fragmentos")
+                final_path = individual_wav_path(title, item_id, output_folder)
+                part_outcomes = await asyncio.gather(*(
+                    synthesize(piece, f"{title} [fragmento {n + 1}/{len(pieces)}]", item_id, index, f"{final_path}.fragmento{n + 1:03d}")
+                    for n, piece in enumerate(pieces)
+                ))
+                part_results = [segment if success else None for segment, _mime_type, success in part_outcomes]
+                result = await asyncio.to_thread(stitch_wav_parts, part_results, final_path, chunk_silence_ms, item_id, title, synthesis_kwargs.get("stats"))
         except Exception as e:
-            print(f"Error durante la llamada API para ID '{item_id}': '{title}' en intento {attempt + 1}")
-            log_error(f"Error durante la llamada API para ID '{item_id}': '{title}' (contenido: '{text_input[:30]}...') en intento {attempt + 1}: {e}")
-        
-        # Si no es el último intento, esperar 1 minuto antes del siguiente intento
-        if attempt < max_retries - 1:
-            print(f"Esperando 1 minuto antes del siguiente intento...")
-            time.sleep(60)
-    
-    # Si llegamos aquí, todos los intentos fallaron
-    print(f"Error: No se pudo generar audio para ID '{item_id}': '{title}' después de {max_retries} intentos")
-    log_error(f"Error: No se pudo generar audio para ID '{item_id}': '{title}' (contenido: '{text_input[:30]}...') después de {max_retries} intentos")
-    return None, None, False
+            outcomes[index] = e
+            if assembler is not None:
+                await asyncio.to_thread(assembler.add, index, None)
+            return
+        outcomes[index] = result
+        segment, _mime_type, success = result
+        if checkpoint is not None and success and segment is not None:
+            await asyncio.to_thread(checkpoint.add, item_id, content_hash(content), segment)
+        if encoder is not None and success and segment is not None:
+            encoder.submit(index, segment.path)
+        if assembler is not None:
+            await asyncio.to_thread(assembler.add, index, segment if success else None)
+
+    tasks_by_index = {}
+    for i in (order if order is not None else range(len(items))):
+        if i in skip:
+            continue
+        item_id, title, content = items[i]
+        original_task = tasks_by_index[duplicates[i]] if duplicates and i in duplicates else None
+        tasks_by_index[i] = asyncio.create_task(process_item(i, item_id, title, content, original_task))
+    tasks = list(tasks_by_index.values())
+    try:
+        await asyncio.gather(*tasks)
+        return outcomes
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_lease_worker(
+    job_set: LeaseJobSet,
+    items: list[tuple[str, str, str]],
+    output_folder: str,
+    synthesis_args: tuple,
+    synthesis_kwargs: dict,
+    cache_key_fn,
+    max_workers: int,
+    record_result,
+    chunk_chars: int = 0,
+    chunk_silence_ms: float = 0,
+    skip: set[int] = frozenset(),
+):
+    """
+    Modo worker: reclama IDs del conjunto de trabajos compartido (como mucho
+    max_workers a la vez), los sintetiza y los marca como terminados; un ID que
+    falla se libera para que lo intente otro worker (este no lo vuelve a reclamar).
+    Mientras otros workers tengan IDs con lease, sigue comprobando cada tercio de
+    lease_seconds por si alguno cae y su lease caduca; termina cuando todos los IDs
+    están terminados o los abandonó este worker. record_result(índice, id, título,
+    resultado) recibe cada resultado, como en los otros motores.
+    """
+    abandoned = set(skip)
+    poll_interval = job_set.lease_seconds / 3
+    waiting_for = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight: dict[Future, int] = {}
+        try:
+            while True:
+                while len(in_flight) < max_workers:
+                    index = job_set.claim_next(exclude=abandoned)
+                    if index is None:
+                        break
+                    item_id, title, content = items[index]
+                    print(f"Worker {job_set.worker_id}: reclamado ID '{item_id}': '{title}'")
+                    future = submit_item_synthesis(
+                        executor, content, title, item_id, index, output_folder, synthesis_args, synthesis_kwargs, cache_key_fn,
+                        chunk_chars=chunk_chars, chunk_silence_ms=chunk_silence_ms,
+                    )
+                    in_flight[future] = index
+                if not in_flight:
+                    remaining = job_set.unfinished(exclude=abandoned)
+                    if not remaining:
+                        break
+                    if len(remaining) != waiting_for:
+                        waiting_for = len(remaining)
+                        print(f"Worker {job_set.worker_id}: {waiting_for} IDs con lease de otros workers; se esperan por si alguno cae")
+                    time.sleep(poll_interval)
+                    continue
+                # Con timeout, para reclamar los leases que caduquen mientras hay síntesis en curso
+                done, _pending = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    item_id, title, _content = items[index]
+                    try:
+                        outcome = future.result()
+                    except Exception as exc:
+                        outcome = exc
+                    if not isinstance(outcome, BaseException) and outcome[2] and outcome[0] is not None:
+                        try:
+                            job_set.complete(index, outcome[0])
+                        except OSError as e:
+                            log_error(f"Error al marcar como terminado el ID '{item_id}' en {job_set.directory}: {e}")
+                            job_set.release(index)
+                    else:
+                        job_set.release(index)
+                        abandoned.add(index)
+                    record_result(index, item_id, title, outcome)
+        finally:
+            job_set.close()
+
+
+def make_assembly_callback(assembler: OrderedWavAssembler, index: int):
+    """
+    Crea un callback para Future.add_done_callback que entrega el resultado
+    del índice dado al ensamblador del archivo combinado.
+    """
+    def on_done(future):
+        try:
+            segment, _mime_type, success = future.result()
+        except Exception:
+            segment, success = None, False
+        assembler.add(index, segment if success else None)
+    return on_done
+
+
+def make_encode_callback(encoder: EncoderPool, index: int):
+    """Crea un callback para Future.add_done_callback que envía el WAV individual del índice dado a codificar."""
+    def on_done(future):
+        try:
+            segment, _mime_type, success = future.result()
+        except Exception:
+            return
+        if success and segment is not None:
+            encoder.submit(index, segment.path)
+    return on_done
+
+
+def make_checkpoint_callback(checkpoint: ResumeCheckpoint, item_id: str, text_hash: str):
+    """Crea un callback para Future.add_done_callback que anota el ID en el checkpoint de --resume si terminó con audio."""
+    def on_done(future):
+        try:
+            segment, _mime_type, success = future.result()
+        except Exception:
+            return
+        if success and segment is not None:
+            checkpoint.add(item_id, text_hash, segment)
+    return on_done
 
 
-def main():
+def finish_encoding(
+    encoder: EncoderPool,
+    combined_path: str | None,
+    allow_concatenation: bool,
+    keep_wav: bool = False,
+    keep_combined_wav: bool = False,
+    keep_individual_wav: bool = False,
+    job_store: JobStore | None = None,
+) -> str | None:
+    """
+    Espera a la codificación de los archivos individuales y produce el combinado en
+    el formato del pool: encadenando los segmentos ya codificados si el formato lo
+    permite (y el combinado no tiene recortes ni pausas añadidas), o codificando el
+    WAV combinado. Salvo keep_wav, borra los WAV que se codificaron bien (el
+    combinado se conserva también con keep_combined_wav, para --incremental, y los
+    individuales con keep_individual_wav, para --resume y --merge).
+    Con job_store, la ruta de salida de cada ID pasa a ser su archivo codificado.
+    Devuelve la ruta del combinado codificado (None si no se pudo).
+    """
+    results = encoder.results()
+    encoded = 0
+    for index, wav_path, output_path, error in results:
+        if error is not None:
+            print(f"Advertencia: No se pudo codificar {wav_path}; se conserva el WAV")
+            log_error(f"Error al codificar {wav_path} a {output_path}: {error}")
+            continue
+        encoded += 1
+        if job_store is not None:
+            job_store.set_output_path(index, output_path)
+    print(f"Archivos individuales codificados a {encoder.output_format}: {encoded}/{len(results)}")
+
+    combined_output = None
+    if combined_path is not None:
+        try:
+            if allow_concatenation and encoder.output_format in CONCATENABLE_FORMATS and results and encoded == len(results):
+                combined_output = os.path.splitext(combined_path)[0] + FORMAT_EXTENSIONS[encoder.output_format]
+                concatenate_encoded([output_path for _index, _wav_path, output_path, _error in results], combined_output)
+                print(f"Archivo combinado obtenido encadenando los segmentos codificados: {combined_output}")
+            else:
+                combined_output = encoder.encode(combined_path)
+                print(f"Archivo combinado codificado: {combined_output}")
+            if not keep_wav and not keep_combined_wav:
+                os.remove(combined_path)
+        except Exception as e:
+            print(f"Advertencia: No se pudo codificar el archivo combinado; se conserva {combined_path}")
+            log_error(f"Error al codificar el archivo combinado {combined_path}: {e}")
+            combined_output = None
+
+    if not keep_wav and not keep_individual_wav:
+        for _index, wav_path, _output_path, error in results:
+            if error is None:
+                try:
+                    os.remove(wav_path)
+                except OSError:
+                    pass
+    return combined_output
+
+
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="Genera y combina audio desde textos en un JSON con formato [{'id': '', 'title': '', 'content': ''}], usando la estructura original de genai.Client.")
-    parser.add_argument("json_file", help="Ruta al archivo JSON que contiene un array de objetos con 'id', 'title' y 'content'.")
+    parser.add_argument("json_file", help="Ruta al archivo JSON (array o JSONL) con objetos con 'id', 'title' y 'content'; con --convert, el documento fuente a convertir.")
     parser.add_argument("test_name", help="Nombre de la prueba (se usará para generar el nombre del archivo de salida).")
     parser.add_argument("--ids", nargs='*', help="IDs específicos a procesar. Si no se especifica, se procesan todos los IDs.")
     parser.add_argument("--api_key", help="Clave API de Gemini. También se puede configurar mediante la variable de entorno GEMINI_API_KEY.")
+    parser.add_argument("--api_keys_file", help="Archivo con varias API keys (una por línea) para repartir la carga entre sus cuotas. También se pueden indicar en la variable de entorno GEMINI_API_KEYS, separadas por comas.")
+    parser.add_argument("--rpm_per_key", type=float, default=0, help="Con varias API keys, máximo de peticiones por minuto de cada una (por defecto: 0, sin límite).")
     parser.add_argument("--max_workers", type=int, default=5, help="Número máximo de hilos para procesamiento en paralelo.")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads", help="Motor de síntesis: 'threads' (ThreadPoolExecutor) o 'async' (asyncio sobre el cliente asíncrono de genai, para decenas de streams simultáneos). Por defecto: threads.")
+    parser.add_argument("--schedule", choices=SCHEDULES, default=DEFAULT_SCHEDULE, help=f"Orden de envío de las síntesis: 'longest_first' (primero los textos más largos, acorta el tiempo total) o 'json_order'. El archivo combinado siempre sigue el orden del JSON. Por defecto: {DEFAULT_SCHEDULE}.")
+    parser.add_argument("--schedule_lookahead", type=int, help=f"Con el motor de hilos y la entrada leída en streaming, cuántos textos leídos se retienen para enviar antes los más largos (por defecto: {DEFAULT_LOOKAHEAD}; con --convert, 1, para sintetizar cada sección en cuanto llega).")
     parser.add_argument("--model_name", default=MODEL_NAME, help=f"Nombre del modelo a usar (por defecto: {MODEL_NAME}).")
     parser.add_argument("--voice_name", default=VOICE_NAME, help=f"Nombre de la voz a usar (por defecto: {VOICE_NAME}).")
     parser.add_argument("--temperature", type=float, default=TEMPERATURE, help=f"Temperatura para la generación (por defecto: {TEMPERATURE}).")
-    args = parser.parse_args()
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE, help="Máximo de peticiones por minuto compartido por todos los hilos (por defecto: 0, sin límite).")
+    parser.add_argument("--max_concurrency", type=int, help="Máximo de streams simultáneos contra la API (por defecto: igual a --max_workers). Se reduce automáticamente ante errores 429 y se recupera con los éxitos.")
+    parser.add_argument("--min_concurrency", type=int, default=DEFAULT_MIN_CONCURRENCY, help=f"Mínimo de streams simultáneos al reducir por errores 429 (por defecto: {DEFAULT_MIN_CONCURRENCY}).")
+    parser.add_argument("--max_retries", type=int, default=DEFAULT_MAX_RETRIES, help=f"Número máximo de intentos por ID (por defecto: {DEFAULT_MAX_RETRIES}).")
+    parser.add_argument("--retry_base_delay", type=float, default=DEFAULT_BASE_DELAY, help=f"Espera base en segundos del backoff exponencial entre reintentos (por defecto: {DEFAULT_BASE_DELAY:g}).")
+    parser.add_argument("--retry_max_delay", type=float, default=DEFAULT_MAX_DELAY, help=f"Espera máxima en segundos entre reintentos (por defecto: {DEFAULT_MAX_DELAY:g}).")
+    parser.add_argument("--item_deadline", type=float, default=0, help="Tiempo máximo en segundos dedicado a cada ID, incluidos los reintentos y el stream en curso (por defecto: 0, sin límite).")
+    parser.add_argument("--chunk_chars", type=int, default=DEFAULT_CHUNK_CHARS, help="Divide los textos más largos que este número de caracteres en fragmentos por oraciones que se sintetizan en paralelo (por defecto: 0, sin dividir).")
+    parser.add_argument("--chunk_silence_ms", type=float, default=0, help="Silencio en milisegundos insertado entre los fragmentos de un mismo texto (por defecto: 0).")
+    parser.add_argument("--trim_silence", action="store_true", help="Recorta el silencio inicial y final de cada sección al unirlas en el archivo combinado (requiere NumPy). Los archivos individuales no se modifican.")
+    parser.add_argument("--silence_threshold_db", type=float, default=DEFAULT_THRESHOLD_DB, help=f"Con --trim_silence, dB por debajo del pico de cada sección que se consideran silencio (por defecto: {DEFAULT_THRESHOLD_DB:g}).")
+    parser.add_argument("--gap_ms", type=float, default=0, help="Silencio fijo en milisegundos insertado entre secciones en el archivo combinado (por defecto: 0; por ejemplo 400 junto con --trim_silence).")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="wav", help="Formato de los archivos de salida: wav (por defecto), flac (sin pérdida) u opus (voz a ~40 kbps). Requiere soundfile para flac/opus.")
+    parser.add_argument("--compression_level", type=float, help="Nivel de compresión de libsndfile entre 0 y 1 para flac/opus (en opus, más alto es menos bitrate). Por defecto, el de libsndfile.")
+    parser.add_argument("--encode_workers", type=int, default=0, help="Procesos que codifican a flac/opus en paralelo con la síntesis (por defecto: 0, uno por CPU).")
+    parser.add_argument("--keep_wav", action="store_true", help="Con --format flac/opus, conserva también los WAV individuales y el combinado.")
+    parser.add_argument("--cue", action="store_true", help="Además del índice de capítulos JSON, escribe una hoja CUE ({nombre}_completo.cue) para el archivo combinado.")
+    parser.add_argument("--ffmetadata", action="store_true", help="Además del índice de capítulos JSON, escribe los capítulos en formato ffmetadata de ffmpeg ({nombre}_completo.ffmetadata.txt).")
+    parser.add_argument("--incremental", action="store_true", help="Reconstrucción incremental: guarda un manifiesto del archivo combinado y en las siguientes ejecuciones solo sintetiza los IDs nuevos o con texto modificado, reutilizando el resto del combinado anterior.")
+    convert_group = parser.add_argument_group("conversión de documentos", "Generación del JSON de secciones con un modelo de texto (--convert)")
+    convert_group.add_argument("--convert", action="store_true", help="json_file es un documento fuente: se envía con el prompt de conversión a un modelo de texto de Gemini y cada sección que genera se sintetiza en cuanto llega.")
+    convert_group.add_argument("--prompt_file", default=DEFAULT_PROMPT_FILE, help="Prompt de conversión (por defecto: el prompt.txt del proyecto).")
+    convert_group.add_argument("--text_model", default=DEFAULT_TEXT_MODEL, help=f"Modelo de texto para la conversión (por defecto: {DEFAULT_TEXT_MODEL}).")
+    parser.add_argument("--resume", action="store_true", help="Reanuda una ejecución interrumpida: los IDs anotados en el checkpoint de la carpeta de audios cuyo WAV está completo y cuyo texto no cambió no se vuelven a sintetizar, y el archivo combinado se reconstruye con ellos.")
+    worker_group = parser.add_argument_group("workers distribuidos", "Reparto de un mismo JSON entre varios procesos o máquinas con una carpeta compartida")
+    worker_mode = worker_group.add_mutually_exclusive_group()
+    worker_mode.add_argument("--worker", action="store_true", help="Modo worker: reclama IDs del conjunto de trabajos compartido (--job_dir) con leases que caducan, los sintetiza en la carpeta de audios y termina cuando todos los IDs están terminados (espera a los que tienen otros workers, por si alguno cae). No genera el archivo combinado.")
+    worker_mode.add_argument("--merge", action="store_true", help="Paso coordinador: une en el orden del JSON los IDs que terminaron los workers y genera el archivo combinado, el índice y los resultados, sin llamar a la API.")
+    worker_group.add_argument("--job_dir", help="Carpeta compartida del conjunto de trabajos (por defecto: {nombre}_jobs junto a la carpeta de audios).")
+    worker_group.add_argument("--lease_seconds", type=float, default=DEFAULT_LEASE_SECONDS, help=f"Segundos sin heartbeat tras los que el lease de un worker caído se considera abandonado (por defecto: {DEFAULT_LEASE_SECONDS:g}).")
+    worker_group.add_argument("--worker_id", help="Identificador de este worker (por defecto: host-pid).")
+    parser.add_argument("--no_dedup", action="store_true", help="Sintetiza cada ID aunque su texto repita el de otro (por defecto, los textos idénticos se sintetizan una sola vez).")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help=f"Carpeta de la caché de audio sintetizado (por defecto: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache_max_mb", type=int, default=DEFAULT_CACHE_MAX_MB, help=f"Tamaño máximo de la caché en MB; se expulsan las entradas menos usadas (por defecto: {DEFAULT_CACHE_MAX_MB}).")
+    parser.add_argument("--no_cache", action="store_true", help="Desactiva la caché de audio: siempre se llama a la API.")
+    parser.add_argument("--backend", choices=["gemini", "fake"], default="gemini", help="Backend de síntesis: 'gemini' (API real) o 'fake' (audio sintético local y determinista, sin API key, para pruebas y benchmarks). Por defecto: gemini.")
+    fake_group = parser.add_argument_group("backend fake", "Opciones del backend simulado (--backend fake)")
+    fake_group.add_argument("--fake_latency", type=float, default=0.0, help="Segundos de latencia hasta el primer chunk (por defecto: 0).")
+    fake_group.add_argument("--fake_realtime_factor", type=float, default=0.0, help="Velocidad de generación respecto a la duración del audio; 2 = el doble de rápido que tiempo real (por defecto: 0, instantáneo).")
+    fake_group.add_argument("--fake_chunk_bytes", type=int, default=4096, help="Tamaño en bytes de cada chunk de PCM (por defecto: 4096).")
+    fake_group.add_argument("--fake_bytes_per_char", type=int, default=3000, help="Bytes de PCM generados por carácter de texto (por defecto: 3000, ~16 caracteres por segundo de audio).")
+    fake_group.add_argument("--fake_error_rate", type=float, default=0.0, help="Probabilidad de un error transitorio (503) por llamada (por defecto: 0).")
+    fake_group.add_argument("--fake_rate_limit_rate", type=float, default=0.0, help="Probabilidad de un error 429 RESOURCE_EXHAUSTED por llamada (por defecto: 0).")
+    fake_group.add_argument("--fake_text_latency", type=float, default=0.0, help="Con --convert, segundos hasta el primer chunk del modelo de texto simulado (por defecto: 0).")
+    fake_group.add_argument("--fake_text_chars_per_second", type=float, default=0.0, help="Con --convert, caracteres por segundo que escribe el modelo de texto simulado (por defecto: 0, instantáneo).")
+    fake_group.add_argument("--fake_seed", type=int, default=0, help="Semilla del audio y de los errores inyectados (por defecto: 0).")
+    parser.add_argument("--metrics_jsonl", help="Añade a este archivo una línea JSON por síntesis con sus métricas (espera en cola, primer chunk, stream, bytes, factor de tiempo real, reintentos, escritura en disco).")
+    parser.add_argument("--metrics_prom", help="Escribe al terminar un snapshot de las métricas en formato textfile de Prometheus en esta ruta.")
+    parser.add_argument("--stats_json", help="Guarda en este archivo JSON los contadores agregados de la ejecución (llamadas, reintentos, tiempo de stream frente a esperas, bytes copiados).")
+    parser.add_argument("--job_db", default=DEFAULT_JOB_DB, help=f"Base de datos SQLite donde se registra cada ejecución y el estado, intentos, tiempos y salida de cada ID (por defecto: {DEFAULT_JOB_DB}).")
+    parser.add_argument("--no_job_db", action="store_true", help="No registra la ejecución en la base de datos de trabajos (los errores van directamente a logs.txt).")
+    args = parser.parse_args(argv)
+
+    if (args.worker or args.merge) and (args.incremental or args.resume):
+        print("Error: --worker y --merge no se combinan con --incremental ni --resume (el conjunto de trabajos ya recuerda los IDs terminados).")
+        return
+    if (args.worker or args.merge) and args.convert:
+        print("Error: --worker y --merge necesitan el mismo JSON en todos los procesos; convierte primero con --convert y reparte el JSON resultante.")
+        return
+
+    if args.format != "wav" and not SOUNDFILE_AVAILABLE:
+        print(f"Error: --format {args.format} requiere la biblioteca soundfile (pip install soundfile).")
+        return
 
     api_key_value = args.api_key or os.environ.get("GEMINI_API_KEY")
-    if not api_key_value:
+    try:
+        pool_keys = load_api_keys(args.api_keys_file, os.environ.get("GEMINI_API_KEYS"))
+    except OSError as e:
+        print(f"Error: No se pudo leer el archivo de API keys {args.api_keys_file}")
+        log_error(f"Error al leer el archivo de API keys {args.api_keys_file}: {e}")
+        return
+    if pool_keys and api_key_value:
+        pool_keys = list(dict.fromkeys([api_key_value] + pool_keys))
+    if args.backend == "gemini" and not api_key_value and not pool_keys:
         print("Error: GEMINI_API_KEY no configurada. Por favor, establece la variable de entorno o usa el argumento --api_key.")
         return
 
-    try:
-        with open(args.json_file, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
-        
-        # Validar formato del JSON
-        if not isinstance(json_data, list):
-            print("Error: El archivo JSON debe contener un array de objetos.")
+    # Determinar qué IDs procesar (el filtro se aplica mientras se lee la entrada)
+    target_ids = set(args.ids) if args.ids else None
+    if not os.path.isfile(args.json_file):
+        if args.convert:
+            print(f"Error: Documento a convertir no encontrado en {args.json_file}")
+        else:
+            print(f"Error: Archivo JSON no encontrado en {args.json_file}")
+        return
+    conversion_prompt = None
+    if args.convert:
+        try:
+            with open(args.prompt_file, "r", encoding="utf-8") as f:
+                conversion_prompt = f.read()
+        except OSError as e:
+            print(f"Error: No se pudo leer el prompt de conversión {args.prompt_file}")
+            log_error(f"Error al leer el prompt de conversión {args.prompt_file}: {e}")
             return
-        
-        texts_to_process = []
-        titles_to_process = []
-        ids_to_process = []
-        
-        # Determinar qué IDs procesar
-        target_ids = set(args.ids) if args.ids else None
-        
-        for i, item in enumerate(json_data):
-            if not isinstance(item, dict):
-                print(f"Error: El elemento {i+1} debe ser un objeto con 'id', 'title' y 'content'.")
-                return
-            
-            required_fields = ['id', 'title', 'content']
-            for field in required_fields:
-                if field not in item:
-                    print(f"Error: El elemento {i+1} debe tener la propiedad '{field}'.")
-                    return
-            
-            if not isinstance(item['id'], str) or not isinstance(item['title'], str) or not isinstance(item['content'], str):
-                print(f"Error: 'id', 'title' y 'content' del elemento {i+1} deben ser strings.")
-                return
-            
-            # Solo procesar este item si su ID está en la lista target o si no se especificaron IDs
-            if target_ids is None or item['id'] in target_ids:
-                texts_to_process.append(item['content'])
-                titles_to_process.append(item['title'])
-                ids_to_process.append(item['id'])
-        
-        # Verificar si algunos IDs especificados no se encontraron
-        if target_ids:
-            found_ids = set(ids_to_process)
-            missing_ids = target_ids - found_ids
-            if missing_ids:
-                print(f"Advertencia: Los siguientes IDs no se encontraron en el JSON: {sorted(missing_ids)}")
-        
-        if not texts_to_process:
-            if target_ids:
-                print("No se encontraron textos para procesar con los IDs especificados.")
+
+    if args.backend == "fake":
+        backend = FakeBackend(
+            latency=args.fake_latency,
+            realtime_factor=args.fake_realtime_factor,
+            chunk_bytes=args.fake_chunk_bytes,
+            bytes_per_char=args.fake_bytes_per_char,
+            error_rate=args.fake_error_rate,
+            rate_limit_rate=args.fake_rate_limit_rate,
+            seed=args.fake_seed,
+        )
+        print("Backend de síntesis: fake (audio sintético local, sin llamadas a la API)")
+    else:
+        # Inicializa el cliente genai.Client() una vez, como en el script original
+        try:
+            if len(pool_keys) > 1:
+                key_backends = [
+                    (f"{n}:{mask_key(key)}", GeminiBackend(key, args.model_name, args.voice_name, args.temperature))
+                    for n, key in enumerate(pool_keys, 1)
+                ]
+                backend = KeyPoolBackend(key_backends, requests_per_minute_per_key=args.rpm_per_key)
+                text_client = key_backends[0][1].client
+                rpm_per_key = f"{args.rpm_per_key:g} peticiones/minuto por key" if args.rpm_per_key > 0 else "sin límite por key"
+                print(f"Pool de API keys: {len(pool_keys)} keys ({rpm_per_key})")
             else:
-                print("El archivo JSON está vacío o no contiene textos para procesar.")
+                backend = GeminiBackend(api_key_value or pool_keys[0], args.model_name, args.voice_name, args.temperature)
+                text_client = backend.client
+        except Exception as e:
+            print("Error inicializando genai.Client")
+            print("Asegúrate de que la biblioteca 'google-genai' esté instalada y que la API key sea válida.")
+            log_error(f"Error inicializando genai.Client: {e}")
             return
-    except FileNotFoundError:
-        print(f"Error: Archivo JSON no encontrado en {args.json_file}")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: No se pudo decodificar JSON desde {args.json_file}")
-        return
-    
-    # Inicializa el cliente genai.Client() una vez, como en el script original
-    try:
-        client = genai.Client(api_key=api_key_value)
-    except Exception as e:
-        print("Error inicializando genai.Client")
-        print("Asegúrate de que la biblioteca 'google-genai' esté instalada y que la API key sea válida.")
-        log_error(f"Error inicializando genai.Client: {e}")
-        return
 
-    base_generate_content_config = types.GenerateContentConfig(
-        temperature=args.temperature,
-        response_modalities=["audio"],
-        speech_config=types.SpeechConfig(
-            voice_config=types.VoiceConfig(
-                prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                    voice_name=args.voice_name
-                )
-            )
-        ),
+    # Con --convert, las secciones las escribe un modelo de texto a partir del documento
+    # (con el mismo cliente que la síntesis) y se leen a medida que llegan
+    if args.convert:
+        if args.backend == "fake":
+            text_model = FakeTextModel(latency=args.fake_text_latency, chars_per_second=args.fake_text_chars_per_second)
+        else:
+            text_model = GeminiTextModel(text_client, args.text_model)
+        converted_name = re.sub(r'[<>:"/\\|?*]', '_', args.test_name).strip() or "audio_test"
+        converted_json = f"{converted_name}_convertido.json"
+        reader = ConvertReader(text_model, args.json_file, conversion_prompt, target_ids, json_output=converted_json)
+        print(f"Conversión: {args.json_file} con el modelo {text_model.name} y el prompt {args.prompt_file}; las secciones se guardan en {converted_json}")
+    else:
+        reader = InputReader(args.json_file, target_ids)
+
+    # Con el motor de hilos, los elementos se envían a sintetizar a medida que se leen;
+    # --incremental, --worker, --merge y el motor asyncio necesitan antes la lista completa
+    stream_input = args.engine == "threads" and not (args.incremental or args.worker or args.merge)
+    items: list[TextItem] = []
+    if not stream_input:
+        try:
+            items.extend(reader)
+        except (OSError, ValueError) as e:
+            report_input_error(args.json_file, e)
+            return
+        if not check_input_selection(reader, len(items)):
+            return
+
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = AudioCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+            cache_stats = cache.stats()
+            print(f"Caché de audio: {args.cache_dir}/ ({cache_stats['entries']} entradas, {cache_stats['total_bytes'] / (1024*1024):.1f} MB)")
+        except Exception as e:
+            print(f"Advertencia: No se pudo inicializar la caché de audio, se continúa sin ella")
+            log_error(f"Error inicializando la caché de audio en {args.cache_dir}: {e}")
+            cache = None
+
+    if args.engine == "async":
+        # En el motor asyncio no hay hilos: la concurrencia solo la limita --max_concurrency
+        max_concurrency = args.max_concurrency or args.max_workers
+    else:
+        max_concurrency = min(args.max_concurrency or args.max_workers, args.max_workers)
+    rate_limiter = AdaptiveRateLimiter(max_concurrency, requests_per_minute=args.rpm, min_concurrency=args.min_concurrency)
+    rpm_description = f"{args.rpm:g} peticiones/minuto" if args.rpm > 0 else "sin límite de peticiones/minuto"
+    print(f"Limitador compartido: hasta {max_concurrency} streams simultáneos, {rpm_description}")
+
+    retry_policy = RetryPolicy(
+        max_retries=max(1, args.max_retries),
+        base_delay=args.retry_base_delay,
+        max_delay=args.retry_max_delay,
+        item_deadline=args.item_deadline or None,
     )
 
-    all_audio_segments_data = []
     first_valid_mime_type = None
     successful_ids = []
     failed_ids = []
@@ -373,37 +1140,475 @@ def main():
         log_error(f"Error al crear la carpeta para archivos individuales: {e}")
         output_folder = "."  # Usar directorio actual como fallback
 
-    print(f"Iniciando procesamiento de {len(texts_to_process)} textos con hasta {args.max_workers} hilos...")
-    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
-        future_to_data = {
-            executor.submit(generate_audio_for_text, content, title, item_id, client, args.model_name, base_generate_content_config, i, output_folder): (item_id, title, content)
-            for i, (item_id, title, content) in enumerate(zip(ids_to_process, titles_to_process, texts_to_process))
-        }
+    # Generar nombre de archivo combinado basado en el nombre de prueba
+    try:
+        # Limpiar el nombre de prueba para que sea válido como nombre de archivo
+        clean_test_name = re.sub(r'[<>:"/\\|?*]', '_', args.test_name)
+        clean_test_name = clean_test_name.strip()
+        
+        if clean_test_name:
+            output_filename = f"{clean_test_name}_completo.wav"
+        else:
+            output_filename = "audio_generado_completo.wav"
+    except Exception:
+        output_filename = "audio_generado_completo.wav"
+    
+    # Verificar permisos de escritura
+    try:
+        # Intentar crear un archivo temporal para verificar permisos
+        test_file = f"test_permissions_{int(time.time())}.tmp"
+        with open(test_file, "w") as f:
+            f.write("test")
+        os.remove(test_file)
+    except Exception as e:
+        log_error(f"Error de permisos de escritura: {e}")
+        output_filename = f"/tmp/{output_filename}"  # Intentar escribir en /tmp
+        print(f"Advertencia: Problemas de permisos, guardando en: {output_filename}")
+
+    segment_filter = None
+    if args.trim_silence:
+        if NUMPY_AVAILABLE:
+            segment_filter = lambda segment: trim_segment(segment, threshold_db=args.silence_threshold_db)
+        else:
+            print("Advertencia: --trim_silence requiere NumPy (pip install numpy); se une el audio sin recortar")
 
-        for i, future in enumerate(future_to_data):
-            item_id, title, content = future_to_data[future]
-            print(f"Esperando resultado para ID '{item_id}': '{title}' ({i+1}/{len(texts_to_process)})")
-            try:
-                audio_data, mime_type, success = future.result()
-                if success and audio_data and mime_type:
-                    all_audio_segments_data.append(audio_data)
-                    successful_ids.append(item_id)
-                    if first_valid_mime_type is None:
-                        first_valid_mime_type = mime_type
-                    elif first_valid_mime_type != mime_type:
-                        print(f"ADVERTENCIA: Discrepancia en el tipo MIME")
-                        log_error(f"ADVERTENCIA: Discrepancia en el tipo MIME. Esperado {first_valid_mime_type}, obtenido {mime_type}. Se usará el primer tipo MIME ({first_valid_mime_type}) para el encabezado WAV. Esto podría generar un audio incorrecto si los formatos base no son compatibles.")
-                elif success and audio_data and not mime_type:
-                     print(f"Advertencia: Se recibieron datos de audio pero no mime_type para ID '{item_id}': '{title}'")
-                     log_error(f"Advertencia: Se recibieron datos de audio pero no mime_type para ID '{item_id}': '{title}'")
-                     successful_ids.append(item_id)
+    # Con --incremental, las secciones sin cambios se reutilizan del combinado anterior
+    build_config = {
+        "backend": list(backend.cache_identity),
+        "mime_type": AUDIO_MIME_TYPE,
+        "chunk_chars": args.chunk_chars,
+        "chunk_silence_ms": args.chunk_silence_ms,
+        "trim_silence": segment_filter is not None,
+        "silence_threshold_db": args.silence_threshold_db if segment_filter is not None else None,
+        "gap_ms": args.gap_ms,
+    }
+    manifest = None
+    reused_segments = {}
+    if args.incremental:
+        manifest = RebuildManifest.load(manifest_path(output_filename), output_filename, build_config)
+        if manifest is not None:
+            reused_segments = manifest.reusable_segments(output_filename, [item.item_id for item in items], [item.content for item in items])
+            print(f"Reconstrucción incremental: {len(reused_segments)} de {len(items)} secciones sin cambios, se sintetizan {len(items) - len(reused_segments)}")
+        else:
+            print(f"Reconstrucción incremental: no hay un manifiesto válido para {output_filename}; se genera todo y se guarda uno nuevo")
+
+    # Con --resume, los IDs ya terminados en una ejecución anterior se toman de sus WAV
+    # verificados (se comprueban en plan_item, a medida que se leen)
+    resume_entries = load_checkpoint(checkpoint_path(output_folder)) if args.resume else {}
+    resumed_segments = {}
+
+    # Con --worker/--merge, el estado compartido entre procesos es el conjunto de trabajos
+    job_set = None
+    if args.worker or args.merge:
+        job_dir = args.job_dir or f"{clean_test_name}_jobs"
+        try:
+            job_set = LeaseJobSet(
+                job_dir, [item.item_id for item in items], [content_hash(item.content) for item in items], args.worker_id, args.lease_seconds,
+                claim_order=schedule_order([estimate_cost(item.content, args.chunk_chars) for item in items], args.schedule),
+            )
+        except OSError as e:
+            print(f"Error: No se pudo abrir el conjunto de trabajos {job_dir}")
+            log_error(f"Error al abrir el conjunto de trabajos {job_dir}: {e}")
+            return
+        if args.merge:
+            # Los terminados por los workers se unen igual que los verificados de --resume
+            resumed_segments = job_set.completed_segments()
+            print(f"Unión: {len(resumed_segments)} de {len(items)} IDs terminados por los workers en {job_dir}/")
+        else:
+            print(f"Worker {job_set.worker_id}: conjunto de trabajos {job_dir}/ (leases de {args.lease_seconds:g} s)")
+
+    # En modo worker/merge los IDs terminados ya quedan en el conjunto de trabajos
+    checkpoint = None
+    if job_set is None:
+        try:
+            checkpoint = ResumeCheckpoint(checkpoint_path(output_folder), append=args.resume)
+        except OSError as e:
+            print("Advertencia: No se pudo abrir el checkpoint de reanudación; esta ejecución no se podrá reanudar con --resume")
+            log_error(f"Error al abrir el checkpoint {checkpoint_path(output_folder)}: {e}")
+
+    # El archivo combinado se escribe a medida que terminan los workers, en el orden del JSON
+    # (al leer en streaming el total se fija cuando termina la lectura)
+    try:
+        if args.worker:
+            assembler = None  # el combinado lo genera el paso --merge
+        elif manifest is not None:
+            assembler = IncrementalAssembler(output_filename, [item.item_id for item in items], manifest, reused_segments, segment_filter=segment_filter, gap_ms=args.gap_ms)
+        else:
+            assembler = OrderedWavAssembler(output_filename, len(items), segment_filter=segment_filter, gap_ms=args.gap_ms)
+    except Exception as e:
+        print(f"Error al crear el archivo combinado {output_filename}")
+        log_error(f"Error al crear el archivo combinado {output_filename}: {e}")
+        assembler = None
+
+    # Los procesos de codificación arrancan ya, para codificar mientras sigue la síntesis
+    encoder = None
+    if args.format != "wav" and args.worker:
+        print(f"Formato de salida: los workers generan WAV; la codificación a {args.format} se hace en el paso --merge")
+    elif args.format != "wav":
+        encoder = EncoderPool(args.format, args.encode_workers or None, args.compression_level)
+        print(f"Formato de salida: {args.format} (codificación en paralelo con la síntesis)")
+
+    synthesis_args = (backend,)
+    pipeline_stats = PipelineStats()
+
+    # Registro de trabajos: estado de cada ID en SQLite; los errores se escriben desde su hilo
+    global error_log_store
+    job_store = None
+    if not args.no_job_db:
+        try:
+            job_store = JobStore(args.job_db, log_path="logs.txt")
+            options = {name: value for name, value in vars(args).items() if name != "api_key"}
+            job_store.start_run(args.test_name, args.json_file, output_filename, options)
+            error_log_store = job_store
+            print(f"Registro de trabajos: {args.job_db} (ejecución {job_store.run_id})")
+        except Exception as e:
+            print(f"Advertencia: No se pudo abrir el registro de trabajos {args.job_db}; se continúa sin él")
+            log_error(f"Error al abrir el registro de trabajos {args.job_db}: {e}")
+            if job_store is not None:
+                job_store.close()
+            job_store = None
+
+    try:
+        metrics_recorder = MetricsRecorder(args.metrics_jsonl, job_store)
+    except OSError as e:
+        print(f"Advertencia: No se pudo abrir {args.metrics_jsonl}, las métricas solo irán al archivo de resultados")
+        log_error(f"Error al abrir el archivo de métricas {args.metrics_jsonl}: {e}")
+        metrics_recorder = MetricsRecorder(job_store=job_store)
+    synthesis_kwargs = {
+        "retry_policy": retry_policy,
+        "cache": cache,
+        "rate_limiter": rate_limiter,
+        "stats": pipeline_stats,
+        "metrics_recorder": metrics_recorder,
+    }
+
+    def cache_key_fn(text):
+        if cache is None:
+            return None
+        return make_cache_key(text, *backend.cache_identity, AUDIO_MIME_TYPE)
+
+    def record_result(index, item_id, title, outcome):
+        """Clasifica el resultado (o la excepción) de un ID como éxito o fallo y lo anota en el registro de trabajos."""
+        nonlocal first_valid_mime_type
+        if outcome is None:
+            print(f"ID '{item_id}': '{title}' no se completó (procesamiento interrumpido)")
+            failed_ids.append(item_id)
+            if job_store is not None:
+                job_store.finish_item(index, "failed", error="procesamiento interrumpido")
+            return
+        if isinstance(outcome, BaseException):
+            print(f"Error al procesar ID '{item_id}': '{title}' (fuera de la llamada API)")
+            log_error(f"Error al procesar ID '{item_id}': '{title}' (fuera de la llamada API): {outcome}")
+            failed_ids.append(item_id)
+            if job_store is not None:
+                job_store.finish_item(index, "failed", error=str(outcome))
+            return
+        segment, mime_type, success = outcome
+        if job_store is not None:
+            if success and segment:
+                job_store.finish_item(index, "success", output_path=segment.path)
+            else:
+                job_store.finish_item(index, "failed", error="no se obtuvo audio tras los reintentos")
+        if success and segment and mime_type:
+            successful_ids.append(item_id)
+            if first_valid_mime_type is None:
+                first_valid_mime_type = mime_type
+            elif first_valid_mime_type != mime_type:
+                print(f"ADVERTENCIA: Discrepancia en el tipo MIME")
+                log_error(f"ADVERTENCIA: Discrepancia en el tipo MIME. Esperado {first_valid_mime_type}, obtenido {mime_type}. Se usará el primer tipo MIME ({first_valid_mime_type}) para el encabezado WAV. Esto podría generar un audio incorrecto si los formatos base no son compatibles.")
+        elif success and segment and not mime_type:
+             print(f"Advertencia: Se recibieron datos de audio pero no mime_type para ID '{item_id}': '{title}'")
+             log_error(f"Advertencia: Se recibieron datos de audio pero no mime_type para ID '{item_id}': '{title}'")
+             successful_ids.append(item_id)
+        else:
+            failed_ids.append(item_id)
+
+    # Los textos repetidos (normalizados) se sintetizan una vez y se reparten a todos sus IDs
+    duplicate_finder = None if args.no_dedup or job_set is not None else DuplicateFinder()
+    duplicates = {}
+    skipped = set()
+    resume_stale = resume_truncated = 0
+
+    def plan_item(index, item):
+        """
+        Decide qué hacer con un ID al leerlo: reutilizarlo (--incremental, --resume,
+        --merge), repartirle el audio de un texto idéntico o sintetizarlo. Lo registra
+        en el registro de trabajos y devuelve True si hay que enviarlo a sintetizar.
+        """
+        nonlocal first_valid_mime_type, resume_stale, resume_truncated
+        item_id, title, content = item
+        entry = resume_entries.get(item_id)
+        if entry is not None and index not in reused_segments:
+            file_path = individual_wav_path(title, item_id, output_folder)
+            if entry.get("hash") != content_hash(content) or entry.get("path") != file_path:
+                resume_stale += 1
+            else:
+                segment = verify_wav_file(file_path, entry.get("data_size"))
+                if segment is None:
+                    resume_truncated += 1
+                else:
+                    resumed_segments[index] = segment
+        if duplicate_finder is not None and index not in reused_segments and index not in resumed_segments:
+            original = duplicate_finder.check(index, content)
+            if original is not None:
+                duplicates[index] = original
+        if job_store is not None:
+            job_store.add_items(
+                [(index, item_id, title, content_hash(content))],
+                duplicate_of={index: items[duplicates[index]].item_id} if index in duplicates else None,
+            )
+
+        if index in reused_segments:
+            successful_ids.append(item_id)
+            first_valid_mime_type = first_valid_mime_type or manifest.mime_type
+            if job_store is not None:
+                job_store.finish_item(index, "reused", output_path=output_filename)
+            return False
+        if index in resumed_segments:
+            segment = resumed_segments[index]
+            successful_ids.append(item_id)
+            first_valid_mime_type = first_valid_mime_type or segment.mime_type
+            if job_store is not None:
+                job_store.finish_item(index, "reused", output_path=segment.path)
+            # El combinado se reconstruye con los archivos verificados de la ejecución anterior
+            if assembler is not None:
+                assembler.add(index, segment)
+            if encoder is not None:
+                encoder.submit(index, segment.path)
+            return False
+        return True
+
+    def submission_cost(index):
+        """Coste estimado de un ID para --schedule (un duplicado solo copia el audio de su original)."""
+        return 0 if index in duplicates else estimate_cost(items[index].content, args.chunk_chars)
+
+    def report_plan():
+        """Resumen de lo reanudado y lo deduplicado, cuando ya se planificaron todos los IDs."""
+        if args.resume:
+            pending_count = len(items) - len(reused_segments) - len(resumed_segments)
+            print(f"Reanudación: {len(resumed_segments)} IDs ya terminados y verificados; se sintetizan {pending_count} ({resume_stale} con texto o título modificado, {resume_truncated} con archivo incompleto o ausente)")
+        if duplicates:
+            saved_calls = sum(
+                len(split_text(items[index].content, args.chunk_chars)) if args.chunk_chars > 0 else 1
+                for index in duplicates
+            )
+            print(f"Deduplicación: {len(duplicates)} IDs repiten el texto de otro ID; se ahorran {saved_calls} llamadas a la API")
+
+    def read_and_plan():
+        """
+        Lee la entrada en streaming y produce (índice, elemento) de cada ID a sintetizar
+        en cuanto se lee. Un error de lectura o de formato detiene la lectura (los IDs
+        ya enviados terminan igual) y deja la ejecución como input_error.
+        """
+        nonlocal run_status
+        try:
+            for item in reader:
+                index = len(items)
+                items.append(item)
+                if plan_item(index, item):
+                    yield index, item
                 else:
-                    failed_ids.append(item_id)
+                    skipped.add(index)
+        except (OSError, ValueError) as e:
+            report_input_error(args.json_file, e)
+            log_error(f"Error al leer {args.json_file} tras {len(items)} elementos válidos: {e}")
+            print(f"Se procesan solo los {len(items)} textos leídos antes del error")
+            run_status = "input_error"
+
+    if not stream_input:
+        for index, item in enumerate(items):
+            if not plan_item(index, item):
+                skipped.add(index)
+        report_plan()
 
-            except Exception as exc:
-                print(f"Error al procesar ID '{item_id}': '{title}' (fuera de la llamada API)")
-                log_error(f"Error al procesar ID '{item_id}': '{title}' (fuera de la llamada API): {exc}")
+    run_status = "completed"
+    if args.merge:
+        for i, (item_id, title, _content) in enumerate(items):
+            if i not in skipped:
+                print(f"ID '{item_id}': '{title}' no lo terminó ningún worker")
                 failed_ids.append(item_id)
+                if job_store is not None:
+                    job_store.finish_item(i, "failed", error="ningún worker lo terminó")
+    elif args.worker:
+        print(f"Iniciando worker con hasta {args.max_workers} hilos sobre {len(items)} textos...")
+        try:
+            run_lease_worker(
+                job_set, items, output_folder, synthesis_args, synthesis_kwargs, cache_key_fn, args.max_workers, record_result,
+                chunk_chars=args.chunk_chars, chunk_silence_ms=args.chunk_silence_ms,
+            )
+        except KeyboardInterrupt:
+            print("\nWorker interrumpido por el usuario: se liberaron sus leases.")
+            log_error(f"Worker {job_set.worker_id} interrumpido por el usuario")
+            run_status = "interrupted"
+    elif args.engine == "async":
+        print(f"Iniciando procesamiento de {len(items)} textos con el motor asyncio (hasta {max_concurrency} síntesis simultáneas)...")
+        outcomes = [None] * len(items)
+        try:
+            asyncio.run(run_async_synthesis(
+                items, output_folder, synthesis_args, synthesis_kwargs, cache_key_fn, max_concurrency, outcomes,
+                assembler=assembler, encoder=encoder, chunk_chars=args.chunk_chars, chunk_silence_ms=args.chunk_silence_ms,
+                skip=skipped, duplicates=duplicates, checkpoint=checkpoint,
+                order=schedule_order([submission_cost(i) for i in range(len(items))], args.schedule),
+            ))
+        except KeyboardInterrupt:
+            print("\nProcesamiento interrumpido por el usuario: se cancelaron las síntesis en curso.")
+            log_error("Procesamiento interrumpido por el usuario (motor asyncio)")
+            run_status = "interrupted"
+        for i, ((item_id, title, _content), outcome) in enumerate(zip(items, outcomes)):
+            if i not in skipped:
+                record_result(i, item_id, title, outcome)
+    else:
+        if stream_input:
+            source = "lo escribe el modelo" if args.convert else f"se lee de {args.json_file}"
+            print(f"Iniciando procesamiento con hasta {args.max_workers} hilos (cada texto se envía en cuanto {source})...")
+        else:
+            print(f"Iniciando procesamiento de {len(items)} textos con hasta {args.max_workers} hilos...")
+        if stream_input:
+            # Solo se conoce lo ya leído: se ordena dentro de la ventana de lookahead
+            lookahead = args.schedule_lookahead or (1 if args.convert else DEFAULT_LOOKAHEAD)
+            if args.schedule != "longest_first":
+                lookahead = 1
+            submissions = lookahead_order(read_and_plan(), lambda entry: submission_cost(entry[0]), lookahead)
+        else:
+            submissions = ((i, items[i]) for i in schedule_order([submission_cost(i) for i in range(len(items))], args.schedule))
+        with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+            future_to_data = {}
+            future_by_index = {}
+            for i, (item_id, title, content) in submissions:
+                if i in skipped:
+                    continue
+                if i in duplicates:
+                    original_future = future_by_index[duplicates[i]]
+                    future = submit_duplicate(original_future, item_id, title, output_folder, pipeline_stats)
+                else:
+                    future = submit_item_synthesis(
+                        executor, content, title, item_id, i, output_folder, synthesis_args, synthesis_kwargs, cache_key_fn,
+                        chunk_chars=args.chunk_chars, chunk_silence_ms=args.chunk_silence_ms,
+                    )
+                future_by_index[i] = future
+                if assembler is not None:
+                    future.add_done_callback(make_assembly_callback(assembler, i))
+                if encoder is not None:
+                    future.add_done_callback(make_encode_callback(encoder, i))
+                if checkpoint is not None:
+                    future.add_done_callback(make_checkpoint_callback(checkpoint, item_id, content_hash(content)))
+                future_to_data[future] = (i, item_id, title, content)
+            if stream_input:
+                if assembler is not None:
+                    assembler.total = len(items)
+                check_input_selection(reader, len(items))
+                report_plan()
+
+            # Los resultados se atienden según terminan; el combinado ya los ordena por su cuenta
+            for n, future in enumerate(as_completed(future_to_data), 1):
+                i, item_id, title, content = future_to_data[future]
+                print(f"Terminado ID '{item_id}': '{title}' ({n}/{len(future_to_data)})")
+                try:
+                    outcome = future.result()
+                except Exception as exc:
+                    outcome = exc
+                record_result(i, item_id, title, outcome)
+
+    # Los resultados llegan en orden de finalización; el reporte sigue el orden del JSON
+    json_position = {}
+    for index, item in enumerate(items):
+        json_position.setdefault(item.item_id, index)
+    successful_ids.sort(key=json_position.get)
+    failed_ids.sort(key=json_position.get)
+
+    if checkpoint is not None:
+        checkpoint.close()
+    combined_segment = assembler.close() if assembler is not None else None
+    if duplicates:
+        dedup_stats = pipeline_stats.as_dict()
+        print(f"Deduplicación: {dedup_stats['deduplicated_items']} IDs reutilizaron el audio de un texto idéntico ({dedup_stats['deduplicated_audio_seconds']:.1f} segundos de audio sin sintetizar)")
+    if isinstance(assembler, IncrementalAssembler) and combined_segment is not None:
+        action = "actualizado en su sitio" if assembler.patched_in_place else "reescrito reutilizando las secciones sin cambios"
+        print(f"Archivo combinado {action} ({assembler.bytes_copied:,} bytes copiados)")
+    if args.incremental and combined_segment is not None:
+        try:
+            RebuildManifest(build_config, assembler.mime_type, combined_segment.data_offset, [
+                {
+                    "id": items[index].item_id,
+                    "title": items[index].title,
+                    "hash": content_hash(items[index].content),
+                    "position": position,
+                    "size": size,
+                }
+                for index, position, size in assembler.segment_positions
+            ]).save(manifest_path(output_filename))
+        except Exception as e:
+            print("Advertencia: No se pudo guardar el manifiesto de reconstrucción incremental")
+            log_error(f"Error al guardar el manifiesto de {output_filename}: {e}")
+    if assembler is not None and segment_filter is not None:
+        mime_parameters = parse_audio_mime_type(assembler.mime_type or "")
+        bytes_per_second = (mime_parameters.get("rate") or 24000) * ((mime_parameters.get("bits_per_sample") or 16) // 8)
+        trimmed_seconds = assembler.bytes_filtered_out / bytes_per_second
+        print(f"Silencio recortado en el archivo combinado: {trimmed_seconds:.1f} segundos ({assembler.bytes_filtered_out:,} bytes)")
+        if assembler.filter_failures:
+            print(f"Advertencia: No se pudo recortar el silencio de {assembler.filter_failures} secciones; se unieron completas")
+            log_error(f"No se pudo recortar el silencio de {assembler.filter_failures} secciones del archivo combinado")
+
+    if encoder is not None:
+        try:
+            combined_output = finish_encoding(
+                encoder,
+                combined_segment.path if combined_segment is not None else None,
+                allow_concatenation=segment_filter is None and args.gap_ms <= 0 and not reused_segments,
+                keep_wav=args.keep_wav,
+                keep_combined_wav=args.incremental,
+                # El checkpoint y el conjunto de trabajos verifican los WAV: sin ellos, repetir
+                # el comando volvería a sintetizar todo
+                keep_individual_wav=args.resume or args.merge,
+                job_store=job_store,
+            )
+        finally:
+            encoder.shutdown()
+        if combined_output is not None:
+            output_filename = combined_output
+
+    if combined_segment is not None:
+        # Índice de capítulos: las posiciones se anotaron al concatenar, no hace falta releer el audio
+        try:
+            mime_parameters = parse_audio_mime_type(assembler.mime_type or "")
+            chapters = ChapterIndex(
+                mime_parameters.get("rate") or 24000,
+                mime_parameters.get("bits_per_sample") or 16,
+                data_offset=combined_segment.data_offset,
+            )
+            for index, position, size in assembler.segment_positions:
+                chapters.add(items[index].item_id, items[index].title, position, size)
+            for path in write_chapter_files(chapters, output_filename, cue=args.cue, ffmetadata=args.ffmetadata):
+                print(f"Índice de capítulos guardado en: {path}")
+        except Exception as e:
+            print("Advertencia: No se pudo guardar el índice de capítulos")
+            log_error(f"Error al guardar el índice de capítulos de {output_filename}: {e}")
+
+    metrics_recorder.close()
+    metrics_summary = metrics_recorder.summary_lines()
+    key_summary = backend.summary_lines() if isinstance(backend, KeyPoolBackend) else None
+    if args.metrics_prom:
+        try:
+            metrics_recorder.write_prometheus(args.metrics_prom)
+            print(f"Métricas de Prometheus guardadas en: {args.metrics_prom}")
+        except Exception as e:
+            log_error(f"Error al guardar las métricas de Prometheus en {args.metrics_prom}: {e}")
+
+    if args.stats_json:
+        if assembler is not None:
+            pipeline_stats.add(bytes_copied=assembler.bytes_copied)
+        try:
+            with open(args.stats_json, "w", encoding="utf-8") as f:
+                json.dump({
+                    **pipeline_stats.as_dict(),
+                    "items": len(items),
+                    "successful": len(successful_ids),
+                    "failed": len(failed_ids),
+                    "final_concurrency_limit": rate_limiter.stats()["concurrency_limit"],
+                    **({"api_keys": backend.stats()} if isinstance(backend, KeyPoolBackend) else {}),
+                }, f, indent=2)
+        except Exception as e:
+            log_error(f"Error al guardar las estadísticas en {args.stats_json}: {e}")
 
     # Crear archivo de resultados incluso si no hay audio exitoso
     try:
@@ -412,63 +1617,57 @@ def main():
         if not clean_test_name:
             clean_test_name = "audio_test"
         results_filename = f"{clean_test_name}_resultados.txt"
-        create_results_file(results_filename, successful_ids, failed_ids, target_ids)
+        if args.worker:
+            # Cada worker escribe su propio reporte (la carpeta suele ser compartida)
+            clean_worker_id = re.sub(r'[<>:"/\\|?*]', '_', job_set.worker_id)
+            results_filename = f"{clean_test_name}_resultados_{clean_worker_id}.txt"
+        report_successful, report_failed = successful_ids, failed_ids
+        if job_store is not None:
+            # El archivo de resultados es una vista del registro de trabajos
+            job_store.finish_run(run_status)
+            by_status = job_store.ids_by_status()
+            report_successful = by_status["success"] + by_status["reused"]
+            report_failed = by_status["failed"]
+            if not args.worker:
+                # Un worker solo responde de los IDs que reclamó; el resto es de otros workers
+                report_failed += by_status["pending"] + by_status["running"]
+        create_results_file(results_filename, report_successful, report_failed, target_ids, metrics_summary, key_summary)
     except Exception as e:
         log_error(f"Error al crear archivo de resultados: {e}")
 
-    if not all_audio_segments_data or first_valid_mime_type is None:
-        print("No se generaron datos de audio con éxito o no se pudo determinar el tipo MIME.")
-        print(f"IDs exitosos: {len(successful_ids)}, IDs fallidos: {len(failed_ids)}")
+    if job_store is not None:
+        error_log_store = None
+        job_store.close()
+        if job_store.write_errors:
+            print(f"Advertencia: Fallaron {job_store.write_errors} escrituras en el registro de trabajos {args.job_db}")
+            log_error(f"Error al escribir en el registro de trabajos {args.job_db}: {job_store.last_write_error}")
+
+    if args.worker:
+        print(f"Worker {job_set.worker_id}: {len(successful_ids)} IDs terminados, {len(failed_ids)} fallidos (liberados para otros workers)")
+        if job_set.leases_taken_over or job_set.leases_lost:
+            print(f"Leases tomados de workers caídos: {job_set.leases_taken_over}; leases perdidos por no renovarlos a tiempo: {job_set.leases_lost}")
+        print("Cuando terminen todos los workers, une el resultado con: --merge")
         return
 
-    print("Concatenando todos los segmentos de audio...")
-    combined_raw_audio_data = b"".join(all_audio_segments_data)
+    if assembler is not None and assembler.error is not None:
+        print("Error durante la conversión final a WAV o al guardar")
+        log_error(f"Error durante la conversión final a WAV o al guardar: {assembler.error}")
+        return
 
-    if not combined_raw_audio_data:
-        print("Los datos de audio combinados están vacíos. No se puede crear el archivo WAV.")
+    if combined_segment is None or first_valid_mime_type is None:
+        print("No se generaron datos de audio con éxito o no se pudo determinar el tipo MIME.")
+        print(f"IDs exitosos: {len(successful_ids)}, IDs fallidos: {len(failed_ids)}")
         return
 
-    print(f"Convirtiendo datos de audio combinados a formato WAV usando mime_type base: {first_valid_mime_type}...")
     try:
-        final_wav_data = convert_to_wav(combined_raw_audio_data, first_valid_mime_type)
-        
-        # Generar nombre de archivo basado en el nombre de prueba
-        try:
-            # Limpiar el nombre de prueba para que sea válido como nombre de archivo
-            clean_test_name = re.sub(r'[<>:"/\\|?*]', '_', args.test_name)
-            clean_test_name = clean_test_name.strip()
-            
-            if clean_test_name:
-                output_filename = f"{clean_test_name}_completo.wav"
-            else:
-                output_filename = "audio_generado_completo.wav"
-        except Exception:
-            output_filename = "audio_generado_completo.wav"
-        
-        # Verificar permisos de escritura
-        try:
-            # Intentar crear un archivo temporal para verificar permisos
-            test_file = f"test_permissions_{int(time.time())}.tmp"
-            with open(test_file, "w") as f:
-                f.write("test")
-            os.remove(test_file)
-        except Exception as e:
-            log_error(f"Error de permisos de escritura: {e}")
-            output_filename = f"/tmp/{output_filename}"  # Intentar escribir en /tmp
-            print(f"Advertencia: Problemas de permisos, guardando en: {output_filename}")
-            
-        save_binary_file(output_filename, final_wav_data)
-        print(f"Audio combinado guardado exitosamente en {output_filename}")
-        
-        # Crear archivo de resultados con el mismo nombre base
-        results_filename = f"{clean_test_name}_resultados.txt"
-        create_results_file(results_filename, successful_ids, failed_ids, target_ids)
+        print(f"Archivo guardado en: {output_filename}")
+        print(f"Audio combinado guardado exitosamente en {output_filename} (mime_type base: {assembler.mime_type})")
         
         # Mostrar resumen de archivos generados
         print("\n=== RESUMEN DE ARCHIVOS GENERADOS ===")
         print(f"Archivo combinado: {output_filename}")
         print("Archivos individuales:")
-        individual_files_pattern = os.path.join(output_folder, "*.wav")
+        individual_files_pattern = os.path.join(output_folder, f"*{FORMAT_EXTENSIONS[args.format]}")
         individual_files = glob.glob(individual_files_pattern)
         for file in sorted(individual_files):
             print(f"  - {file}")
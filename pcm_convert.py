@@ -0,0 +1,191 @@
+"""
+Conversión vectorizada de PCM (tasa de muestreo, bits por muestra y canales) con NumPy.
+
+El audio de entrada se abre como memmap y se procesa en bloques de tamaño fijo,
+de modo que archivos de varios GB se convierten en streaming con memoria acotada.
+NumPy es opcional: sin él, NUMPY_AVAILABLE es False y convert_wav_data lanza un error.
+"""
+
+import math
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+    NUMPY_AVAILABLE = False
+
+from wav_io import WavInfo
+
+
+CONVERT_BLOCK_FRAMES = 65536  # frames de salida por bloque
+LOWPASS_HALF_TAPS = 32  # mitad de la longitud del filtro antialiasing al reducir la tasa de muestreo
+
+PCM_FORMAT = 1
+FLOAT_FORMAT = 3
+SUPPORTED_BITS = {PCM_FORMAT: (8, 16, 24, 32), FLOAT_FORMAT: (32,)}
+
+
+def make_params(sample_rate: int, bits_per_sample: int, num_channels: int, audio_format: int = PCM_FORMAT) -> dict:
+    """Parámetros de formato completos (con byte_rate y block_align) en el formato de join_wav.py."""
+    block_align = num_channels * (bits_per_sample // 8)
+    return {
+        "audio_format": audio_format,
+        "num_channels": num_channels,
+        "sample_rate": sample_rate,
+        "byte_rate": sample_rate * block_align,
+        "block_align": block_align,
+        "bits_per_sample": bits_per_sample,
+    }
+
+
+def needs_conversion(params: dict, target: dict) -> bool:
+    """Indica si un audio con `params` debe convertirse para coincidir con `target`."""
+    return any(params[key] != target[key] for key in ("audio_format", "num_channels", "sample_rate", "bits_per_sample"))
+
+
+def check_supported(params: dict):
+    """Lanza ValueError si el formato no se puede convertir (solo PCM entero y float de 32 bits)."""
+    if params["bits_per_sample"] not in SUPPORTED_BITS.get(params["audio_format"], ()):
+        raise ValueError(f"Formato no soportado para conversión: audio_format={params['audio_format']}, {params['bits_per_sample']} bits")
+
+
+def converted_frame_count(frames: int, source_rate: int, target_rate: int) -> int:
+    """Número de frames que produce convert_wav_data para `frames` frames de entrada."""
+    return frames * target_rate // source_rate
+
+
+def converted_data_size(info: WavInfo, target: dict) -> int:
+    """Tamaño en bytes del PCM convertido de `info` al formato `target`."""
+    frames = info.data_size // info.block_align
+    return converted_frame_count(frames, info.sample_rate, target["sample_rate"]) * target["block_align"]
+
+
+def open_frames(info: WavInfo):
+    """Abre el PCM de `info` como memmap de forma (frames, canales[, 3 para 24 bits])."""
+    frames = info.data_size // info.block_align
+    channels = info.num_channels
+    bits = info.bits_per_sample
+    if info.audio_format == FLOAT_FORMAT:
+        dtype, shape = "<f4", (frames, channels)
+    elif bits == 8:
+        dtype, shape = "u1", (frames, channels)
+    elif bits == 16:
+        dtype, shape = "<i2", (frames, channels)
+    elif bits == 24:
+        dtype, shape = "u1", (frames, channels, 3)
+    else:
+        dtype, shape = "<i4", (frames, channels)
+    if frames == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(info.path, dtype=dtype, mode="r", offset=info.data_offset, shape=shape)
+
+
+def to_float(raw, audio_format: int, bits: int):
+    """Convierte un bloque crudo a float32 en [-1, 1), forma (frames, canales)."""
+    if audio_format == FLOAT_FORMAT:
+        return raw.astype(np.float32)
+    if bits == 8:
+        return (raw.astype(np.float32) - 128.0) / 128.0
+    if bits == 16:
+        return raw.astype(np.float32) / 32768.0
+    if bits == 24:
+        raw = raw.astype(np.int32)
+        value = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+        value = np.where(value >= 1 << 23, value - (1 << 24), value)
+        return value.astype(np.float32) / float(1 << 23)
+    return (raw.astype(np.float64) / float(1 << 31)).astype(np.float32)
+
+
+def from_float(samples, audio_format: int, bits: int) -> bytes:
+    """Codifica un bloque float32 (frames, canales) al formato de salida, con saturación."""
+    if audio_format == FLOAT_FORMAT:
+        return samples.astype("<f4").tobytes()
+    samples = np.clip(samples, -1.0, 1.0)
+    if bits == 8:
+        return np.clip(np.round(samples * 128.0 + 128.0), 0, 255).astype("u1").tobytes()
+    if bits == 16:
+        return np.clip(np.round(samples * 32768.0), -32768, 32767).astype("<i2").tobytes()
+    if bits == 24:
+        value = np.clip(np.round(samples.astype(np.float64) * (1 << 23)), -(1 << 23), (1 << 23) - 1).astype("<i4")
+        # Los 3 bytes bajos de cada entero little-endian
+        return value.view("u1").reshape(value.shape + (4,))[..., :3].tobytes()
+    value = np.clip(np.round(samples.astype(np.float64) * (1 << 31)), -(1 << 31), (1 << 31) - 1).astype("<i4")
+    return value.tobytes()
+
+
+def _mix_channels(samples, target_channels: int):
+    """Down/up-mix: a mono se promedian los canales; desde mono se duplica; en otro caso se recortan o repiten."""
+    source_channels = samples.shape[1]
+    if source_channels == target_channels:
+        return samples
+    if target_channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    if source_channels == 1:
+        return np.repeat(samples, target_channels, axis=1)
+    indexes = [n % source_channels for n in range(target_channels)]
+    return samples[:, indexes]
+
+
+def _lowpass_kernel(cutoff: float):
+    """Filtro FIR paso bajo (sinc con ventana de Hann); cutoff relativo a la tasa de entrada (0-0.5)."""
+    taps = np.arange(-LOWPASS_HALF_TAPS, LOWPASS_HALF_TAPS + 1, dtype=np.float64)
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hanning(len(taps))
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def convert_wav_data(info: WavInfo, target: dict, out_file, block_frames: int = CONVERT_BLOCK_FRAMES) -> int:
+    """
+    Escribe en `out_file` el PCM de `info` convertido al formato `target`
+    (tasa de muestreo, bits por muestra y canales) y devuelve los bytes escritos.
+
+    El remuestreo es por interpolación lineal; al reducir la tasa de muestreo se
+    aplica antes un filtro antialiasing. Cada bloque de salida lee del memmap solo
+    el tramo de entrada que necesita (más el margen del filtro), así que no hay
+    estado entre bloques ni discontinuidades en sus bordes.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("La conversión de formato requiere NumPy (pip install numpy)")
+    check_supported(info.params())
+    check_supported(target)
+
+    source = open_frames(info)
+    frames_in = source.shape[0]
+    source_rate = info.sample_rate
+    target_rate = target["sample_rate"]
+    frames_out = converted_frame_count(frames_in, source_rate, target_rate)
+    step = source_rate / target_rate
+    kernel = _lowpass_kernel(0.5 * target_rate / source_rate) if target_rate < source_rate else None
+    margin = LOWPASS_HALF_TAPS if kernel is not None else 0
+
+    written = 0
+    for start in range(0, frames_out, block_frames):
+        stop = min(start + block_frames, frames_out)
+        positions = np.arange(start, stop, dtype=np.float64) * step
+        first = int(math.floor(positions[0]))
+        last = min(int(math.floor(positions[-1])) + 1, frames_in - 1)
+        read_start = max(0, first - margin)
+        read_stop = min(frames_in, last + margin + 1)
+
+        block = to_float(np.asarray(source[read_start:read_stop]), info.audio_format, info.bits_per_sample)
+        block = _mix_channels(block, target["num_channels"])
+        if kernel is not None:
+            # mode="same" se centraría en el filtro si el bloque es más corto que él: se recorta la convolución completa
+            block = np.stack(
+                [np.convolve(block[:, ch], kernel)[LOWPASS_HALF_TAPS:LOWPASS_HALF_TAPS + len(block)] for ch in range(block.shape[1])],
+                axis=1,
+            )
+
+        if source_rate == target_rate:
+            resampled = block[first - read_start:first - read_start + (stop - start)]
+        else:
+            local = positions - read_start
+            index = np.minimum(local.astype(np.int64), len(block) - 1)
+            following = np.minimum(index + 1, len(block) - 1)
+            fraction = (local - index).astype(np.float32)[:, None]
+            resampled = block[index] * (1.0 - fraction) + block[following] * fraction
+
+        data = from_float(resampled, target["audio_format"], target["bits_per_sample"])
+        out_file.write(data)
+        written += len(data)
+    return written
@@ -0,0 +1,54 @@
+"""
+Contadores agregados de una ejecución del pipeline (para benchmarks y diagnóstico).
+
+Separan el tiempo pasado recibiendo audio del modelo del tiempo dormido entre
+reintentos o esperando al limitador, y cuentan los bytes de PCM escritos y copiados.
+"""
+
+import threading
+
+
+class PipelineStats:
+    """
+    Acumuladores seguros para usar desde varios hilos (y desde el bucle asyncio).
+
+    Contadores:
+        api_calls: llamadas iniciadas al backend TTS.
+        cache_hits: IDs o fragmentos servidos desde la caché.
+        retries: intentos repetidos tras un fallo.
+        stream_seconds: tiempo recibiendo y escribiendo chunks del stream.
+        retry_sleep_seconds: tiempo dormido entre reintentos (backoff).
+        limiter_wait_seconds: tiempo esperando un hueco o token del limitador.
+        pcm_bytes_streamed: bytes de PCM recibidos del backend.
+        bytes_copied: bytes de PCM copiados entre archivos (caché, fragmentos, combinado).
+        deduplicated_items: IDs que reutilizaron el audio de otro ID con el mismo texto.
+        deduplicated_audio_seconds: segundos de audio que no hubo que sintetizar por ello.
+    """
+
+    FIELDS = (
+        "api_calls",
+        "cache_hits",
+        "retries",
+        "stream_seconds",
+        "retry_sleep_seconds",
+        "limiter_wait_seconds",
+        "pcm_bytes_streamed",
+        "bytes_copied",
+        "deduplicated_items",
+        "deduplicated_audio_seconds",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **increments):
+        """Suma los incrementos dados (por nombre de contador)."""
+        with self._lock:
+            for name, value in increments.items():
+                self._values[name] += value
+
+    def as_dict(self) -> dict:
+        """Devuelve una copia de los contadores actuales."""
+        with self._lock:
+            return dict(self._values)
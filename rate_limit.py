@@ -0,0 +1,206 @@
+"""
+Limitador de velocidad compartido por todos los workers.
+
+Combina un token bucket (peticiones por minuto) con un límite de streams
+concurrentes que se ajusta al estilo AIMD: sube de a uno mientras las llamadas
+tienen éxito y se reduce multiplicativamente ante un 429/RESOURCE_EXHAUSTED.
+"""
+
+import asyncio
+import math
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+DEFAULT_REQUESTS_PER_MINUTE = 0  # 0 = sin límite de peticiones por minuto
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_DECREASE_COOLDOWN = 5.0  # segundos: varios 429 de la misma ráfaga cuentan una sola vez
+
+
+# Un 429 en el mensaje solo cuenta como código HTTP ("HTTP 429", "status: 429", "429 Too Many Requests"),
+# no dentro de otros números (IDs, tamaños, fragmentos de texto)
+RATE_LIMIT_MESSAGE = re.compile(r"\b(?:HTTP|status(?:_code)?)\W{0,3}429\b|\b429\W{0,3}Too Many Requests\b", re.IGNORECASE)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Indica si una excepción de la API corresponde a un límite de cuota (HTTP 429)."""
+    for attribute in ("code", "status_code"):
+        if getattr(exc, attribute, None) == 429:
+            return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    if getattr(exc, "status", None) == "RESOURCE_EXHAUSTED":
+        return True
+    message = str(exc)
+    return "RESOURCE_EXHAUSTED" in message or RATE_LIMIT_MESSAGE.search(message) is not None
+
+
+class AdaptiveRateLimiter:
+    """
+    Limita peticiones por minuto y streams concurrentes para todo el proceso.
+
+    Uso desde un worker:
+        with limiter.request_slot():
+            ... llamada a la API ...
+        limiter.record_success()  # o limiter.record_rate_limited()
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        min_concurrency: int = DEFAULT_MIN_CONCURRENCY,
+        decrease_factor: float = DEFAULT_DECREASE_FACTOR,
+        decrease_cooldown: float = DEFAULT_DECREASE_COOLDOWN,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser al menos 1")
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.concurrency_limit = max_concurrency
+
+        # Token bucket: capacidad de ráfaga igual al límite de concurrencia máximo
+        self.requests_per_minute = requests_per_minute
+        self._rate = requests_per_minute / 60.0 if requests_per_minute > 0 else 0.0
+        self._capacity = float(max_concurrency)
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+
+        self._active = 0
+        self._successes_since_change = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        # Futures de las corrutinas en acquire_async(), en orden de llegada, con su bucle de eventos
+        self._async_waiters = deque()
+
+    def _notify_slot(self):
+        """Despierta a un hilo y a una corrutina que esperan stream libre. Requiere el lock."""
+        self._condition.notify()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            if not future.done():
+                loop.call_soon_threadsafe(_wake, future)
+                break
+
+    def _reserve_token(self) -> float:
+        """Consume un token y devuelve cuántos segundos hay que esperar para usarlo. Requiere el lock."""
+        if not self._rate:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self._rate
+
+    def acquire(self) -> float:
+        """
+        Bloquea hasta obtener un stream libre y un token de petición.
+        Devuelve los segundos esperados.
+        """
+        start = time.monotonic()
+        with self._condition:
+            while self._active >= self.concurrency_limit:
+                self._condition.wait()
+            self._active += 1
+            delay = self._reserve_token()
+        if delay > 0:
+            time.sleep(delay)
+        return time.monotonic() - start
+
+    async def acquire_async(self) -> float:
+        """
+        Versión para asyncio de acquire(): espera un stream libre sin bloquear el
+        bucle de eventos (release() y record_success() la despiertan) y después solo
+        lo que falte de token. Devuelve los segundos esperados.
+        """
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._active < self.concurrency_limit:
+                    self._active += 1
+                    delay = self._reserve_token()
+                    break
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._condition:
+                    if (loop, future) in self._async_waiters:
+                        self._async_waiters.remove((loop, future))
+                    elif self._active < self.concurrency_limit:
+                        # El aviso ya era para esta corrutina: se pasa a la siguiente
+                        self._notify_slot()
+                raise
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+        return time.monotonic() - start
+
+    def release(self):
+        """Libera el stream ocupado por acquire()."""
+        with self._condition:
+            self._active -= 1
+            self._notify_slot()
+
+    @contextmanager
+    def request_slot(self):
+        """Context manager que envuelve acquire()/release(); entrega los segundos esperados."""
+        waited = self.acquire()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def record_success(self):
+        """Aumento aditivo: +1 stream tras una ronda completa de éxitos al límite actual."""
+        with self._condition:
+            if self.concurrency_limit >= self.max_concurrency:
+                return
+            self._successes_since_change += 1
+            if self._successes_since_change >= self.concurrency_limit:
+                self.concurrency_limit += 1
+                self._successes_since_change = 0
+                self._notify_slot()
+                print(f"Limitador: concurrencia aumentada a {self.concurrency_limit}")
+
+    def record_rate_limited(self):
+        """Disminución multiplicativa del límite de concurrencia y vaciado del bucket ante un 429."""
+        with self._condition:
+            now = time.monotonic()
+            # Las llamadas que ya estaban en vuelo durante la última reducción no reducen de nuevo
+            if now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._last_decrease = now
+            self._successes_since_change = 0
+            self.concurrency_limit = max(self.min_concurrency, math.floor(self.concurrency_limit * self.decrease_factor))
+            self._tokens = min(self._tokens, 0.0)
+            print(f"Limitador: límite de cuota alcanzado, concurrencia reducida a {self.concurrency_limit}")
+
+    def stats(self) -> dict:
+        """Devuelve el estado actual del limitador."""
+        with self._condition:
+            return {
+                "concurrency_limit": self.concurrency_limit,
+                "active": self._active,
+                "requests_per_minute": self.requests_per_minute,
+            }
+
+
+def _wake(future):
+    """Completa el future de una corrutina en espera (en su bucle de eventos) si sigue pendiente."""
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,113 @@
+"""
+Reanudación de ejecuciones interrumpidas (--resume).
+
+Cada ID que termina con audio se anota en un checkpoint de solo añadir
+({carpeta de audios}/checkpoint.jsonl) con su hash de texto, su archivo y el
+tamaño de su PCM. Al reanudar, un ID se da por hecho si su entrada coincide con
+el texto y el título actuales y su WAV supera una verificación barata que solo
+lee los encabezados: el tamaño que declara el RIFF y el del chunk data deben
+coincidir con el tamaño real del archivo y con el anotado. Los IDs que faltan,
+cuyo texto cambió (obsoletos) o cuyo archivo está truncado se vuelven a sintetizar.
+
+Los WAV se escriben en un temporal .part que se renombra al cerrarlos
+(WavStreamWriter), así que un corte nunca deja un archivo a medias con el nombre final.
+"""
+
+import json
+import os
+import struct
+import threading
+
+from wav_io import WavSegment, read_wav_info, sync_file
+
+
+CHECKPOINT_NAME = "checkpoint.jsonl"
+
+
+def checkpoint_path(output_folder: str) -> str:
+    return os.path.join(output_folder, CHECKPOINT_NAME)
+
+
+def load_checkpoint(path: str) -> dict[str, dict]:
+    """
+    Lee el checkpoint y devuelve {id: última entrada}. Una línea incompleta (el
+    proceso murió mientras la escribía) se ignora.
+    """
+    entries = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and "id" in entry:
+                    entries[entry["id"]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def verify_wav_file(path: str, expected_data_size: int | None = None) -> WavSegment | None:
+    """
+    Comprueba, leyendo solo los encabezados, que el WAV está completo: el tamaño del
+    RIFF y el del chunk data que declara coinciden con el real (y con
+    expected_data_size, si se indica). Devuelve su WavSegment, o None si falta,
+    está truncado o no es un WAV válido.
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            riff_id, riff_size = struct.unpack("<4sI", f.read(8))
+        info = read_wav_info(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    # En RF64 el tamaño de 32 bits no se usa (0xFFFFFFFF); el del chunk data se comprueba igual
+    if riff_id == b"RIFF" and file_size not in (riff_size + 8, riff_size + 9):
+        return None
+    # read_wav_info limita el tamaño de datos a lo que contiene el archivo: un WAV
+    # cortado tiene menos datos de los anotados en el checkpoint
+    if not info.data_size or (expected_data_size is not None and info.data_size != expected_data_size):
+        return None
+    return info.segment()
+
+
+class ResumeCheckpoint:
+    """
+    Checkpoint de solo añadir de los IDs terminados (seguro entre hilos).
+
+    Cada entrada se escribe y se sincroniza con el disco en cuanto termina su ID,
+    para que sobreviva a un corte del proceso o de la máquina. Es el único punto
+    que sincroniza los WAV: el resto de archivos (fragmentos, combinado, caché) no
+    paga el coste de fsync. Con append=False se empieza un checkpoint nuevo
+    (ejecución sin --resume).
+    """
+
+    def __init__(self, path: str, append: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def add(self, item_id: str, text_hash: str, segment: WavSegment):
+        """
+        Anota un ID terminado con el archivo y el tamaño de su audio. El WAV se
+        sincroniza con el disco antes de anotarlo: tras un corte de la máquina, una
+        entrada del checkpoint nunca apunta a un archivo cuyo contenido no llegó al disco.
+        """
+        line = json.dumps({"id": item_id, "hash": text_hash, "path": segment.path, "data_size": segment.data_size}, ensure_ascii=False)
+        try:
+            sync_file(segment.path)
+        except OSError:
+            return  # Sin el archivo en disco, el ID se volverá a sintetizar al reanudar
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,178 @@
+"""
+Política de reintentos para las llamadas a la API de Gemini.
+
+Clasifica los errores en fatales (no se reintentan), límites de cuota y
+transitorios, y calcula la espera con backoff exponencial y jitter, respetando
+las indicaciones de reintento del servidor y un plazo máximo por ID.
+"""
+
+import random
+import re
+import time
+
+from rate_limit import is_rate_limit_error
+
+
+FATAL = "fatal"
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_RATE_LIMITED_BASE_DELAY = 10.0
+
+# Códigos HTTP y estados gRPC que no van a funcionar por mucho que se reintente
+FATAL_HTTP_CODES = {400, 401, 403, 404, 405, 409, 412, 413, 422}
+FATAL_STATUSES = {
+    "INVALID_ARGUMENT",
+    "FAILED_PRECONDITION",
+    "PERMISSION_DENIED",
+    "UNAUTHENTICATED",
+    "NOT_FOUND",
+    "OUT_OF_RANGE",
+    "UNIMPLEMENTED",
+}
+
+class ItemDeadlineExceeded(TimeoutError):
+    """El ID agotó su plazo máximo (--item_deadline) con el stream aún en curso."""
+
+
+_RETRY_IN_PATTERN = re.compile(r"retry in ([0-9]+(?:\.[0-9]+)?)\s*s", re.IGNORECASE)
+_RETRY_DELAY_PATTERN = re.compile(r"^([0-9]+(?:\.[0-9]+)?)s$")
+
+
+def _find_retry_delay(details) -> float | None:
+    """Busca recursivamente un google.rpc.RetryInfo (retryDelay: '12s') en el JSON del error."""
+    if isinstance(details, dict):
+        retry_delay = details.get("retryDelay")
+        if isinstance(retry_delay, str):
+            match = _RETRY_DELAY_PATTERN.match(retry_delay.strip())
+            if match:
+                return float(match.group(1))
+        for value in details.values():
+            found = _find_retry_delay(value)
+            if found is not None:
+                return found
+    elif isinstance(details, list):
+        for value in details:
+            found = _find_retry_delay(value)
+            if found is not None:
+                return found
+    return None
+
+
+def server_retry_after(exc: BaseException | None) -> float | None:
+    """Extrae la espera sugerida por el servidor (Retry-After, RetryInfo o 'retry in Ns'), si existe."""
+    if exc is None:
+        return None
+
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+            if value is not None:
+                return max(0.0, float(value))
+        except (TypeError, ValueError, AttributeError):
+            pass
+
+    found = _find_retry_delay(getattr(exc, "details", None))
+    if found is not None:
+        return found
+
+    match = _RETRY_IN_PATTERN.search(str(exc))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """
+    Decide si un intento fallido se reintenta y cuánto esperar antes del siguiente.
+
+    Uso:
+        deadline = policy.start()
+        ...
+        error_class = policy.classify(exc)
+        delay = policy.next_delay(attempt, error_class, exc, deadline)
+        if delay is None: abandonar
+    """
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        rate_limited_base_delay: float = DEFAULT_RATE_LIMITED_BASE_DELAY,
+        item_deadline: float | None = None,
+        rng: random.Random | None = None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limited_base_delay = rate_limited_base_delay
+        self.item_deadline = item_deadline
+        self._rng = rng or random.Random()
+
+    def start(self) -> float | None:
+        """Devuelve el instante (time.monotonic) límite para el ID que empieza, o None si no hay plazo."""
+        if not self.item_deadline:
+            return None
+        return time.monotonic() + self.item_deadline
+
+    @staticmethod
+    def remaining(deadline: float | None) -> float | None:
+        """Segundos que le quedan al ID (0 si ya venció), o None si no hay plazo."""
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    @staticmethod
+    def check_deadline(deadline: float | None):
+        """Lanza ItemDeadlineExceeded si el plazo del ID ya venció (se comprueba en cada chunk del stream)."""
+        if deadline is not None and time.monotonic() >= deadline:
+            raise ItemDeadlineExceeded("Plazo máximo del ID agotado durante el stream")
+
+    def classify(self, exc: BaseException | None) -> str:
+        """
+        Clasifica un error como FATAL, RATE_LIMITED o TRANSIENT.
+        Un intento sin excepción pero sin audio (exc=None) se considera transitorio.
+        """
+        if exc is None:
+            return TRANSIENT
+        if is_rate_limit_error(exc):
+            return RATE_LIMITED
+        code = getattr(exc, "code", None)
+        status = getattr(exc, "status", None)
+        if isinstance(code, int) and code in FATAL_HTTP_CODES:
+            return FATAL
+        if isinstance(status, str) and status in FATAL_STATUSES:
+            return FATAL
+        return TRANSIENT
+
+    def retry_after(self, exc: BaseException | None) -> float | None:
+        """Extrae la espera sugerida por el servidor (Retry-After, RetryInfo o 'retry in Ns'), si existe."""
+        return server_retry_after(exc)
+
+    def next_delay(self, attempt: int, error_class: str, exc: BaseException | None = None, deadline: float | None = None) -> float | None:
+        """
+        Devuelve los segundos a esperar antes del intento siguiente a `attempt` (base 0),
+        o None si no se debe reintentar (error fatal, sin intentos o plazo agotado).
+        """
+        if error_class == FATAL or attempt + 1 >= self.max_retries:
+            return None
+
+        base = self.rate_limited_base_delay if error_class == RATE_LIMITED else self.base_delay
+        ceiling = min(self.max_delay, base * (2 ** attempt))
+        hint = self.retry_after(exc)
+        if hint is not None:
+            # Respetar la indicación del servidor con un pequeño jitter para no reintentar todos a la vez
+            delay = hint + self._rng.uniform(0, base)
+        else:
+            # Backoff exponencial con "equal jitter": la mitad fija y la otra mitad aleatoria
+            delay = ceiling / 2 + self._rng.uniform(0, ceiling / 2)
+
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
@@ -0,0 +1,64 @@
+"""
+Orden de envío de las síntesis (--schedule).
+
+El tiempo de síntesis de un ID crece con la longitud de su texto. Si se envían en
+el orden del JSON y las secciones largas están al final, los últimos hilos siguen
+sintetizándolas cuando el resto ya terminó. Con longest_first (LPT, longest
+processing time first) se envían primero las más costosas y las cortas rellenan
+los huecos al final, lo que acorta el tiempo total. El orden del archivo combinado
+no cambia: OrderedWavAssembler escribe siempre en el orden del JSON.
+
+Cuando la entrada se lee en streaming no se conoce el resto del archivo, así que
+se ordena dentro de una ventana de lookahead (--schedule_lookahead elementos).
+"""
+
+import heapq
+from typing import Callable, Iterable, Iterator, TypeVar
+
+
+SCHEDULES = ("longest_first", "json_order")
+DEFAULT_SCHEDULE = "longest_first"
+DEFAULT_LOOKAHEAD = 64
+# Coste fijo de cada llamada (conexión y espera hasta el primer chunk), en caracteres equivalentes
+REQUEST_OVERHEAD_CHARS = 300
+
+T = TypeVar("T")
+
+
+def estimate_cost(text: str, chunk_chars: int = 0) -> int:
+    """
+    Coste estimado de sintetizar un texto: sus caracteres más el coste fijo de cada
+    llamada (una por fragmento si chunk_chars > 0).
+    """
+    calls = max(1, -(-len(text) // chunk_chars)) if chunk_chars > 0 else 1
+    return len(text) + REQUEST_OVERHEAD_CHARS * calls
+
+
+def schedule_order(costs: list[float], schedule: str = DEFAULT_SCHEDULE) -> list[int]:
+    """
+    Índices en el orden de envío. Los empates conservan el orden del JSON, así que
+    un ID con coste 0 (un duplicado que solo copia audio) va después de su original.
+    """
+    if schedule == "json_order":
+        return list(range(len(costs)))
+    return sorted(range(len(costs)), key=lambda index: -costs[index])
+
+
+def lookahead_order(entries: Iterable[T], cost_fn: Callable[[T], float], window: int = DEFAULT_LOOKAHEAD) -> Iterator[T]:
+    """
+    Reordena un flujo de entradas: retiene hasta `window` y suelta siempre la de mayor
+    coste (a igual coste, la primera en llegar). Con window <= 1 conserva el orden.
+
+    La primera entrada sale en cuanto llega y la ventana crece de a una con cada
+    entrada soltada, así los workers empiezan a sintetizar mientras se llena en vez
+    de esperar a leer `window` entradas.
+    """
+    heap = []
+    yielded = 0
+    for arrival, entry in enumerate(entries):
+        heapq.heappush(heap, (-cost_fn(entry), arrival, entry))
+        if len(heap) > min(window - 1, yielded):
+            yield heapq.heappop(heap)[2]
+            yielded += 1
+    while heap:
+        yield heapq.heappop(heap)[2]
@@ -0,0 +1,116 @@
+"""
+Recorte vectorizado (NumPy) del silencio inicial y final de los segmentos de audio.
+
+El umbral se calcula por segmento: se mide la energía RMS en ventanas de 10 ms y
+se considera silencio todo lo que queda más de `threshold_db` por debajo de la
+ventana más fuerte del segmento (y siempre lo que está bajo `floor_db` dBFS).
+El audio se lee por bloques desde un memmap y el recorte solo ajusta el rango
+(offset, tamaño) del PCM, de modo que después se sigue copiando sin pasar por Python.
+"""
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+    NUMPY_AVAILABLE = False
+
+from pcm_convert import PCM_FORMAT, check_supported, open_frames, to_float
+from wav_io import WavInfo, WavSegment, parse_audio_mime_type
+
+
+DEFAULT_THRESHOLD_DB = 40.0  # dB por debajo de la ventana más fuerte del segmento
+DEFAULT_FLOOR_DB = -60.0  # dBFS: por debajo siempre es silencio
+DEFAULT_KEEP_MS = 30.0  # silencio conservado en cada borde para no cortar ataques ni colas
+WINDOW_MS = 10
+BLOCK_WINDOWS = 4096  # ventanas analizadas por bloque (~41 s de audio)
+
+
+def _window_levels(frames, first_window: int, last_window: int, window: int, audio_format: int, bits: int):
+    """RMS (mezcla mono) de las ventanas [first_window, last_window)."""
+    raw = np.asarray(frames[first_window * window:last_window * window])
+    samples = to_float(raw, audio_format, bits).mean(axis=1)
+    samples = samples.reshape(last_window - first_window, window).astype(np.float64)
+    return np.sqrt(np.mean(samples * samples, axis=1))
+
+
+def voiced_range(
+    info: WavInfo,
+    threshold_db: float = DEFAULT_THRESHOLD_DB,
+    floor_db: float = DEFAULT_FLOOR_DB,
+    keep_ms: float = DEFAULT_KEEP_MS,
+) -> tuple[int, int]:
+    """
+    Devuelve (offset, tamaño) en bytes del tramo de `info` que queda al quitar el
+    silencio inicial y final. Un segmento completamente en silencio conserva su primera
+    ventana, para que el ID siga en el archivo combinado y en el índice de capítulos.
+    Lee el segmento una vez por bloques para hallar su nivel máximo y después solo
+    los bordes, hasta encontrar voz.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("El recorte de silencio requiere NumPy (pip install numpy)")
+    check_supported(info.params())
+
+    frames = open_frames(info)
+    total_frames = frames.shape[0]
+    window = max(1, info.sample_rate * WINDOW_MS // 1000)
+    windows = total_frames // window
+    if windows == 0:
+        return info.data_offset, info.data_size
+
+    def levels(first, last):
+        return _window_levels(frames, first, last, window, info.audio_format, info.bits_per_sample)
+
+    peak = 0.0
+    for first in range(0, windows, BLOCK_WINDOWS):
+        peak = max(peak, float(levels(first, min(first + BLOCK_WINDOWS, windows)).max()))
+    threshold = max(peak * 10 ** (-threshold_db / 20), 10 ** (floor_db / 20))
+    if peak < threshold:
+        return info.data_offset, window * info.block_align
+
+    start_window = None
+    for first in range(0, windows, BLOCK_WINDOWS):
+        voiced = np.flatnonzero(levels(first, min(first + BLOCK_WINDOWS, windows)) >= threshold)
+        if len(voiced):
+            start_window = first + int(voiced[0])
+            break
+
+    end_window = start_window
+    for last in range(windows, start_window, -BLOCK_WINDOWS):
+        first = max(start_window, last - BLOCK_WINDOWS)
+        voiced = np.flatnonzero(levels(first, last) >= threshold)
+        if len(voiced):
+            end_window = first + int(voiced[-1])
+            break
+
+    keep_frames = int(info.sample_rate * keep_ms / 1000)
+    start_frame = max(0, start_window * window - keep_frames)
+    # La última ventana incompleta (si la hay) se conserva junto con la voz final
+    end_frame = total_frames if end_window == windows - 1 else min(total_frames, (end_window + 1) * window + keep_frames)
+    return info.data_offset + start_frame * info.block_align, (end_frame - start_frame) * info.block_align
+
+
+def segment_info(segment: WavSegment) -> WavInfo:
+    """WavInfo (PCM mono) de un WavSegment producido por el pipeline, a partir de su mime_type."""
+    parameters = parse_audio_mime_type(segment.mime_type or "")
+    sample_rate = parameters.get("rate") or 24000
+    bits = parameters.get("bits_per_sample") or 16
+    block_align = bits // 8
+    return WavInfo(segment.path, PCM_FORMAT, 1, sample_rate, sample_rate * block_align, block_align, bits, segment.data_offset, segment.data_size, False)
+
+
+def trim_segment(segment: WavSegment | None, **options) -> WavSegment | None:
+    """Devuelve un WavSegment con el rango de `segment` sin el silencio de los bordes."""
+    if segment is None or not segment.data_size:
+        return segment
+    offset, size = voiced_range(segment_info(segment), **options)
+    return WavSegment(segment.path, offset, size, segment.mime_type)
+
+
+def trim_info(info: WavInfo, **options) -> WavInfo:
+    """Devuelve una copia de `info` con el rango de datos sin el silencio de los bordes."""
+    if not info.data_size:
+        return info
+    offset, size = voiced_range(info, **options)
+    return WavInfo(info.path, info.audio_format, info.num_channels, info.sample_rate, info.byte_rate, info.block_align, info.bits_per_sample, offset, size, info.is_rf64)
+
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+from audio_encode import EncoderPool, concatenate_encoded, encode_wav_file, encoded_path
+from wav_io import build_wav_header
+
+
+def write_wav(path, pcm: bytes, sample_rate=24000, bits=16) -> str:
+    with open(path, "wb") as f:
+        f.write(build_wav_header(len(pcm), sample_rate, bits) + pcm)
+    return str(path)
+
+
+def tone_pcm16(sample_rate=24000, seconds=0.2) -> bytes:
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return (np.sin(2 * np.pi * 440 * t) * 16000).astype("<i2").tobytes()
+
+
+def test_encoded_path():
+    assert encoded_path("salida/1_Intro.wav", "opus") == "salida/1_Intro.opus"
+
+
+@pytest.mark.parametrize("bits, subtype", [(16, "PCM_16"), (8, "PCM_S8")])
+def test_flac_is_lossless_and_keeps_bit_depth(tmp_path, bits, subtype):
+    pcm = tone_pcm16() if bits == 16 else bytes(range(256)) * 10
+    wav = write_wav(tmp_path / "a.wav", pcm, bits=bits)
+
+    size = encode_wav_file(wav, str(tmp_path / "a.flac"), "flac")
+
+    assert size == os.path.getsize(tmp_path / "a.flac")
+    assert sf.info(str(tmp_path / "a.flac")).subtype == subtype
+    decoded, _rate = sf.read(str(tmp_path / "a.flac"), dtype="int16" if bits == 16 else "float32")
+    original, _rate = sf.read(wav, dtype="int16" if bits == 16 else "float32")
+    assert np.array_equal(decoded, original)
+
+
+def test_opus_rejects_unsupported_rates_without_leaving_files(tmp_path):
+    wav = write_wav(tmp_path / "a.wav", tone_pcm16(44100), sample_rate=44100)
+
+    with pytest.raises(ValueError, match="44100"):
+        encode_wav_file(wav, str(tmp_path / "a.opus"), "opus")
+    assert sorted(os.listdir(tmp_path)) == ["a.wav"]
+
+
+def test_opus_files_are_chained_byte_for_byte(tmp_path):
+    parts = []
+    for n in range(2):
+        wav = write_wav(tmp_path / f"{n}.wav", tone_pcm16())
+        encode_wav_file(wav, str(tmp_path / f"{n}.opus"), "opus")
+        parts.append(str(tmp_path / f"{n}.opus"))
+
+    size = concatenate_encoded(parts, str(tmp_path / "all.opus"))
+
+    expected = b"".join(open(path, "rb").read() for path in parts)
+    assert (tmp_path / "all.opus").read_bytes() == expected
+    assert size == len(expected)
+    assert not (tmp_path / "all.opus.tmp").exists()
+
+
+def test_encoder_pool_encodes_each_file_once_and_reports_in_order(tmp_path):
+    first = write_wav(tmp_path / "a.wav", tone_pcm16())
+    second = str(tmp_path / "b.wav")
+    with open(second, "wb") as f:
+        f.write(b"no es un wav")
+    pool = EncoderPool("flac", max_workers=1)
+    try:
+        pool.submit(2, second)
+        pool.submit(0, first)
+        shared = pool.submit(1, first)  # mismo archivo (texto duplicado): misma codificación
+        assert shared is pool.submit(0, first)
+        results = pool.results()
+    finally:
+        pool.shutdown()
+
+    assert [(index, os.path.basename(path)) for index, path, _out, _error in results] == [(0, "a.wav"), (1, "a.wav"), (2, "b.wav")]
+    assert results[0][3] is None and results[1][3] is None
+    assert results[2][3] is not None
+    assert sf.info(results[0][2]).format == "FLAC"
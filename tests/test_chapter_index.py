@@ -0,0 +1,70 @@
+import json
+
+from chapter_index import ChapterIndex, write_chapter_files
+
+
+def make_index() -> ChapterIndex:
+    # 24 kHz, 16 bits, mono: 48000 bytes por segundo
+    index = ChapterIndex(24000, 16, 1, data_offset=44)
+    index.add("1", "Introducción", 0, 48000 * 61)
+    index.add("2", 'Capítulo "dos"; a=b', 48000 * 61 + 4800, 24000)
+    return index
+
+
+def test_chapter_positions():
+    first, second = make_index().chapters
+
+    assert first["samples"] == 24000 * 61
+    assert first["duration_seconds"] == 61.0
+    assert second["sample_offset"] == 24000 * 61 + 2400
+    assert second["byte_offset"] == 44 + 48000 * 61 + 4800
+    assert second["start_seconds"] == 61.1
+
+
+def test_json_drops_byte_offsets_for_compressed_audio(tmp_path):
+    paths = write_chapter_files(make_index(), str(tmp_path / "libro.opus"))
+
+    assert paths == [str(tmp_path / "libro.chapters.json")]
+    data = json.loads((tmp_path / "libro.chapters.json").read_text(encoding="utf-8"))
+    assert data["audio_file"] == "libro.opus"
+    assert data["data_offset"] is None
+    assert all("byte_offset" not in chapter for chapter in data["chapters"])
+    assert data["chapters"][0]["title"] == "Introducción"
+
+
+def test_cue_and_ffmetadata(tmp_path):
+    paths = write_chapter_files(make_index(), str(tmp_path / "libro.wav"), cue=True, ffmetadata=True)
+
+    assert paths[1:] == [str(tmp_path / "libro.cue"), str(tmp_path / "libro.ffmetadata.txt")]
+    cue = (tmp_path / "libro.cue").read_text(encoding="utf-8").splitlines()
+    assert cue[0] == 'FILE "libro.wav" WAVE'
+    assert cue[3] == "    INDEX 01 00:00:00"
+    assert cue[5] == "    TITLE \"Capítulo 'dos'; a=b\""
+    assert cue[6] == "    INDEX 01 01:01:07"  # 61,1 s = 1 min 1 s y 7,5 frames de 1/75 s
+
+    ffmetadata = (tmp_path / "libro.ffmetadata.txt").read_text(encoding="utf-8").splitlines()
+    assert ffmetadata[0] == ";FFMETADATA1"
+    assert ffmetadata[-4:] == [
+        "TIMEBASE=1/24000",
+        f"START={24000 * 61 + 2400}",
+        f"END={24000 * 61 + 2400 + 12000}",
+        r'title=Capítulo "dos"\; a\=b',
+    ]
+    assert json.loads((tmp_path / "libro.chapters.json").read_text(encoding="utf-8"))["data_offset"] == 44
+
+
+def test_join_writes_one_chapter_per_input(tmp_path, monkeypatch):
+    from join_wav import join_wav_files
+    from wav_io import build_wav_header
+
+    monkeypatch.chdir(tmp_path)
+    inputs = []
+    for name, size in [("intro", 4800), ("final", 9600)]:
+        path = tmp_path / f"{name}.wav"
+        path.write_bytes(build_wav_header(size, 24000, 16) + bytes(size))
+        inputs.append(str(path))
+
+    join_wav_files(inputs, str(tmp_path / "out.wav"))
+
+    chapters = json.loads((tmp_path / "out.chapters.json").read_text(encoding="utf-8"))["chapters"]
+    assert [(c["id"], c["start_seconds"], c["duration_seconds"]) for c in chapters] == [("intro", 0.0, 0.1), ("final", 0.1, 0.2)]
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from doc_convert import ConversionError, ConvertReader, FakeTextModel, ModelTextStream, is_text_document
+from json_input import iter_json_array
+
+DOCUMENT = """# Introducción
+Primer párrafo,
+en dos líneas.
+
+Segundo párrafo.
+
+# Capítulo "uno"
+
+Tercer párrafo.
+"""
+
+
+class ScriptedModel:
+    """Modelo que emite los chunks dados y, opcionalmente, falla al final."""
+
+    name = "guion"
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.emitted = 0
+
+    def stream_text(self, prompt, document_path):
+        for chunk in self.chunks:
+            self.emitted += 1
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text(DOCUMENT, encoding="utf-8")
+    return str(path)
+
+
+def test_fake_model_sections():
+    assert FakeTextModel.sections(DOCUMENT) == [
+        {"id": "1", "title": "Introducción", "content": "Primer párrafo, en dos líneas."},
+        {"id": "2", "title": "Introducción", "content": "Segundo párrafo."},
+        {"id": "3", "title": 'Capítulo "uno"', "content": "Tercer párrafo."},
+    ]
+    assert FakeTextModel.sections("Sin título") == [{"id": "1", "title": "Sección 1", "content": "Sin título"}]
+
+
+def test_text_before_the_array_is_discarded():
+    chunks = iter(["Aquí tienes el JSON:\n```js", "on\n[1,", " 2]\n```"])
+    assert list(iter_json_array(ModelTextStream(chunks, "modelo"))) == [1, 2]
+
+
+def test_convert_reader_yields_sections_and_saves_them(document, tmp_path):
+    output = tmp_path / "secciones.json"
+    reader = ConvertReader(FakeTextModel(chunk_chars=5), document, "prompt", target_ids={"1", "3"}, json_output=str(output))
+
+    assert [(item.item_id, item.title) for item in reader] == [("1", "Introducción"), ("3", 'Capítulo "uno"')]
+    assert reader.total_read == 3
+    # Se guardan todas las secciones recibidas, no solo las seleccionadas
+    assert json.loads(output.read_text(encoding="utf-8")) == FakeTextModel.sections(DOCUMENT)
+
+
+def test_sections_are_yielded_while_the_model_is_still_writing(document):
+    sections = json.dumps(FakeTextModel.sections(DOCUMENT))
+    model = ScriptedModel([sections[n:n + 8] for n in range(0, len(sections), 8)])
+
+    first = next(iter(ConvertReader(model, document, "prompt")))
+
+    assert first.item_id == "1"
+    assert model.emitted < len(model.chunks) / 2
+
+
+def test_model_failure_keeps_the_received_sections(document, tmp_path):
+    output = tmp_path / "secciones.json"
+    section = json.dumps({"id": "1", "title": "a", "content": "b"})
+    model = ScriptedModel(["[", section, ", {\"id\": "], error=RuntimeError("conexión cortada"))
+    reader = iter(ConvertReader(model, document, "prompt", json_output=str(output)))
+
+    assert next(reader).item_id == "1"
+    with pytest.raises(ConversionError, match="guion"):
+        next(reader)
+    assert json.loads(output.read_text(encoding="utf-8")) == [json.loads(section)]
+
+
+def test_is_text_document():
+    assert is_text_document("notas.md")
+    assert is_text_document("apuntes.TXT")
+    assert not is_text_document("libro.pdf")
+
+
+def test_convert_and_synthesize_end_to_end(document, tmp_path, monkeypatch):
+    from main import main
+
+    monkeypatch.chdir(tmp_path)
+    main([document, "libro", "--convert", "--backend", "fake", "--fake_bytes_per_char", "10", "--no_cache", "--no_job_db", "--stats_json", "stats.json"])
+
+    stats = json.loads((tmp_path / "stats.json").read_text(encoding="utf-8"))
+    assert (stats["items"], stats["successful"]) == (3, 3)
+    assert json.loads((tmp_path / "libro_convertido.json").read_text(encoding="utf-8")) == FakeTextModel.sections(DOCUMENT)
+    assert sorted(p.name for p in (tmp_path / "libro_audios").glob("*.wav")) == ["1_Introducción.wav", "2_Introducción.wav", "3_Capítulo _uno_.wav"]
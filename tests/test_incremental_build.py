@@ -0,0 +1,94 @@
+import pytest
+
+from incremental_build import IncrementalAssembler, RebuildManifest, content_hash, manifest_path
+from wav_io import OrderedWavAssembler, WavSegment, build_wav_header, read_wav_info
+
+MIME_TYPE = "audio/L16;codec=pcm;rate=24000"
+CONFIG = {"voice": "Zephyr"}
+
+
+def segment(tmp_path, name: str, pcm: bytes) -> WavSegment:
+    path = tmp_path / f"{name}.wav"
+    header = build_wav_header(len(pcm), 24000, 16)
+    path.write_bytes(header + pcm)
+    return WavSegment(str(path), len(header), len(pcm), MIME_TYPE)
+
+
+def save_manifest(assembler, combined: WavSegment, items):
+    # Igual que main.py al terminar una ejecución con --incremental
+    RebuildManifest(CONFIG, assembler.mime_type, combined.data_offset, [
+        {"id": items[index][0], "title": items[index][0], "hash": content_hash(items[index][1]), "position": position, "size": size}
+        for index, position, size in assembler.segment_positions
+    ]).save(manifest_path(combined.path))
+
+
+def read_pcm(path) -> bytes:
+    info = read_wav_info(str(path))
+    with open(path, "rb") as f:
+        f.seek(info.data_offset)
+        return f.read(info.data_size)
+
+
+@pytest.fixture
+def first_build(tmp_path):
+    """Combinado inicial de tres secciones y su manifiesto."""
+    items = [("1", "uno", b"\x01" * 100), ("2", "dos", b"\x02" * 200), ("3", "tres", b"\x03" * 300)]
+    output = str(tmp_path / "libro.wav")
+    assembler = OrderedWavAssembler(output, len(items))
+    for index, (item_id, _text, pcm) in enumerate(items):
+        assembler.add(index, segment(tmp_path, f"old{item_id}", pcm))
+    save_manifest(assembler, assembler.close(), items)
+    return output
+
+
+def rebuild(tmp_path, output, items, synthesized: dict[int, bytes]):
+    manifest = RebuildManifest.load(manifest_path(output), output, CONFIG)
+    ids = [item_id for item_id, _text in items]
+    reused = manifest.reusable_segments(output, ids, [text for _id, text in items])
+    assert sorted([*reused, *synthesized]) == list(range(len(items)))
+    assembler = IncrementalAssembler(output, ids, manifest, reused)
+    for index, pcm in synthesized.items():
+        assembler.add(index, segment(tmp_path, f"new{index}", pcm))
+    assert assembler.complete
+    return assembler, assembler.close()
+
+
+def test_same_size_change_is_patched_in_place(tmp_path, first_build):
+    items = [("1", "uno"), ("2", "DOS"), ("3", "tres")]
+
+    assembler, combined = rebuild(tmp_path, first_build, items, {1: b"\x22" * 200})
+
+    assert assembler.patched_in_place
+    assert assembler.bytes_copied == 200
+    assert combined.data_size == 600
+    assert read_pcm(first_build) == b"\x01" * 100 + b"\x22" * 200 + b"\x03" * 300
+    assert assembler.segment_positions == [(0, 0, 100), (1, 100, 200), (2, 300, 300)]
+
+
+def test_size_change_rewrites_reusing_unchanged_ranges(tmp_path, first_build):
+    items = [("1", "uno"), ("2", "dos más largo"), ("3", "tres")]
+
+    assembler, combined = rebuild(tmp_path, first_build, items, {1: b"\x22" * 50})
+
+    assert not assembler.patched_in_place
+    assert read_pcm(first_build) == b"\x01" * 100 + b"\x22" * 50 + b"\x03" * 300
+    assert combined.data_size == 450
+    assert not (tmp_path / "libro.wav.incremental.tmp").exists()
+
+
+def test_new_id_forces_a_rewrite(tmp_path, first_build):
+    items = [("1", "uno"), ("1b", "nuevo"), ("2", "dos"), ("3", "tres")]
+
+    assembler, _combined = rebuild(tmp_path, first_build, items, {1: b"\x11" * 10})
+
+    assert not assembler.patched_in_place
+    assert read_pcm(first_build) == b"\x01" * 100 + b"\x11" * 10 + b"\x02" * 200 + b"\x03" * 300
+
+
+def test_manifest_is_ignored_when_it_no_longer_describes_the_output(tmp_path, first_build):
+    assert RebuildManifest.load(manifest_path(first_build), first_build, {"voice": "Puck"}) is None
+
+    with open(first_build, "r+b") as f:
+        f.truncate(44 + 300)
+    assert RebuildManifest.load(manifest_path(first_build), first_build, CONFIG) is None
+    assert RebuildManifest.load(str(tmp_path / "no_existe.json"), first_build, CONFIG) is None
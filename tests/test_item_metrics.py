@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from item_metrics import ItemMetrics, MetricsRecorder, percentile
+
+
+def finished(item_id, stream_seconds, pcm_bytes=48000, cache_hit=False, success=True, retry_reasons=()):
+    metrics = ItemMetrics(item_id, f"T{item_id}", item_index=int(item_id))
+    metrics.start_attempt()
+    metrics.stream_seconds = stream_seconds
+    metrics.first_chunk_seconds = stream_seconds / 10
+    metrics.pcm_bytes = pcm_bytes
+    metrics.chunk_count = 2
+    metrics.cache_hit = cache_hit
+    metrics.retry_reasons.extend(retry_reasons)
+    metrics.finish(success, "audio/L16;codec=pcm;rate=24000" if success else None)
+    return metrics
+
+
+def test_percentile_interpolates():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([4.0], 0.99) == 4.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    assert percentile(list(map(float, range(101))), 0.95) == pytest.approx(95.0)
+
+
+def test_finish_computes_audio_seconds_and_realtime_factor():
+    metrics = finished("1", stream_seconds=0.5, pcm_bytes=96000)
+
+    assert metrics.audio_seconds == 2.0
+    assert metrics.realtime_factor == 4.0
+    assert metrics.as_dict()["retries"] == 0
+
+
+def test_recorder_writes_jsonl_and_excludes_cache_hits_from_stream_percentiles(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(str(path))
+    recorder.record(finished("1", 1.0, retry_reasons=["transient"]))
+    recorder.record(finished("2", 3.0, retry_reasons=["rate_limited", "transient"]))
+    recorder.record(finished("3", 0.0, cache_hit=True))
+    recorder.record(finished("4", 2.0, success=False))
+    recorder.close()
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [record["item_id"] for record in records] == ["1", "2", "3", "4"]
+    assert records[1]["retries"] == 2
+
+    summary = recorder.summary()
+    assert summary["totals"]["items"] == 4
+    assert (summary["totals"]["successful"], summary["totals"]["failed"], summary["totals"]["cache_hits"]) == (3, 1, 1)
+    assert summary["retry_reasons"] == {"transient": 2, "rate_limited": 1}
+    assert summary["quantiles"]["stream_seconds"]["count"] == 3  # sin el acierto de caché
+    assert summary["quantiles"]["stream_seconds"]["p50"] == 2.0
+    assert "Reintentos por motivo: rate_limited: 1, transient: 2" in recorder.summary_lines()
+
+
+def test_prometheus_snapshot(tmp_path):
+    recorder = MetricsRecorder()
+    recorder.record(finished("1", 1.0, retry_reasons=["transient"]))
+    path = tmp_path / "tts.prom"
+
+    recorder.write_prometheus(str(path))
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert 'tts_items_total{result="success"} 1' in lines
+    assert 'tts_retries_total{reason="transient"} 1' in lines
+    assert 'tts_item_stream_seconds{quantile="0.5"} 1.000000' in lines
+    assert "tts_item_stream_seconds_count 1" in lines
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["tts.prom"]
@@ -0,0 +1,121 @@
+import os
+import time
+
+from job_leases import LeaseJobSet
+from wav_io import WAV_HEADER_SIZE, WavSegment, build_wav_header
+
+IDS = ["1", "2", "3"]
+HASHES = ["h1", "h2", "h3"]
+
+
+def worker(tmp_path, name, lease_seconds=60.0, hashes=HASHES, **kwargs):
+    return LeaseJobSet(str(tmp_path / "jobs"), IDS, hashes, worker_id=name, lease_seconds=lease_seconds, **kwargs)
+
+
+def audio(tmp_path, name, data_size=100) -> WavSegment:
+    folder = tmp_path / "jobs" / "audios"
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"{name}.wav"
+    path.write_bytes(build_wav_header(data_size, 24000, 16) + bytes(data_size))
+    return WavSegment(str(path), WAV_HEADER_SIZE, data_size, None)
+
+
+def lease_path(tmp_path, index):
+    return tmp_path / "jobs" / "leases" / f"{index:06d}.lease"
+
+
+def age_lease(tmp_path, index, seconds):
+    old = time.time() - seconds
+    os.utime(lease_path(tmp_path, index), (old, old))
+
+
+def test_workers_claim_different_items_and_skip_finished_ones(tmp_path):
+    a, b = worker(tmp_path, "a"), worker(tmp_path, "b")
+    try:
+        assert a.claim_next() == 0
+        assert b.claim_next() == 1
+        a.complete(0, audio(tmp_path, "1"))
+        assert not lease_path(tmp_path, 0).exists()
+
+        assert a.claim_next() == 2
+        assert b.claim_next() is None
+        assert b.unfinished() == [1, 2]
+    finally:
+        a.close()
+        b.close()
+    # close() libera los leases que quedaban
+    assert not os.listdir(tmp_path / "jobs" / "leases")
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    crashed, survivor = worker(tmp_path, "caido"), worker(tmp_path, "b")
+    try:
+        assert crashed.claim_next() == 0
+        assert survivor.claim_next(exclude={1, 2}) is None  # lease vigente
+
+        age_lease(tmp_path, 0, 120)
+        assert survivor.claim_next(exclude={1, 2}) == 0
+        assert survivor.leases_taken_over == 1
+        assert '"worker": "b"' in lease_path(tmp_path, 0).read_text(encoding="utf-8")
+        assert not [name for name in os.listdir(tmp_path / "jobs" / "leases") if name.endswith(".expired")]
+    finally:
+        survivor.close()
+
+
+def test_heartbeat_renews_held_leases(tmp_path):
+    a, b = worker(tmp_path, "a", lease_seconds=0.3), worker(tmp_path, "b", lease_seconds=0.3)
+    try:
+        assert a.claim_next() == 0
+        age_lease(tmp_path, 0, 10)
+        time.sleep(0.25)  # el heartbeat corre cada lease_seconds / 3
+
+        assert time.time() - os.stat(lease_path(tmp_path, 0)).st_mtime < 0.3
+        assert b.claim_next(exclude={1, 2}) is None
+    finally:
+        a.close()
+        b.close()
+
+
+def test_heartbeat_notices_a_lost_lease(tmp_path):
+    a = worker(tmp_path, "a", lease_seconds=0.3)
+    try:
+        assert a.claim_next() == 0
+        lease_path(tmp_path, 0).write_text('{"worker": "b"}', encoding="utf-8")
+        time.sleep(0.25)
+
+        assert a.leases_lost == 1
+        a.release(0)
+        assert lease_path(tmp_path, 0).exists()  # no borra el lease de otro worker
+    finally:
+        a.close()
+
+
+def test_done_entries_for_changed_texts_do_not_count(tmp_path):
+    a = worker(tmp_path, "a")
+    a.claim_next()
+    a.complete(0, audio(tmp_path, "1"))
+    a.close()
+
+    changed = worker(tmp_path, "b", hashes=["otro", "h2", "h3"])
+    try:
+        assert changed.done_entry(0) is None
+        assert changed.claim_next() == 0
+    finally:
+        changed.close()
+
+
+def test_completed_segments_are_verified_relative_to_the_job_dir(tmp_path):
+    a = worker(tmp_path, "a")
+    for name in ("1", "2"):
+        index = a.claim_next()
+        a.complete(index, audio(tmp_path, name))
+    a.close()
+    # El archivo del segundo ID quedó truncado
+    with open(tmp_path / "jobs" / "audios" / "2.wav", "r+b") as f:
+        f.truncate(WAV_HEADER_SIZE + 10)
+
+    segments = worker(tmp_path, "merge").completed_segments()
+
+    assert list(segments) == [0]
+    assert segments[0].path == str(tmp_path / "jobs" / "audios" / "1.wav")
+    assert segments[0].data_size == 100
@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from item_metrics import ItemMetrics
+from job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), log_path=str(tmp_path / "logs.txt"))
+    store.start_run("prueba", "in.json", "out.wav", {"engine": "thread"})
+    yield store
+    store.close()
+
+
+def synthesis(item_id, item_index, attempts=1, pcm_bytes=48000):
+    metrics = ItemMetrics(item_id, "título", item_index=item_index)
+    for _ in range(attempts):
+        metrics.start_attempt()
+    metrics.pcm_bytes = pcm_bytes
+    metrics.finish(True, "audio/L16;codec=pcm;rate=24000")
+    return metrics
+
+
+def test_item_lifecycle_and_run_summary(store):
+    # El mismo ID dos veces en el JSON, con textos distintos
+    store.add_items([(0, "1", "Intro", "h0"), (1, "2", "Repetido", "h1"), (2, "2", "Repetido", "h2")])
+    store.record_synthesis(synthesis("2", 2, attempts=3))
+    store.finish_item(0, "success", "out/1_Intro.wav")
+    store.finish_item(1, "failed", error="sin audio")
+    store.finish_item(2, "success", "out/2_Repetido.wav")
+    store.finish_run()
+
+    rows = store.items()
+    assert [(row["item_index"], row["status"]) for row in rows] == [(0, "success"), (1, "failed"), (2, "success")]
+    assert (rows[1]["attempts"], rows[2]["attempts"]) == (0, 3)
+    assert rows[2]["audio_seconds"] == pytest.approx(1.0)
+    assert store.ids_by_status()["success"] == ["1", "2"]
+
+    connection = sqlite3.connect(store.path)
+    summary = connection.execute("SELECT status, items, successful, failed, attempts FROM run_summary WHERE run_id = ?", (store.run_id,)).fetchone()
+    connection.close()
+    assert summary == ("completed", 3, 2, 1, 3)
+
+
+def test_record_synthesis_marks_pending_items_as_running(store):
+    store.add_items([(0, "1", "Intro", "h0")])
+    store.record_synthesis(synthesis("1", 0))
+    store.record_synthesis(synthesis("1", 0))  # un segundo fragmento del mismo ID
+
+    row = store.items()[0]
+    assert (row["status"], row["syntheses"], row["attempts"]) == ("running", 2, 2)
+
+
+def test_log_goes_to_events_and_the_log_file(store, tmp_path):
+    store.log("Error de prueba")
+    store.flush()
+
+    connection = sqlite3.connect(store.path)
+    messages = [row[0] for row in connection.execute("SELECT message FROM events WHERE run_id = ?", (store.run_id,))]
+    connection.close()
+    assert messages == ["Error de prueba"]
+    assert (tmp_path / "logs.txt").read_text(encoding="utf-8").endswith("] Error de prueba\n")
+
+
+def test_a_bad_write_does_not_stop_the_writer(store):
+    store.add_items([(0, "1", "Intro", "h0")])
+    store.finish_item(2 ** 70, "success")  # OverflowError al enlazar el parámetro
+    store.finish_item(0, "success")
+
+    assert store.items()[0]["status"] == "success"
+    assert store.write_errors == 1
+    assert isinstance(store.last_write_error, OverflowError)
+
+
+def test_flush_and_close_after_close_return_immediately(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.start_run("prueba", "in.json", "out.wav", {})
+    store.close()
+
+    store.flush()
+    store.close()
+    with pytest.raises(RuntimeError, match="ya no acepta escrituras"):
+        store.start_run("otra", "in.json", "out.wav", {})
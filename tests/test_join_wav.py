@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import join_wav
+from join_wav import join_wav_files
+from wav_io import build_wav_header, read_wav_info
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # join_wav comprueba los permisos y escribe logs.txt en el directorio actual
+    monkeypatch.chdir(tmp_path)
+
+
+def write_wav(path, pcm: bytes, sample_rate=24000, bits=16, channels=1, audio_format=1) -> str:
+    with open(path, "wb") as f:
+        f.write(build_wav_header(len(pcm), sample_rate, bits, channels, audio_format) + pcm)
+    return str(path)
+
+
+def read_pcm(path) -> bytes:
+    info = read_wav_info(str(path))
+    with open(path, "rb") as f:
+        f.seek(info.data_offset)
+        return f.read(info.data_size)
+
+
+def test_join_copies_pcm_in_order(tmp_path):
+    inputs = [write_wav(tmp_path / f"{n}.wav", bytes([n]) * (100 * n)) for n in (1, 2, 3)]
+
+    output = join_wav_files(inputs, str(tmp_path / "out.wav"))
+
+    info = read_wav_info(output)
+    assert (info.sample_rate, info.bits_per_sample, info.num_channels) == (24000, 16, 1)
+    assert read_pcm(output) == b"\x01" * 100 + b"\x02" * 200 + b"\x03" * 300
+    assert os.path.getsize(output) == info.data_offset + 600
+
+
+def test_unreadable_inputs_are_skipped(tmp_path):
+    broken = tmp_path / "roto.wav"
+    broken.write_bytes(b"no es un wav")
+    inputs = [write_wav(tmp_path / "a.wav", b"\x01" * 10), str(broken), write_wav(tmp_path / "b.wav", b"\x02" * 10)]
+
+    output = join_wav_files(inputs, str(tmp_path / "out.wav"))
+
+    assert read_pcm(output) == b"\x01" * 10 + b"\x02" * 10
+
+
+def test_no_valid_inputs_is_an_error(tmp_path):
+    broken = tmp_path / "roto.wav"
+    broken.write_bytes(b"no es un wav")
+    with pytest.raises(ValueError):
+        join_wav_files([str(broken)], str(tmp_path / "out.wav"))
+    with pytest.raises(ValueError):
+        join_wav_files([], str(tmp_path / "out.wav"))
+
+
+def test_write_failure_removes_the_partial_output(tmp_path, monkeypatch):
+    inputs = [write_wav(tmp_path / f"{n}.wav", b"\x01" * 100) for n in range(2)]
+
+    def failing_copy(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(join_wav, "copy_file_data", failing_copy)
+    with pytest.raises(OSError):
+        join_wav_files(inputs, str(tmp_path / "out.wav"))
+    assert not (tmp_path / "out.wav").exists()
+
+
+def test_in_memory_helpers_keep_working(tmp_path):
+    pcm = bytes(range(200))
+    path = write_wav(tmp_path / "a.wav", pcm, sample_rate=16000, channels=2)
+    wav_data = (tmp_path / "a.wav").read_bytes()
+
+    params = join_wav.parse_wav_header(wav_data)
+    assert (params["sample_rate"], params["num_channels"], params["block_align"]) == (16000, 2, 4)
+    assert join_wav.extract_audio_data(wav_data) == pcm
+    assert join_wav.load_wav_file(path) == (pcm, params)
+    assert join_wav.create_wav_header(len(pcm), params) == wav_data[:len(wav_data) - len(pcm)]
+    with pytest.raises(Exception, match="Error al cargar"):
+        join_wav.load_wav_file(str(tmp_path / "no_existe.wav"))
@@ -0,0 +1,95 @@
+import io
+import json
+
+import pytest
+
+from json_input import InputFormatError, InputReader, is_jsonl, iter_json_array, iter_raw_items
+
+
+class TrickleFile(io.StringIO):
+    """Archivo que entrega como mucho `step` caracteres por read(), como una tubería lenta."""
+
+    def __init__(self, text: str, step: int):
+        super().__init__(text)
+        self.step = step
+
+    def read(self, size=-1):
+        return super().read(self.step if size is None or size < 0 else min(size, self.step))
+
+
+DOCUMENT = (
+    '[ {"id": "1", "title": "Intro", "content": "Comillas \\" y \\u00e9, [corchetes] y {llaves}"},\n'
+    ' 12.5e3, -0, 7, true, false, null, "texto", [1, [2, {"a": []}]], {},\n'
+    ' {"id": "2", "title": "Final", "content": "' + "x" * 50 + '"}, 123456 ]'
+)
+
+
+@pytest.mark.parametrize("step", [1, 2, 3, 5, 7, 64])
+def test_array_is_decoded_across_block_boundaries(step):
+    assert list(iter_json_array(TrickleFile(DOCUMENT, step))) == json.loads(DOCUMENT)
+
+
+def test_first_item_is_available_before_the_file_is_read():
+    items = [{"id": str(n), "title": "t", "content": "c" * 20} for n in range(100)]
+    file = TrickleFile(json.dumps(items), 16)
+
+    first = next(iter_json_array(file))
+
+    assert first == items[0]
+    assert file.tell() < 100
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ \n ]  ", ""])
+def test_empty_arrays(text):
+    if text:
+        assert list(iter_json_array(TrickleFile(text, 1))) == []
+    else:
+        with pytest.raises(InputFormatError):
+            list(iter_json_array(TrickleFile(text, 1)))
+
+
+@pytest.mark.parametrize("text, error", [
+    ('{"id": "1"}', InputFormatError),
+    ('[{"id": "1"} {"id": "2"}]', json.JSONDecodeError),
+    ('[{"id": "1"}, {"id": ', json.JSONDecodeError),
+    ('[1, 2', json.JSONDecodeError),
+    ('[1, 2,', json.JSONDecodeError),
+])
+def test_malformed_arrays(text, error):
+    with pytest.raises(error):
+        list(iter_json_array(TrickleFile(text, 3)))
+
+
+def test_jsonl_detection():
+    assert is_jsonl(io.StringIO('\n{"id": "1", "title": "a", "content": "b"}\n{"id": "2"}\n'))
+    assert not is_jsonl(io.StringIO('[{"id": "1"}]'))
+    # Un objeto en varias líneas no es JSONL: se lee como array y da el error de formato
+    pretty = io.StringIO('{\n  "id": "1"\n}\n')
+    assert not is_jsonl(pretty)
+    assert pretty.tell() == 0
+    with pytest.raises(InputFormatError, match="array"):
+        list(iter_raw_items(pretty))
+
+
+@pytest.mark.parametrize("jsonl", [False, True])
+def test_reader_filters_ids_while_reading(tmp_path, jsonl):
+    items = [{"id": str(n), "title": f"T{n}", "content": f"Texto {n}"} for n in range(5)]
+    path = tmp_path / "in.json"
+    path.write_text("\n".join(json.dumps(item) for item in items) if jsonl else json.dumps(items), encoding="utf-8")
+
+    reader = InputReader(str(path), target_ids={"1", "3", "9"})
+
+    assert [tuple(item) for item in reader] == [("1", "T1", "Texto 1"), ("3", "T3", "Texto 3")]
+    assert reader.found_ids == {"1", "3"}
+    assert reader.total_read == 5
+
+
+def test_reader_reports_the_invalid_element(tmp_path):
+    path = tmp_path / "in.json"
+    path.write_text('[{"id": "1", "title": "a", "content": "b"}, {"id": 2, "title": "a", "content": "b"}]', encoding="utf-8")
+
+    reader = iter(InputReader(str(path)))
+
+    assert next(reader).item_id == "1"
+    with pytest.raises(InputFormatError, match="elemento 2"):
+        next(reader)
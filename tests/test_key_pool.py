@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+from key_pool import KeyPoolBackend, load_api_keys, mask_key
+from tts_backends import FakeAPIError, FakeBackend
+
+
+class FailingBackend:
+    """Backend que falla siempre antes del primer chunk con el error dado."""
+
+    cache_identity = ("modelo", "voz", 1.0)
+
+    def __init__(self, error: Exception):
+        self.error = error
+        self.calls = 0
+
+    def stream(self, text):
+        self.calls += 1
+        raise self.error
+        yield
+
+    async def astream(self, text):
+        self.calls += 1
+        raise self.error
+        yield
+
+
+def quota_error():
+    # Sin "retry in Ns": el enfriamiento es el del pool
+    return FakeAPIError(429, "RESOURCE_EXHAUSTED", "Cuota agotada.")
+
+
+def stats_by_key(pool):
+    return {key["key"]: key for key in pool.stats()}
+
+
+def test_load_api_keys_from_file_and_environment(tmp_path):
+    path = tmp_path / "keys.txt"
+    path.write_text("# proyecto A\nkey-aaaa\n\nkey-bbbb  # proyecto B\n", encoding="utf-8")
+
+    assert load_api_keys(str(path), "key-cccc, key-aaaa key-dddd") == ["key-aaaa", "key-bbbb", "key-cccc", "key-dddd"]
+    assert load_api_keys(None, None) == []
+    assert mask_key("AIzaSyExample1234") == "...1234"
+    assert mask_key("abc") == "..."
+
+
+def test_calls_are_spread_across_keys():
+    pool = KeyPoolBackend([("a", FakeBackend(bytes_per_char=10)), ("b", FakeBackend(bytes_per_char=10))])
+
+    for n in range(4):
+        assert b"".join(data for data, _mime in pool.stream(f"texto {n}"))
+
+    assert [key["requests"] for key in pool.stats()] == [2, 2]
+    assert [key["successes"] for key in pool.stats()] == [2, 2]
+
+
+def test_rate_limited_key_falls_back_to_another_key_immediately():
+    failing = FailingBackend(quota_error())
+    pool = KeyPoolBackend([("a", failing), ("b", FakeBackend(bytes_per_char=10))], cooldown=60)
+
+    for n in range(3):
+        assert list(pool.stream(f"texto {n}"))
+
+    keys = stats_by_key(pool)
+    assert failing.calls == 1  # en enfriamiento no se vuelve a elegir
+    assert keys["a"]["rate_limited"] == 1 and keys["a"]["cooling_down"]
+    assert keys["b"]["successes"] == 3
+
+
+def test_rejected_key_is_retired():
+    pool = KeyPoolBackend([
+        ("a", FailingBackend(FakeAPIError(403, "PERMISSION_DENIED", "Key inválida."))),
+        ("b", FakeBackend(bytes_per_char=10)),
+    ])
+
+    assert list(pool.stream("texto"))
+    assert stats_by_key(pool)["a"]["disabled"]
+    assert pool.summary_lines()[1].endswith("retirada")
+
+
+def test_error_when_no_key_is_usable():
+    pool = KeyPoolBackend([("a", FailingBackend(FakeAPIError(401, "UNAUTHENTICATED", "Key inválida.")))])
+
+    with pytest.raises(FakeAPIError):
+        list(pool.stream("texto"))
+    with pytest.raises(RuntimeError, match="ninguna API key"):
+        list(pool.stream("texto"))
+
+
+def test_single_key_waits_out_its_cooldown_before_the_next_stream():
+    backend = FailingBackend(quota_error())
+    pool = KeyPoolBackend([("a", backend)], cooldown=0.2)
+    with pytest.raises(FakeAPIError):
+        list(pool.stream("texto"))
+
+    start = time.monotonic()
+    pool.wait_until_ready()
+    assert time.monotonic() - start >= 0.15
+    pool.discard_reservation()
+    assert stats_by_key(pool)["a"]["requests"] == 1
+
+
+def test_requests_per_minute_per_key_is_enforced_when_reserving():
+    pool = KeyPoolBackend([("a", FakeBackend()), ("b", FakeBackend())], requests_per_minute_per_key=60)
+    for _ in range(2):
+        pool.wait_until_ready()
+        pool.discard_reservation()  # se devuelve el cupo
+    pool.wait_until_ready()
+    list(pool.stream("uno"))
+    pool.wait_until_ready()
+    list(pool.stream("dos"))
+
+    start = time.monotonic()
+    pool.wait_until_ready()  # las dos keys gastaron su único token: ~1 s hasta el siguiente
+    assert time.monotonic() - start >= 0.5
+    pool.discard_reservation()
+
+
+def test_async_stream_falls_back_too():
+    pool = KeyPoolBackend([("a", FailingBackend(quota_error())), ("b", FakeBackend(bytes_per_char=10))])
+
+    async def scenario():
+        await pool.await_ready()
+        return [chunk async for chunk in pool.astream("texto")]
+
+    assert asyncio.run(scenario())
+    assert stats_by_key(pool)["b"]["successes"] == 1
+    assert all(key["requests"] == 1 for key in pool.stats())
@@ -0,0 +1,117 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pcm_convert import FLOAT_FORMAT, check_supported, convert_wav_data, converted_data_size, make_params
+from wav_io import build_wav_header, read_wav_info
+
+
+def write_wav(path, samples, sample_rate, bits=16, audio_format=1):
+    """Escribe `samples` (frames, canales) ya en el dtype del formato."""
+    samples = np.asarray(samples)
+    channels = samples.shape[1]
+    pcm = samples.tobytes()
+    with open(path, "wb") as f:
+        f.write(build_wav_header(len(pcm), sample_rate, bits, channels, audio_format) + pcm)
+    return read_wav_info(str(path))
+
+
+def convert(info, target, **kwargs) -> bytes:
+    out = io.BytesIO()
+    written = convert_wav_data(info, target, out, **kwargs)
+    assert written == len(out.getvalue()) == converted_data_size(info, target)
+    return out.getvalue()
+
+
+def tone(frequency, sample_rate, seconds=0.5, amplitude=0.5):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def test_bit_depth_conversion_is_exact_for_16_to_24_bits(tmp_path):
+    samples = np.array([[0, 1], [-1, 32767], [-32768, 1234]], dtype="<i2")
+    info = write_wav(tmp_path / "in.wav", samples, 24000)
+
+    data = convert(info, make_params(24000, 24, 2))
+
+    raw = np.frombuffer(data, dtype="u1").reshape(-1, 2, 3).astype(np.int32)
+    value = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+    value = np.where(value >= 1 << 23, value - (1 << 24), value)
+    assert (value == samples.astype(np.int32) << 8).all()
+
+
+def test_stereo_to_mono_8_bit_averages_channels(tmp_path):
+    samples = np.array([[16384, 16384], [16384, -16384], [-32768, -32768]], dtype="<i2")
+    info = write_wav(tmp_path / "in.wav", samples, 24000)
+
+    data = convert(info, make_params(24000, 8, 1))
+
+    assert list(data) == [192, 128, 0]
+
+
+def test_float_output(tmp_path):
+    samples = np.array([[16384], [-32768]], dtype="<i2")
+    info = write_wav(tmp_path / "in.wav", samples, 24000)
+
+    data = convert(info, make_params(24000, 32, 1, FLOAT_FORMAT))
+
+    assert np.frombuffer(data, dtype="<f4").tolist() == [0.5, -1.0]
+
+
+def test_resampling_does_not_depend_on_block_size(tmp_path):
+    samples = (tone(440, 48000) * 32767).astype("<i2")[:, None]
+    info = write_wav(tmp_path / "in.wav", samples, 48000)
+    target = make_params(16000, 16, 1)
+
+    assert convert(info, target, block_frames=7) == convert(info, target)
+    assert len(convert(info, target)) == len(samples) // 3 * 2
+
+
+def test_downsampling_keeps_passband_and_filters_aliases(tmp_path):
+    target = make_params(16000, 16, 1)
+
+    def converted_peak(frequency):
+        samples = (tone(frequency, 48000) * 32767).astype("<i2")[:, None]
+        info = write_wav(tmp_path / f"{frequency}.wav", samples, 48000)
+        out = np.frombuffer(convert(info, target), dtype="<i2") / 32768.0
+        return np.abs(out[200:-200]).max()
+
+    assert converted_peak(1000) == pytest.approx(0.5, rel=0.05)
+    # 12 kHz está por encima del Nyquist de 16 kHz: sin filtro aparecería como un alias de 4 kHz
+    assert converted_peak(12000) < 0.05
+
+
+def test_upsampling_interpolates(tmp_path):
+    samples = np.array([[0], [1000], [2000], [3000]], dtype="<i2")
+    info = write_wav(tmp_path / "in.wav", samples, 8000)
+
+    data = convert(info, make_params(16000, 16, 1))
+
+    assert np.frombuffer(data, dtype="<i2").tolist()[:7] == [0, 500, 1000, 1500, 2000, 2500, 3000]
+
+
+def test_unsupported_formats_are_rejected():
+    with pytest.raises(ValueError):
+        check_supported(make_params(24000, 12, 1))
+    with pytest.raises(ValueError):
+        check_supported(make_params(24000, 16, 1, FLOAT_FORMAT))
+
+
+def test_join_converts_mismatched_inputs(tmp_path, monkeypatch):
+    from join_wav import join_wav_files
+
+    monkeypatch.chdir(tmp_path)
+    first = write_wav(tmp_path / "a.wav", np.full((100, 1), 1000, dtype="<i2"), 24000)
+    second = write_wav(tmp_path / "b.wav", np.full((50, 2), -1000, dtype="<i2"), 12000)
+
+    output = join_wav_files([first.path, second.path], str(tmp_path / "out.wav"))
+
+    info = read_wav_info(output)
+    assert (info.sample_rate, info.num_channels) == (24000, 1)
+    with open(output, "rb") as f:
+        f.seek(info.data_offset)
+        pcm = np.frombuffer(f.read(info.data_size), dtype="<i2")
+    assert len(pcm) == 200
+    assert (pcm[:100] == 1000).all() and (pcm[100:] == -1000).all()
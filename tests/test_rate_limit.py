@@ -0,0 +1,167 @@
+import asyncio
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import AdaptiveRateLimiter, is_rate_limit_error
+
+
+class FakeClock:
+    """Sustituye al módulo time en rate_limit: el tiempo solo avanza a mano o al dormir."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+class ApiError(Exception):
+    def __init__(self, message, code=None, status=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (ApiError("quota", code=429), True),
+        (ApiError("quota", status="RESOURCE_EXHAUSTED"), True),
+        (ApiError("429 RESOURCE_EXHAUSTED. {'error': ...}"), True),
+        (ApiError("HTTP 429"), True),
+        (ApiError("Server returned status: 429"), True),
+        (ApiError("429 Too Many Requests"), True),
+        (ApiError("503 UNAVAILABLE", code=503), False),
+        (ApiError("No se encontró el ID 4291"), False),
+        (ApiError("se leyeron 429 bytes"), False),
+    ],
+)
+def test_is_rate_limit_error(error, expected):
+    assert is_rate_limit_error(error) is expected
+
+
+def test_token_bucket_allows_a_burst_then_spaces_requests(clock):
+    limiter = AdaptiveRateLimiter(max_concurrency=2, requests_per_minute=60)
+
+    for _ in range(2):
+        assert limiter.acquire() == 0.0
+        limiter.release()
+    waited = limiter.acquire()
+    limiter.release()
+
+    # 60 peticiones/minuto = 1 token por segundo; la ráfaga inicial es de 2
+    assert clock.sleeps == [pytest.approx(1.0)]
+    assert waited == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_with_time(clock):
+    limiter = AdaptiveRateLimiter(max_concurrency=2, requests_per_minute=60)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release()
+
+    clock.now += 2.0
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release()
+
+    assert clock.sleeps == []
+
+
+def test_rate_limited_halves_concurrency_once_per_cooldown(clock):
+    limiter = AdaptiveRateLimiter(max_concurrency=8, decrease_cooldown=5.0)
+
+    limiter.record_rate_limited()
+    limiter.record_rate_limited()  # misma ráfaga de 429: no vuelve a reducir
+    assert limiter.concurrency_limit == 4
+
+    clock.now += 6.0
+    limiter.record_rate_limited()
+    assert limiter.concurrency_limit == 2
+
+    for _ in range(3):
+        clock.now += 6.0
+        limiter.record_rate_limited()
+    assert limiter.concurrency_limit == 1  # nunca por debajo de min_concurrency
+
+
+def test_successes_increase_concurrency_one_round_at_a_time(clock):
+    limiter = AdaptiveRateLimiter(max_concurrency=4)
+    limiter.record_rate_limited()
+    assert limiter.concurrency_limit == 2
+
+    limiter.record_success()
+    assert limiter.concurrency_limit == 2
+    limiter.record_success()
+    assert limiter.concurrency_limit == 3
+    for _ in range(3):
+        limiter.record_success()
+    assert limiter.concurrency_limit == 4
+    for _ in range(10):
+        limiter.record_success()
+    assert limiter.concurrency_limit == 4
+
+
+def test_acquire_blocks_until_a_slot_is_released():
+    limiter = AdaptiveRateLimiter(max_concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def worker():
+        with limiter.request_slot():
+            acquired.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release()
+    assert acquired.wait(2)
+    thread.join()
+    assert limiter.stats()["active"] == 0
+
+
+def test_async_waiter_is_woken_by_release_from_another_thread():
+    limiter = AdaptiveRateLimiter(max_concurrency=1)
+    limiter.acquire()
+
+    async def scenario():
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        threading.Timer(0.05, limiter.release).start()
+        await asyncio.wait_for(waiter, 2)
+
+    asyncio.run(scenario())
+    assert limiter.stats()["active"] == 1
+
+
+def test_cancelled_async_waiter_passes_the_slot_on():
+    limiter = AdaptiveRateLimiter(max_concurrency=1)
+    limiter.acquire()
+
+    async def scenario():
+        first = asyncio.create_task(limiter.acquire_async())
+        second = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        limiter.release()
+        await asyncio.wait_for(second, 2)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+    assert limiter.stats()["active"] == 1
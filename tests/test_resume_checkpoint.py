@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from main import main
+from resume_checkpoint import ResumeCheckpoint, checkpoint_path, load_checkpoint, verify_wav_file
+from wav_io import WAV_HEADER_SIZE, WavSegment, build_wav_header
+
+
+def write_wav(path, data_size: int) -> str:
+    with open(path, "wb") as f:
+        f.write(build_wav_header(data_size, 24000, 16) + bytes(data_size) + (b"\x00" if data_size & 1 else b""))
+    return str(path)
+
+
+def test_verify_accepts_a_complete_wav(tmp_path):
+    path = write_wav(tmp_path / "a.wav", 1000)
+
+    segment = verify_wav_file(path, 1000)
+
+    assert (segment.path, segment.data_offset, segment.data_size) == (path, WAV_HEADER_SIZE, 1000)
+    assert verify_wav_file(write_wav(tmp_path / "impar.wav", 999), 999) is not None  # con byte de relleno
+
+
+@pytest.mark.parametrize("damage", ["truncate", "append", "expected_size", "missing", "garbage"])
+def test_verify_rejects_damaged_files(tmp_path, damage):
+    path = write_wav(tmp_path / "a.wav", 1000)
+    expected = 1000
+    if damage == "truncate":
+        with open(path, "r+b") as f:
+            f.truncate(WAV_HEADER_SIZE + 500)
+    elif damage == "append":
+        with open(path, "ab") as f:
+            f.write(bytes(10))
+    elif damage == "expected_size":
+        expected = 2000
+    elif damage == "missing":
+        os.remove(path)
+    else:
+        with open(path, "wb") as f:
+            f.write(b"no es un wav" * 10)
+
+    assert verify_wav_file(path, expected) is None
+
+
+def test_checkpoint_keeps_the_last_entry_per_id_and_skips_torn_lines(tmp_path):
+    path = checkpoint_path(str(tmp_path))
+    checkpoint = ResumeCheckpoint(path, append=False)
+    first = WavSegment(write_wav(tmp_path / "1.wav", 10), WAV_HEADER_SIZE, 10, None)
+    second = WavSegment(write_wav(tmp_path / "1b.wav", 20), WAV_HEADER_SIZE, 20, None)
+    checkpoint.add("1", "h1", first)
+    checkpoint.add("1", "h2", second)
+    checkpoint.add("2", "h3", WavSegment(str(tmp_path / "no_existe.wav"), WAV_HEADER_SIZE, 5, None))
+    checkpoint.close()
+    checkpoint.add("3", "h4", first)  # tras close() no se escribe nada
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "4", "hash": "h')  # el proceso murió a mitad de línea
+
+    entries = load_checkpoint(path)
+
+    assert list(entries) == ["1"]
+    assert entries["1"] == {"id": "1", "hash": "h2", "path": second.path, "data_size": 20}
+    assert load_checkpoint(str(tmp_path / "otro.jsonl")) == {}
+
+    ResumeCheckpoint(path, append=False).close()
+    assert load_checkpoint(path) == {}
+
+
+def test_resume_only_synthesizes_missing_or_changed_ids(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    items = [{"id": str(n), "title": f"T{n}", "content": f"Texto número {n}"} for n in range(1, 5)]
+
+    def run(*extra):
+        with open("in.json", "w", encoding="utf-8") as f:
+            json.dump(items, f)
+        main(["in.json", "libro", "--backend", "fake", "--fake_bytes_per_char", "10", "--no_cache", "--no_job_db",
+              "--stats_json", "stats.json", *extra])
+        with open("stats.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    assert run()["api_calls"] == 4
+    combined = (tmp_path / "libro_completo.wav").read_bytes()
+
+    os.remove(tmp_path / "libro_audios" / "2_T2.wav")
+    with open(tmp_path / "libro_audios" / "3_T3.wav", "r+b") as f:
+        f.truncate(WAV_HEADER_SIZE + 4)
+    stats = run("--resume")
+    assert stats["api_calls"] == 2
+    assert stats["successful"] == 4
+    assert (tmp_path / "libro_completo.wav").read_bytes() == combined
+
+    items[0]["content"] = "Texto nuevo"
+    assert run("--resume")["api_calls"] == 1
+    assert run()["api_calls"] == 4  # sin --resume se empieza de cero
@@ -0,0 +1,81 @@
+import random
+import time
+
+import pytest
+
+from retry_policy import FATAL, RATE_LIMITED, TRANSIENT, ItemDeadlineExceeded, RetryPolicy, server_retry_after
+from tts_backends import FakeAPIError
+
+
+class ApiError(Exception):
+    def __init__(self, message, code=None, status=None, details=None, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.details = details
+        if headers is not None:
+            self.response = type("Response", (), {"headers": headers})()
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (None, TRANSIENT),
+        (FakeAPIError(429, "RESOURCE_EXHAUSTED", "cuota"), RATE_LIMITED),
+        (FakeAPIError(503, "UNAVAILABLE", "transitorio"), TRANSIENT),
+        (ApiError("clave inválida", code=403), FATAL),
+        (ApiError("argumento inválido", status="INVALID_ARGUMENT"), FATAL),
+        (ConnectionResetError("conexión cerrada"), TRANSIENT),
+    ],
+)
+def test_classify(error, expected):
+    assert RetryPolicy().classify(error) == expected
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (ApiError("429", headers={"retry-after": "7"}), 7.0),
+        (ApiError("429", details={"error": {"details": [{"@type": "RetryInfo", "retryDelay": "12s"}]}}), 12.0),
+        (ApiError("Quota exceeded. Please retry in 3.5s."), 3.5),
+        (ApiError("429 RESOURCE_EXHAUSTED"), None),
+    ],
+)
+def test_server_retry_after(error, expected):
+    assert server_retry_after(error) == expected
+
+
+def test_backoff_is_exponential_with_equal_jitter_and_capped():
+    policy = RetryPolicy(max_retries=10, base_delay=2.0, max_delay=10.0, rng=random.Random(1))
+
+    for attempt, ceiling in enumerate([2.0, 4.0, 8.0, 10.0, 10.0]):
+        delay = policy.next_delay(attempt, TRANSIENT)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_no_retry_for_fatal_errors_or_the_last_attempt():
+    policy = RetryPolicy(max_retries=3)
+    assert policy.next_delay(0, FATAL) is None
+    assert policy.next_delay(2, TRANSIENT) is None
+
+
+def test_server_hint_overrides_backoff():
+    policy = RetryPolicy(rate_limited_base_delay=1.0, rng=random.Random(0))
+    error = FakeAPIError(429, "RESOURCE_EXHAUSTED", "Please retry in 30s.")
+    assert 30.0 <= policy.next_delay(0, RATE_LIMITED, error) <= 31.0
+
+
+def test_deadline_stops_retries_that_would_not_fit():
+    policy = RetryPolicy(base_delay=4.0, item_deadline=1.0)
+    deadline = policy.start()
+
+    assert policy.next_delay(0, TRANSIENT, None, deadline) is None
+    assert RetryPolicy().start() is None
+    assert 0.0 < RetryPolicy.remaining(deadline) <= 1.0
+
+
+def test_check_deadline():
+    RetryPolicy.check_deadline(None)
+    RetryPolicy.check_deadline(time.monotonic() + 60)
+    with pytest.raises(ItemDeadlineExceeded):
+        RetryPolicy.check_deadline(time.monotonic() - 1)
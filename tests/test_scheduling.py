@@ -0,0 +1,46 @@
+from scheduling import REQUEST_OVERHEAD_CHARS, estimate_cost, lookahead_order, schedule_order
+
+
+def test_estimate_cost_counts_one_overhead_per_call():
+    assert estimate_cost("x" * 1000) == 1000 + REQUEST_OVERHEAD_CHARS
+    assert estimate_cost("x" * 1000, chunk_chars=400) == 1000 + 3 * REQUEST_OVERHEAD_CHARS
+    assert estimate_cost("", chunk_chars=400) == REQUEST_OVERHEAD_CHARS
+
+
+def test_schedule_order_is_longest_first_and_stable():
+    costs = [10, 50, 0, 50, 30]
+
+    assert schedule_order(costs) == [1, 3, 4, 0, 2]
+    assert schedule_order(costs, "json_order") == [0, 1, 2, 3, 4]
+
+
+def test_lookahead_releases_the_first_entry_before_reading_more():
+    pulled = []
+
+    def entries():
+        for cost in [1, 5, 3, 9, 2, 7]:
+            pulled.append(cost)
+            yield cost
+
+    order = lookahead_order(entries(), lambda cost: cost, window=3)
+
+    assert next(order) == 1
+    assert pulled == [1]
+    assert list(order) == [5, 9, 7, 3, 2]
+    assert sorted(pulled) == [1, 2, 3, 5, 7, 9]
+
+
+def test_lookahead_window_bounds_the_reordering():
+    costs = [1, 2, 3, 4, 5, 6]
+
+    assert list(lookahead_order(costs, lambda cost: cost, window=1)) == costs
+    assert list(lookahead_order(costs, lambda cost: cost, window=100)) == [1, 3, 5, 6, 4, 2]  # la ventana crece de a una
+    assert list(lookahead_order([], lambda cost: cost)) == []
+
+
+def test_lookahead_keeps_arrival_order_on_ties():
+    entries = [("a", 1), ("b", 2), ("c", 2), ("d", 1)]
+
+    order = [name for name, _cost in lookahead_order(entries, lambda entry: entry[1], window=4)]
+
+    assert order == ["a", "b", "c", "d"]
@@ -0,0 +1,100 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from silence_trim import trim_info, trim_segment, voiced_range
+from wav_io import WAV_HEADER_SIZE, WavSegment, build_wav_header, read_wav_info
+
+RATE = 8000  # ventanas de 10 ms = 80 frames; se conservan 30 ms = 240 frames en cada borde
+
+
+def write_wav(path, pcm: bytes, bits=16) -> str:
+    with open(path, "wb") as f:
+        f.write(build_wav_header(len(pcm), RATE, bits) + pcm)
+    return str(path)
+
+
+def speech(seconds, amplitude=0.5):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return amplitude * np.sin(2 * np.pi * 440 * t)
+
+
+def pcm16(samples) -> bytes:
+    return (np.asarray(samples) * 32767).astype("<i2").tobytes()
+
+
+def pcm8(samples) -> bytes:
+    return np.round(np.asarray(samples) * 127 + 128).astype("u1").tobytes()
+
+
+def test_leading_and_trailing_silence_is_trimmed_keeping_a_margin(tmp_path):
+    samples = np.concatenate([np.zeros(4000), speech(0.5), np.zeros(4000)])
+    info = read_wav_info(write_wav(tmp_path / "a.wav", pcm16(samples)))
+
+    offset, size = voiced_range(info)
+
+    assert offset == WAV_HEADER_SIZE + (4000 - 240) * 2
+    assert size == (4000 + 2 * 240) * 2
+
+
+def test_8_bit_silence_is_0x80(tmp_path):
+    samples = np.concatenate([np.zeros(4000), speech(0.5), np.zeros(4000)])
+    info = read_wav_info(write_wav(tmp_path / "a.wav", pcm8(samples), bits=8))
+
+    assert trim_info(info).data_size == 4000 + 2 * 240
+
+
+def test_silent_segment_keeps_its_first_window(tmp_path):
+    for name, pcm, bits in [("16.wav", bytes(8000), 16), ("8.wav", b"\x80" * 8000, 8)]:
+        info = read_wav_info(write_wav(tmp_path / name, pcm, bits))
+        assert voiced_range(info) == (WAV_HEADER_SIZE, 80 * bits // 8)
+
+
+def test_noise_below_the_floor_counts_as_silence(tmp_path):
+    # ~-66 dBFS: por debajo de DEFAULT_FLOOR_DB aunque sea el nivel máximo del segmento
+    info = read_wav_info(write_wav(tmp_path / "a.wav", pcm16(speech(1.0, amplitude=0.0005))))
+    assert voiced_range(info)[1] == 160
+
+
+def test_trailing_partial_window_is_kept_with_final_speech(tmp_path):
+    samples = np.concatenate([np.zeros(800), speech(0.5), speech(0.004)])  # termina a mitad de ventana
+    info = read_wav_info(write_wav(tmp_path / "a.wav", pcm16(samples)))
+
+    offset, size = voiced_range(info)
+
+    assert offset + size == info.data_offset + info.data_size
+
+
+def test_trim_segment_uses_the_pipeline_mime_type(tmp_path):
+    samples = np.concatenate([np.zeros(4000), speech(0.5)])
+    path = write_wav(tmp_path / "a.wav", pcm16(samples))
+    segment = WavSegment(path, WAV_HEADER_SIZE, len(samples) * 2, f"audio/L16;codec=pcm;rate={RATE}")
+
+    trimmed = trim_segment(segment)
+
+    assert trimmed.data_offset == WAV_HEADER_SIZE + (4000 - 240) * 2
+    assert trimmed.data_offset + trimmed.data_size == WAV_HEADER_SIZE + len(samples) * 2
+    assert trim_segment(None) is None
+
+
+@pytest.mark.parametrize("bits, silence", [(16, b"\x00"), (8, b"\x80")])
+def test_join_trims_and_inserts_gaps(tmp_path, monkeypatch, bits, silence):
+    from join_wav import join_wav_files
+
+    monkeypatch.chdir(tmp_path)
+    to_pcm = pcm16 if bits == 16 else pcm8
+    voiced = to_pcm(speech(0.1))
+    inputs = [write_wav(tmp_path / f"{n}.wav", to_pcm(np.zeros(800)) + voiced + to_pcm(np.zeros(800)), bits) for n in range(2)]
+
+    output = join_wav_files(inputs, str(tmp_path / "out.wav"), trim_silence=True, gap_ms=100)
+
+    info = read_wav_info(output)
+    with open(output, "rb") as f:
+        f.seek(info.data_offset)
+        data = f.read(info.data_size)
+    sample_bytes = bits // 8
+    kept = len(voiced) + 2 * 240 * sample_bytes
+    gap = 800 * sample_bytes
+    assert len(data) == 2 * kept + gap
+    assert data[kept:kept + gap] == silence * gap
+    assert data[:kept].strip(silence) == data[kept + gap:].strip(silence)
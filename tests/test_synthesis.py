@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from audio_cache import AudioCache, make_cache_key
+from main import agenerate_audio_for_text, generate_audio_for_text, stitch_wav_parts
+from pipeline_stats import PipelineStats
+from retry_policy import RetryPolicy
+from tts_backends import FakeAPIError, FakeBackend
+from wav_io import read_wav_info
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # log_error escribe logs.txt en el directorio actual
+    monkeypatch.chdir(tmp_path)
+
+
+def no_wait_policy(max_retries=3, **kwargs):
+    return RetryPolicy(max_retries=max_retries, base_delay=0.0, rate_limited_base_delay=0.0, **kwargs)
+
+
+def read_pcm(segment):
+    with open(segment.path, "rb") as f:
+        f.seek(segment.data_offset)
+        return f.read(segment.data_size)
+
+
+def collect(backend, text):
+    chunks = list(backend.stream(text))
+    return b"".join(data for data, _mime in chunks), {mime for _data, mime in chunks}
+
+
+def test_fake_backend_is_deterministic_per_seed_and_text():
+    audio, mime_types = collect(FakeBackend(bytes_per_char=100, chunk_bytes=256, seed=3), "Hola mundo")
+
+    assert len(audio) == len("Hola mundo") * 100
+    assert mime_types == {"audio/L16;codec=pcm;rate=24000"}
+    assert collect(FakeBackend(bytes_per_char=100, chunk_bytes=256, seed=3), "Hola mundo")[0] == audio
+    assert collect(FakeBackend(bytes_per_char=100, chunk_bytes=256, seed=3), "Adiós mundo")[0] != audio
+
+
+def test_fake_backend_injects_errors_with_api_shape():
+    backend = FakeBackend(rate_limit_rate=1.0)
+    with pytest.raises(FakeAPIError) as excinfo:
+        list(backend.stream("texto"))
+    assert excinfo.value.code == 429
+    assert excinfo.value.status == "RESOURCE_EXHAUSTED"
+
+
+def test_generate_audio_writes_the_streamed_pcm_as_wav(tmp_path):
+    backend = FakeBackend(bytes_per_char=100, chunk_bytes=256)
+    stats = PipelineStats()
+
+    segment, mime_type, ok = generate_audio_for_text(
+        "Hola mundo", "Saludo", "1", backend, 0, str(tmp_path), retry_policy=no_wait_policy(), stats=stats
+    )
+
+    assert ok
+    assert mime_type == backend.mime_type
+    assert os.path.basename(segment.path) == "1_Saludo.wav"
+    info = read_wav_info(segment.path)
+    assert (info.sample_rate, info.num_channels, info.bits_per_sample) == (24000, 1, 16)
+    assert (info.data_offset, info.data_size) == (segment.data_offset, segment.data_size)
+    assert read_pcm(segment) == collect(FakeBackend(bytes_per_char=100, chunk_bytes=256), "Hola mundo")[0]
+    assert stats.as_dict()["api_calls"] == 1
+    assert stats.as_dict()["pcm_bytes_streamed"] == segment.data_size
+
+
+def test_async_engine_produces_the_same_audio(tmp_path):
+    sync_segment, _, _ = generate_audio_for_text(
+        "Hola mundo", "sync", "1", FakeBackend(bytes_per_char=100), 0, str(tmp_path), retry_policy=no_wait_policy()
+    )
+    async_segment, mime_type, ok = asyncio.run(
+        agenerate_audio_for_text(
+            "Hola mundo", "async", "2", FakeBackend(bytes_per_char=100), 1, str(tmp_path), retry_policy=no_wait_policy()
+        )
+    )
+
+    assert ok
+    assert mime_type == "audio/L16;codec=pcm;rate=24000"
+    assert read_pcm(async_segment) == read_pcm(sync_segment)
+
+
+@pytest.mark.parametrize("engine", ["sync", "async"])
+def test_failed_attempts_are_retried_and_leave_no_partial_file(tmp_path, engine):
+    backend = FakeBackend(error_rate=1.0)
+    stats = PipelineStats()
+    args = ("texto", "Fallo", "1", backend, 0, str(tmp_path))
+    kwargs = {"retry_policy": no_wait_policy(max_retries=3), "stats": stats}
+
+    if engine == "sync":
+        result = generate_audio_for_text(*args, **kwargs)
+    else:
+        result = asyncio.run(agenerate_audio_for_text(*args, **kwargs))
+
+    assert result == (None, None, False)
+    assert stats.as_dict()["api_calls"] == 3
+    assert stats.as_dict()["retries"] == 2
+    assert not any(name.endswith(".wav") or ".part" in name for name in os.listdir(tmp_path))
+
+
+def test_cached_audio_is_restored_without_calling_the_backend(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    key = make_cache_key("Hola mundo", *FakeBackend().cache_identity, FakeBackend().mime_type)
+    first, _, _ = generate_audio_for_text(
+        "Hola mundo", "a", "1", FakeBackend(bytes_per_char=100), 0, str(tmp_path),
+        retry_policy=no_wait_policy(), cache=cache, cache_key=key,
+    )
+    assert cache.stats() == {"entries": 1, "total_bytes": first.data_size}
+
+    stats = PipelineStats()
+    # Un backend que siempre falla: si se llamara, la síntesis no terminaría bien
+    second, _, ok = generate_audio_for_text(
+        "Hola mundo", "b", "2", FakeBackend(error_rate=1.0), 1, str(tmp_path),
+        retry_policy=no_wait_policy(), cache=cache, cache_key=key, stats=stats,
+    )
+
+    assert ok
+    assert stats.as_dict()["api_calls"] == 0
+    assert stats.as_dict()["cache_hits"] == 1
+    assert read_pcm(second) == read_pcm(first)
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    source = tmp_path / "source.pcm"
+    source.write_bytes(b"x" * 300)
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=250)
+
+    cache.put_from_file("aa01", str(source), 0, 100, "audio/L16;rate=24000")
+    cache.put_from_file("bb02", str(source), 100, 100, "audio/L16;rate=24000")
+    cached_file, _size, _mime = cache.open_entry("aa01")  # aa01 pasa a ser la más reciente
+    cached_file.close()
+    cache.put_from_file("cc03", str(source), 200, 100, "audio/L16;rate=24000")
+
+    assert cache.open_entry("bb02") is None
+    assert cache.stats() == {"entries": 2, "total_bytes": 200}
+    # El índice se reconstruye desde el disco en la siguiente ejecución
+    assert AudioCache(str(tmp_path / "cache"), max_bytes=250).stats()["entries"] == 2
+
+
+@pytest.mark.parametrize("engine", ["sync", "async"])
+def test_item_deadline_cuts_a_slow_stream(tmp_path, engine):
+    # 10 caracteres * 3000 bytes a 24 kHz/16 bits ~ 0,6 s de audio generado en tiempo real
+    backend = FakeBackend(realtime_factor=1.0, chunk_bytes=2048)
+    args = ("x" * 10, "Lento", "1", backend, 0, str(tmp_path))
+    kwargs = {"retry_policy": no_wait_policy(max_retries=3, item_deadline=0.2)}
+
+    start = time.monotonic()
+    if engine == "sync":
+        result = generate_audio_for_text(*args, **kwargs)
+    else:
+        result = asyncio.run(agenerate_audio_for_text(*args, **kwargs))
+
+    assert result == (None, None, False)
+    assert time.monotonic() - start < 0.5
+    assert not any(name.endswith(".wav") or ".part" in name for name in os.listdir(tmp_path))
+
+
+def test_parts_are_stitched_in_order_with_silence_and_removed(tmp_path):
+    parts = []
+    for n, text in enumerate(["Primera parte.", "Segunda."]):
+        segment, _mime, ok = generate_audio_for_text(
+            text, "Largo", "1", FakeBackend(bytes_per_char=10), 0, str(tmp_path),
+            retry_policy=no_wait_policy(), output_path=str(tmp_path / f"1_part{n}.wav"),
+        )
+        assert ok
+        parts.append(segment)
+    expected = read_pcm(parts[0]) + bytes(480) + read_pcm(parts[1])  # 10 ms a 24 kHz/16 bits
+
+    segment, mime_type, ok = stitch_wav_parts(parts, str(tmp_path / "1_Largo.wav"), 10, "1", "Largo")
+
+    assert ok
+    assert read_pcm(segment) == expected
+    assert not (tmp_path / "1_part0.wav").exists() and not (tmp_path / "1_part1.wav").exists()
+
+
+def test_a_failed_part_fails_the_item(tmp_path):
+    part, _mime, _ok = generate_audio_for_text(
+        "Parte.", "Largo", "1", FakeBackend(bytes_per_char=10), 0, str(tmp_path),
+        retry_policy=no_wait_policy(), output_path=str(tmp_path / "1_part0.wav"),
+    )
+
+    assert stitch_wav_parts([part, None], str(tmp_path / "1_Largo.wav"), 0, "1", "Largo") == (None, None, False)
+    assert not (tmp_path / "1_Largo.wav").exists()
@@ -0,0 +1,37 @@
+import pytest
+
+from text_chunker import split_text
+
+
+def test_short_or_unlimited_text_is_a_single_chunk():
+    assert split_text("  Hola mundo.  ", 0) == ["Hola mundo."]
+    assert split_text("Hola mundo.", 100) == ["Hola mundo."]
+    assert split_text("   ", 10) == []
+
+
+def test_sentences_are_grouped_up_to_the_limit():
+    text = "Primera oración. ¿Segunda? ¡Tercera! Cuarta… Quinta."
+
+    assert split_text(text, 30) == ["Primera oración. ¿Segunda?", "¡Tercera! Cuarta… Quinta."]
+
+
+def test_sentence_ending_inside_quotes():
+    assert split_text('Dijo "basta." Y se fue.', 15) == ['Dijo "basta."', "Y se fue."]
+
+
+def test_long_sentences_are_cut_at_clauses_then_words():
+    text = "uno dos tres, cuatro cinco seis; siete ocho nueve diez once doce"
+
+    chunks = split_text(text, 20)
+
+    assert chunks == ["uno dos tres,", "cuatro cinco seis;", "siete ocho nueve", "diez once doce"]
+
+
+@pytest.mark.parametrize("max_chars", [5, 12, 40])
+def test_chunks_respect_the_limit_and_keep_every_word(max_chars):
+    text = "Un párrafo largo, con comas; y palabrasdemasiadolargasparaunfragmento. Otra oración corta."
+
+    chunks = split_text(text, max_chars)
+
+    assert all(0 < len(chunk) <= max_chars for chunk in chunks)
+    assert "".join(chunks).replace(" ", "") == text.replace(" ", "")
@@ -0,0 +1,62 @@
+from concurrent.futures import Future
+
+import pytest
+
+from main import generate_audio_for_text, submit_duplicate
+from pipeline_stats import PipelineStats
+from retry_policy import RetryPolicy
+from text_dedup import DuplicateFinder, normalize_text
+from tts_backends import FakeBackend
+
+
+def test_normalize_text_collapses_whitespace_and_unicode_forms():
+    assert normalize_text("  Hola\n\tmundo  ") == "Hola mundo"
+    assert normalize_text("canci\u00f3n") == normalize_text("cancio\u0301n")  # NFC y NFD
+    # Mayúsculas y puntuación cambian la entonación: no se igualan
+    assert normalize_text("Hola.") != normalize_text("hola.")
+    assert normalize_text("Hola.") != normalize_text("Hola")
+
+
+def test_duplicate_finder_points_to_the_first_occurrence():
+    finder = DuplicateFinder()
+
+    assert finder.check(0, "Aviso legal") is None
+    assert finder.check(1, "Otro texto") is None
+    assert finder.check(2, "Aviso  legal\n") == 0
+    assert finder.check(3, "Otro texto") == 1
+    assert finder.check(0, "Aviso legal") is None  # volver a consultar el original no lo marca como repetido
+
+
+def test_duplicate_receives_a_copy_of_the_original_audio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stats = PipelineStats()
+    original = Future()
+    duplicate = submit_duplicate(original, "2", "Copia", str(tmp_path), stats)
+    assert not duplicate.done()
+
+    original.set_result(generate_audio_for_text(
+        "Aviso legal", "Original", "1", FakeBackend(bytes_per_char=48), 0, str(tmp_path), retry_policy=RetryPolicy(max_retries=1),
+    ))
+
+    segment, mime_type, ok = duplicate.result(timeout=5)
+    assert ok
+    assert segment.path == str(tmp_path / "2_Copia.wav")
+    assert (tmp_path / "2_Copia.wav").read_bytes() == (tmp_path / "1_Original.wav").read_bytes()
+    assert mime_type == "audio/L16;codec=pcm;rate=24000"
+    assert stats.as_dict()["deduplicated_items"] == 1
+    assert stats.as_dict()["deduplicated_audio_seconds"] == pytest.approx(len("Aviso legal") * 48 / 48000)
+
+
+@pytest.mark.parametrize("outcome", [(None, None, False), RuntimeError("sin audio")])
+def test_duplicate_of_a_failed_text_fails_too(tmp_path, monkeypatch, outcome):
+    monkeypatch.chdir(tmp_path)
+    original = Future()
+    duplicate = submit_duplicate(original, "2", "Copia", str(tmp_path))
+
+    if isinstance(outcome, BaseException):
+        original.set_exception(outcome)
+    else:
+        original.set_result(outcome)
+
+    assert duplicate.result(timeout=5) == (None, None, False)
+    assert not (tmp_path / "2_Copia.wav").exists()
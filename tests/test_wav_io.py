@@ -0,0 +1,209 @@
+import struct
+
+import pytest
+
+from wav_io import (
+    RF64_HEADER_SIZE,
+    RIFF_MAX_SIZE,
+    WAV_HEADER_SIZE,
+    OrderedWavAssembler,
+    WavSegment,
+    WavStreamWriter,
+    build_wav_header,
+    iter_riff_chunks,
+    read_wav_info,
+)
+
+
+def chunk(chunk_id: bytes, body: bytes) -> bytes:
+    """Chunk RIFF con su byte de relleno si el tamaño es impar."""
+    return struct.pack("<4sI", chunk_id, len(body)) + body + (b"\x00" if len(body) & 1 else b"")
+
+
+def fmt_body(sample_rate=24000, bits=16, channels=1) -> bytes:
+    block_align = channels * bits // 8
+    return struct.pack("<HHIIHH", 1, channels, sample_rate, sample_rate * block_align, block_align, bits)
+
+
+def riff(*chunks: bytes) -> bytes:
+    body = b"WAVE" + b"".join(chunks)
+    return struct.pack("<4sI", b"RIFF", len(body)) + body
+
+
+def test_canonical_header_is_44_bytes_and_round_trips(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(build_wav_header(1000, 24000, 16) + bytes(1000))
+
+    info = read_wav_info(str(path))
+
+    assert len(build_wav_header(1000, 24000, 16)) == WAV_HEADER_SIZE
+    assert (info.data_offset, info.data_size, info.is_rf64) == (WAV_HEADER_SIZE, 1000, False)
+    assert info.params()["byte_rate"] == 48000
+
+
+def test_reserved_header_becomes_rf64_over_4gb_without_moving_data(tmp_path):
+    path = tmp_path / "big.wav"
+    small = build_wav_header(100, 24000, 16, reserve_ds64=True)
+    assert len(small) == RF64_HEADER_SIZE
+    assert small[:4] == b"RIFF" and small[12:16] == b"JUNK"
+
+    big_size = RIFF_MAX_SIZE + 1000  # más de 4 GB de PCM
+    with open(path, "wb") as f:
+        f.write(small + bytes(100))
+        # Archivo disperso: el PCM que falta no ocupa disco
+        f.truncate(RF64_HEADER_SIZE + big_size)
+        f.seek(0)
+        header = build_wav_header(big_size, 24000, 16, reserve_ds64=True)
+        assert len(header) == RF64_HEADER_SIZE
+        f.write(header)
+
+    info = read_wav_info(str(path))
+
+    assert header[:4] == b"RF64" and header[12:16] == b"ds64"
+    assert struct.unpack("<I", header[4:8])[0] == RIFF_MAX_SIZE
+    assert info.is_rf64
+    assert info.data_offset == RF64_HEADER_SIZE
+    assert info.data_size == big_size
+
+
+def test_unreserved_header_switches_to_rf64_when_data_does_not_fit():
+    header = build_wav_header(RIFF_MAX_SIZE, 24000, 16)
+    riff_size, data_size, sample_count = struct.unpack("<QQQ", header[20:44])
+
+    assert header[:4] == b"RF64"
+    assert data_size == RIFF_MAX_SIZE
+    assert riff_size == RF64_HEADER_SIZE - 8 + RIFF_MAX_SIZE
+    assert sample_count == RIFF_MAX_SIZE // 2
+
+
+def test_iter_riff_chunks_skips_unknown_chunks_and_odd_padding(tmp_path):
+    path = tmp_path / "chunks.wav"
+    path.write_bytes(riff(
+        chunk(b"fmt ", fmt_body()),
+        chunk(b"LIST", b"INFOx"),  # tamaño impar: lleva un byte de relleno
+        chunk(b"junk", b"abc"),
+        chunk(b"data", b"\x01\x02\x03\x04"),
+    ))
+
+    with open(path, "rb") as f:
+        chunks = list(iter_riff_chunks(f))
+    info = read_wav_info(str(path))
+
+    assert [chunk_id for chunk_id, _offset, _size in chunks] == [b"fmt ", b"LIST", b"junk", b"data"]
+    assert chunks[1][2] == 5
+    assert chunks[2][1] == chunks[1][1] + 5 + 1 + 8
+    assert (info.data_offset, info.data_size) == (chunks[3][1], 4)
+    with open(path, "rb") as f:
+        f.seek(info.data_offset)
+        assert f.read(info.data_size) == b"\x01\x02\x03\x04"
+
+
+def test_data_tag_inside_an_earlier_chunk_is_not_mistaken_for_audio(tmp_path):
+    path = tmp_path / "tag.wav"
+    path.write_bytes(riff(chunk(b"fmt ", fmt_body()), chunk(b"LIST", b"data\x10\x00\x00\x00"), chunk(b"data", b"\x05\x06")))
+
+    info = read_wav_info(str(path))
+
+    assert info.data_size == 2
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        (b"RIFF", "falta RIFF"),
+        (b"RIFX\x00\x00\x00\x00WAVE", "falta RIFF"),
+        (b"RIFF\x00\x00\x00\x00AVI ", "falta WAVE"),
+        (riff(chunk(b"fmt ", fmt_body()))[:30], "fmt"),
+        (riff(chunk(b"fmt ", fmt_body())), "data"),
+        (riff(chunk(b"data", b"\x00\x00"), chunk(b"fmt ", fmt_body())), "antes del chunk 'fmt '"),
+    ],
+)
+def test_read_wav_info_rejects_truncated_or_malformed_headers(tmp_path, content, message):
+    path = tmp_path / "bad.wav"
+    path.write_bytes(content)
+
+    with pytest.raises(ValueError, match=message):
+        read_wav_info(str(path))
+
+
+def test_read_wav_info_limits_data_size_of_a_truncated_file(tmp_path):
+    path = tmp_path / "cut.wav"
+    path.write_bytes(build_wav_header(1000, 24000, 16) + bytes(300))
+
+    assert read_wav_info(str(path)).data_size == 300
+
+
+def test_stream_writer_renames_only_on_close(tmp_path):
+    path = tmp_path / "out.wav"
+    writer = WavStreamWriter(str(path))
+    writer.set_format_from_mime("audio/L16;codec=pcm;rate=16000")
+    writer.write(b"\x01\x00" * 10)
+
+    assert not path.exists()
+    segment = writer.close()
+    info = read_wav_info(str(path))
+
+    assert not (tmp_path / "out.wav.part").exists()
+    assert (segment.data_offset, segment.data_size) == (WAV_HEADER_SIZE, 20)
+    assert (info.sample_rate, info.data_size) == (16000, 20)
+
+
+def test_stream_writer_abort_leaves_nothing(tmp_path):
+    path = tmp_path / "out.wav"
+    with pytest.raises(RuntimeError):
+        with WavStreamWriter(str(path)) as writer:
+            writer.write(b"\x00\x00")
+            raise RuntimeError("fallo del stream")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def pcm_segment(tmp_path, name: str, pcm: bytes) -> WavSegment:
+    path = tmp_path / f"{name}.wav"
+    path.write_bytes(build_wav_header(len(pcm), 24000, 16) + pcm)
+    return WavSegment(str(path), WAV_HEADER_SIZE, len(pcm), "audio/L16;codec=pcm;rate=24000")
+
+
+def read_data(path) -> bytes:
+    info = read_wav_info(str(path))
+    with open(path, "rb") as f:
+        f.seek(info.data_offset)
+        return f.read(info.data_size)
+
+
+def test_assembler_writes_out_of_order_segments_in_index_order(tmp_path):
+    assembler = OrderedWavAssembler(str(tmp_path / "out.wav"), 4, gap_ms=1)
+
+    assembler.add(2, pcm_segment(tmp_path, "c", b"\x03" * 6))
+    assembler.add(1, None)  # ID fallido: se omite
+    assert assembler.segments_written == 0  # falta el índice 0
+    assembler.add(0, pcm_segment(tmp_path, "a", b"\x01" * 4))
+    assert assembler.segments_written == 2
+    assert not assembler.complete
+    assembler.add(3, pcm_segment(tmp_path, "d", b"\x04" * 2))
+    combined = assembler.close()
+
+    gap = bytes(48)  # 1 ms a 24 kHz/16 bits
+    assert read_data(combined.path) == b"\x01" * 4 + gap + b"\x03" * 6 + gap + b"\x04" * 2
+    assert assembler.segment_positions == [(0, 0, 4), (2, 52, 6), (3, 106, 2)]
+    assert read_wav_info(combined.path).is_rf64 is False
+
+
+def test_assembler_missing_index_discards_the_output(tmp_path):
+    assembler = OrderedWavAssembler(str(tmp_path / "out.wav"), 2)
+    assembler.add(1, pcm_segment(tmp_path, "b", b"\x02" * 4))
+
+    assert assembler.close() is None
+    assert isinstance(assembler.error, RuntimeError)
+    assert not (tmp_path / "out.wav").exists()
+
+
+def test_assembler_keeps_the_original_segment_if_the_filter_fails(tmp_path):
+    def failing_filter(segment):
+        raise ValueError("formato no soportado")
+
+    assembler = OrderedWavAssembler(str(tmp_path / "out.wav"), 1, segment_filter=failing_filter)
+    assembler.add(0, pcm_segment(tmp_path, "a", b"\x01" * 4))
+
+    assert read_data(assembler.close().path) == b"\x01" * 4
+    assert assembler.filter_failures == 1
@@ -0,0 +1,62 @@
+"""
+División de textos largos en fragmentos para sintetizarlos en paralelo.
+
+Corta preferentemente en fin de oración; si una oración supera el límite, en
+signos de puntuación intermedios (comas, punto y coma, dos puntos) y, como
+último recurso, en espacios.
+"""
+
+import re
+
+
+DEFAULT_CHUNK_CHARS = 0  # 0 = no dividir
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"'»”)\]])\s+")
+_CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:—])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _split_keep_limit(text: str, pattern: re.Pattern, max_chars: int) -> list[str]:
+    """Divide `text` en los cortes de `pattern` y agrupa las piezas sin superar max_chars."""
+    pieces = [p for p in pattern.split(text) if p and p.strip()]
+    chunks = []
+    current = ""
+    for piece in pieces:
+        piece = piece.strip()
+        candidate = f"{current} {piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """
+    Divide un texto en fragmentos de como máximo `max_chars` caracteres,
+    cortando en límites de oración o cláusula. Con max_chars <= 0 o un texto
+    corto devuelve el texto completo como único fragmento.
+    """
+    text = text.strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks = []
+    for sentence_group in _split_keep_limit(text, _SENTENCE_BOUNDARY, max_chars):
+        if len(sentence_group) <= max_chars:
+            chunks.append(sentence_group)
+            continue
+        # Oración demasiado larga: cortar en cláusulas y, si no alcanza, en palabras
+        for clause_group in _split_keep_limit(sentence_group, _CLAUSE_BOUNDARY, max_chars):
+            if len(clause_group) <= max_chars:
+                chunks.append(clause_group)
+                continue
+            for word_group in _split_keep_limit(clause_group, _WHITESPACE, max_chars):
+                # Una sola "palabra" más larga que el límite se corta sin más remedio
+                for start in range(0, len(word_group), max_chars):
+                    chunks.append(word_group[start:start + max_chars])
+    return chunks
@@ -0,0 +1,35 @@
+"""
+Deduplicación de textos repetidos antes de planificar la síntesis.
+
+Los documentos convertidos suelen repetir secciones idénticas (avisos legales,
+definiciones, la misma introducción en cada módulo). Todos los IDs se sintetizan
+con la misma configuración de voz, así que basta con agrupar por texto normalizado:
+cada texto único se sintetiza una vez y su audio se reparte al resto de IDs del grupo.
+"""
+
+import re
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """
+    Forma canónica para comparar textos: Unicode NFC y espacios colapsados.
+    No se cambian mayúsculas ni puntuación, porque afectan a la entonación.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class DuplicateFinder:
+    """
+    Agrupa los textos a medida que llegan (por ejemplo, mientras se lee la entrada):
+    cada uno se compara con los ya vistos, sin necesitar la lista completa.
+    """
+
+    def __init__(self):
+        self._first_seen: dict[str, int] = {}
+
+    def check(self, index: int, text: str) -> int | None:
+        """Devuelve el índice de la primera aparición del texto, o None si es la primera (y la registra)."""
+        original = self._first_seen.setdefault(normalize_text(text), index)
+        return original if original != index else None
+
@@ -0,0 +1,234 @@
+"""
+Backends de síntesis de voz (TTS) intercambiables.
+
+Un backend convierte un texto en un stream de chunks de PCM crudo, cada uno con
+su mime_type. El pipeline (caché, limitador, reintentos, escritura de WAV) solo
+depende de esta interfaz, de modo que puede ejecutarse y medirse sin API key con
+FakeBackend.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import struct
+import threading
+import time
+from typing import AsyncIterator, Iterator, Protocol
+
+
+class TTSBackend(Protocol):
+    """
+    Interfaz común de los backends.
+
+    cache_identity: (modelo, voz, temperatura) que, junto con el texto, identifica
+    el audio producido; se usa para la clave de caché.
+    """
+
+    name: str
+    cache_identity: tuple[str, str, float]
+
+    def stream(self, text: str) -> Iterator[tuple[bytes, str]]:
+        """Genera (chunk_pcm, mime_type) para el texto dado."""
+        ...
+
+    def astream(self, text: str) -> AsyncIterator[tuple[bytes, str]]:
+        """Versión asyncio de stream()."""
+        ...
+
+
+def extract_inline_audio(chunk) -> tuple[bytes | None, str | None]:
+    """
+    Devuelve (datos, mime_type) del audio inline de un chunk del stream de Gemini,
+    o (None, None) si el chunk no trae audio.
+    """
+    if (
+        chunk.candidates is None
+        or not chunk.candidates # Asegura que la lista de candidatos no esté vacía
+        or chunk.candidates[0].content is None
+        or chunk.candidates[0].content.parts is None
+        or not chunk.candidates[0].content.parts # Asegura que la lista de parts no esté vacía
+    ):
+        return None, None
+
+    part = chunk.candidates[0].content.parts[0]
+    if part.inline_data and part.inline_data.data:
+        return part.inline_data.data, part.inline_data.mime_type
+    # En el script original, se imprimía chunk.text aquí si no era inline_data
+    # elif part.text:
+    #     print(f"Texto recibido en chunk (no audio): {part.text}")
+    return None, None
+
+
+class GeminiBackend:
+    """Backend sobre genai.Client.models.generate_content_stream (y su versión aio)."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, voice_name: str, temperature: float):
+        # Importación diferida: el resto del pipeline no necesita google-genai instalado
+        from google import genai
+        from google.genai import types
+
+        self._types = types
+        self.client = genai.Client(api_key=api_key)
+        self.model_name = model_name
+        self.cache_identity = (model_name, voice_name, temperature)
+        self.generate_config = types.GenerateContentConfig(
+            temperature=temperature,
+            response_modalities=["audio"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=voice_name
+                    )
+                )
+            ),
+        )
+
+    def _contents(self, text: str) -> list:
+        return [
+            self._types.Content(
+                role="user",
+                parts=[
+                    self._types.Part.from_text(text=text),
+                ],
+            ),
+        ]
+
+    def stream(self, text: str) -> Iterator[tuple[bytes, str]]:
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=self._contents(text),
+            config=self.generate_config,
+        ):
+            audio_data, mime_type = extract_inline_audio(chunk)
+            if audio_data:
+                yield audio_data, mime_type
+
+    async def astream(self, text: str) -> AsyncIterator[tuple[bytes, str]]:
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=self._contents(text),
+            config=self.generate_config,
+        )
+        async for chunk in stream:
+            audio_data, mime_type = extract_inline_audio(chunk)
+            if audio_data:
+                yield audio_data, mime_type
+
+
+class FakeAPIError(Exception):
+    """Error simulado con la misma forma (code/status) que los de google-genai."""
+
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.details = {"error": {"code": code, "status": status, "message": message}}
+
+
+class FakeBackend:
+    """
+    Backend local y determinista que genera PCM sintético (un tono por texto).
+
+    Parámetros:
+        latency: segundos hasta el primer chunk.
+        realtime_factor: velocidad de generación respecto al tiempo real
+            (2.0 = el doble de rápido que la duración del audio; 0 = instantáneo).
+        chunk_bytes: tamaño de cada chunk de PCM.
+        bytes_per_char: bytes de PCM producidos por carácter de texto
+            (a 24 kHz/16 bits, ~3000 equivale a ~16 caracteres por segundo de voz).
+        error_rate: probabilidad de un error transitorio (503) por llamada.
+        rate_limit_rate: probabilidad de un 429 RESOURCE_EXHAUSTED por llamada.
+        seed: semilla; con la misma semilla y los mismos textos, el audio y la
+            secuencia de errores inyectados son idénticos entre ejecuciones.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        realtime_factor: float = 0.0,
+        chunk_bytes: int = 4096,
+        bytes_per_char: int = 3000,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        sample_rate: int = 24000,
+    ):
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+        self.chunk_bytes = max(2, chunk_bytes - chunk_bytes % 2)
+        self.bytes_per_char = bytes_per_char
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.sample_rate = sample_rate
+        self.mime_type = f"audio/L16;codec=pcm;rate={sample_rate}"
+        self.cache_identity = (f"fake-tts@{sample_rate}", f"fake-seed-{seed}", 0.0)
+        self._calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _plan(self, text: str) -> tuple[int, float]:
+        """
+        Decide de forma determinista el resultado de esta llamada: (bytes totales, frecuencia)
+        o lanza el error inyectado. Depende solo de la semilla, el texto y el número de
+        llamadas previas con ese texto.
+        """
+        digest = hashlib.sha256(f"{self.seed}:{text}".encode("utf-8")).digest()
+        with self._lock:
+            call_number = self._calls.get(text, 0)
+            self._calls[text] = call_number + 1
+
+        roll = random.Random(int.from_bytes(digest[:8], "little") + call_number).random()
+        if roll < self.rate_limit_rate:
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED", "Cuota simulada agotada. Please retry in 1s.")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeAPIError(503, "UNAVAILABLE", "Error transitorio simulado.")
+
+        total_bytes = max(2, len(text) * self.bytes_per_char)
+        total_bytes -= total_bytes % 2
+        frequency = 180 + digest[8] % 120
+        return total_bytes, frequency
+
+    def _chunks(self, total_bytes: int, frequency: float) -> Iterator[bytes]:
+        # Un periodo de tono precalculado que se repite: barato y siempre igual para el mismo texto
+        period_samples = max(1, round(self.sample_rate / frequency))
+        period = struct.pack(
+            f"<{period_samples}h",
+            *(int(8000 * math.sin(2 * math.pi * n / period_samples)) for n in range(period_samples)),
+        )
+        pattern = period * (self.chunk_bytes // len(period) + 2)
+        offset = 0
+        while offset < total_bytes:
+            size = min(self.chunk_bytes, total_bytes - offset)
+            start = offset % len(period)
+            yield pattern[start:start + size]
+            offset += size
+
+    def _chunk_delay(self, size: int) -> float:
+        if not self.realtime_factor:
+            return 0.0
+        return size / (self.sample_rate * 2) / self.realtime_factor
+
+    def stream(self, text: str) -> Iterator[tuple[bytes, str]]:
+        total_bytes, frequency = self._plan(text)
+        if self.latency:
+            time.sleep(self.latency)
+        for chunk in self._chunks(total_bytes, frequency):
+            delay = self._chunk_delay(len(chunk))
+            if delay:
+                time.sleep(delay)
+            yield chunk, self.mime_type
+
+    async def astream(self, text: str) -> AsyncIterator[tuple[bytes, str]]:
+        total_bytes, frequency = self._plan(text)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for chunk in self._chunks(total_bytes, frequency):
+            delay = self._chunk_delay(len(chunk))
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk, self.mime_type
@@ -0,0 +1,532 @@
+"""
+Utilidades de E/S de archivos WAV compartidas por main.py y join_wav.py.
+
+Permiten escribir WAV de forma incremental (encabezado provisional + datos
+añadidos por partes + tamaños corregidos al cerrar) y copiar PCM entre archivos
+dentro del kernel (copy_file_range/sendfile) o, si no es posible, con un buffer
+de tamaño fijo, sin cargar el audio completo en memoria.
+
+Los encabezados se leen recorriendo los chunks RIFF (sin buscar firmas dentro de
+los datos) y, cuando el audio supera el límite de 4 GB de RIFF, se escriben en
+formato RF64 (chunk ds64 con tamaños de 64 bits).
+"""
+
+import errno
+import os
+import struct
+import threading
+from typing import BinaryIO, Iterator
+
+
+WAV_HEADER_SIZE = 44
+# Encabezado con espacio para un chunk ds64 (JUNK mientras no haga falta): RIFF(12) + ds64(36) + fmt(24) + data(8)
+RF64_HEADER_SIZE = 80
+DS64_BODY_SIZE = 28
+RIFF_MAX_SIZE = 0xFFFFFFFF  # los tamaños de RIFF/WAV son de 32 bits
+COPY_BUFFER_SIZE = 1024 * 1024  # 1 MiB
+
+
+def parse_audio_mime_type(mime_type: str) -> dict[str, int | None]:
+    """
+    Analiza los bits por muestra y la tasa de muestreo de una cadena de tipo MIME de audio.
+    (Función original del usuario)
+    """
+    bits_per_sample = 16
+    rate = 24000
+
+    # Extract rate from parameters
+    parts = mime_type.split(";")
+    for param in parts: # Skip the main type part
+        param = param.strip()
+        if param.lower().startswith("rate="):
+            try:
+                rate_str = param.split("=", 1)[1]
+                rate = int(rate_str)
+            except (ValueError, IndexError):
+                # Handle cases like "rate=" with no value or non-integer value
+                pass # Keep rate as default
+        elif param.startswith("audio/L"):
+            try:
+                bits_per_sample = int(param.split("L", 1)[1])
+            except (ValueError, IndexError):
+                pass # Keep bits_per_sample as default if conversion fails
+
+    return {"bits_per_sample": bits_per_sample, "rate": rate}
+
+
+def build_wav_header(
+    data_size: int,
+    sample_rate: int,
+    bits_per_sample: int,
+    num_channels: int = 1,
+    audio_format: int = 1,
+    reserve_ds64: bool = False
+) -> bytes:
+    """
+    Crea el encabezado WAV para `data_size` bytes de audio.
+
+    - Por defecto, el encabezado canónico de 44 bytes (fmt de 16 bytes + chunk data).
+    - Si los datos no caben en los tamaños de 32 bits de RIFF, un encabezado RF64 de
+      80 bytes (chunk ds64 con los tamaños reales; RIFF/data a 0xFFFFFFFF).
+    - Con reserve_ds64=True y datos pequeños, un encabezado RIFF de 80 bytes con un
+      chunk JUNK en el lugar del ds64, para poder convertirlo a RF64 sin mover los datos.
+    """
+    block_align = num_channels * (bits_per_sample // 8)
+    byte_rate = sample_rate * block_align
+    fmt_chunk = struct.pack(
+        "<4sIHHIIHH",
+        b"fmt ",
+        16,
+        audio_format,
+        num_channels,
+        sample_rate,
+        byte_rate,
+        block_align,
+        bits_per_sample,
+    )
+    needs_rf64 = data_size + RF64_HEADER_SIZE - 8 > RIFF_MAX_SIZE
+    if not needs_rf64 and not reserve_ds64:
+        # 36 bytes para campos de encabezado antes del tamaño del chunk de datos
+        return struct.pack("<4sI4s", b"RIFF", 36 + data_size, b"WAVE") + fmt_chunk + struct.pack("<4sI", b"data", data_size)
+
+    riff_size = RF64_HEADER_SIZE - 8 + data_size
+    if needs_rf64:
+        sample_count = data_size // block_align if block_align else 0
+        ds64_chunk = struct.pack("<4sIQQQI", b"ds64", DS64_BODY_SIZE, riff_size, data_size, sample_count, 0)
+        return struct.pack("<4sI4s", b"RF64", RIFF_MAX_SIZE, b"WAVE") + ds64_chunk + fmt_chunk + struct.pack("<4sI", b"data", RIFF_MAX_SIZE)
+    junk_chunk = struct.pack("<4sI", b"JUNK", DS64_BODY_SIZE) + bytes(DS64_BODY_SIZE)
+    return struct.pack("<4sI4s", b"RIFF", riff_size, b"WAVE") + junk_chunk + fmt_chunk + struct.pack("<4sI", b"data", data_size)
+
+
+def iter_riff_chunks(file: BinaryIO) -> Iterator[tuple[bytes, int, int]]:
+    """
+    Recorre los chunks de un archivo RIFF/RF64 (WAVE) leyendo solo sus encabezados
+    y devuelve (id, offset del contenido, tamaño) de cada uno. En RF64/BW64, el
+    tamaño real del chunk data se toma del chunk ds64.
+    """
+    file.seek(0)
+    header = file.read(12)
+    if len(header) < 12 or header[:4] not in (b"RIFF", b"RF64", b"BW64"):
+        raise ValueError("No es un archivo WAV válido (falta RIFF)")
+    if header[8:12] != b"WAVE":
+        raise ValueError("No es un archivo WAV válido (falta WAVE)")
+
+    ds64_data_size = None
+    position = 12
+    while True:
+        file.seek(position)
+        chunk_header = file.read(8)
+        if len(chunk_header) < 8:
+            return
+        chunk_id, size = struct.unpack("<4sI", chunk_header)
+        if chunk_id == b"ds64":
+            body = file.read(24)
+            if len(body) == 24:
+                _riff_size, ds64_data_size, _sample_count = struct.unpack("<QQQ", body)
+        elif chunk_id == b"data" and size == RIFF_MAX_SIZE and ds64_data_size is not None:
+            size = ds64_data_size
+        yield chunk_id, position + 8, size
+        # Los chunks de tamaño impar llevan un byte de relleno
+        position += 8 + size + (size & 1)
+
+
+class WavInfo:
+    """Formato y ubicación del audio de un archivo WAV, obtenidos solo de sus encabezados."""
+
+    __slots__ = (
+        "path",
+        "audio_format",
+        "num_channels",
+        "sample_rate",
+        "byte_rate",
+        "block_align",
+        "bits_per_sample",
+        "data_offset",
+        "data_size",
+        "is_rf64",
+    )
+
+    def __init__(self, path, audio_format, num_channels, sample_rate, byte_rate, block_align, bits_per_sample, data_offset, data_size, is_rf64):
+        self.path = path
+        self.audio_format = audio_format
+        self.num_channels = num_channels
+        self.sample_rate = sample_rate
+        self.byte_rate = byte_rate
+        self.block_align = block_align
+        self.bits_per_sample = bits_per_sample
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.is_rf64 = is_rf64
+
+    def params(self) -> dict:
+        """Parámetros de formato como diccionario (el formato que usa join_wav.py)."""
+        return {
+            "audio_format": self.audio_format,
+            "num_channels": self.num_channels,
+            "sample_rate": self.sample_rate,
+            "byte_rate": self.byte_rate,
+            "block_align": self.block_align,
+            "bits_per_sample": self.bits_per_sample,
+        }
+
+    def segment(self) -> "WavSegment":
+        """WavSegment con el PCM del archivo."""
+        return WavSegment(self.path, self.data_offset, self.data_size, f"audio/L{self.bits_per_sample};codec=pcm;rate={self.sample_rate}")
+
+    def __repr__(self):
+        return f"WavInfo({self.path!r}, {self.num_channels} canales, {self.sample_rate} Hz, {self.bits_per_sample} bits, offset={self.data_offset}, size={self.data_size})"
+
+
+def read_wav_info(path: str) -> WavInfo:
+    """
+    Lee el formato (chunk fmt) y la posición del audio (chunk data) de un WAV o RF64
+    recorriendo sus chunks, sin leer el audio. Si el archivo está truncado, el tamaño
+    de datos se limita a lo que realmente contiene.
+    """
+    with open(path, "rb") as f:
+        return read_wav_info_from(f, path, os.path.getsize(path))
+
+
+def read_wav_info_from(file: BinaryIO, path: str | None, file_size: int) -> WavInfo:
+    """Como read_wav_info(), sobre un archivo ya abierto (o un io.BytesIO) de `file_size` bytes."""
+    fmt = None
+    file.seek(0)
+    is_rf64 = file.read(4) in (b"RF64", b"BW64")
+    for chunk_id, offset, size in iter_riff_chunks(file):
+        if chunk_id == b"fmt ":
+            if size < 16:
+                raise ValueError("Chunk 'fmt ' demasiado pequeño")
+            file.seek(offset)
+            body = file.read(min(size, 40))
+            if len(body) < 16:
+                raise ValueError("Chunk 'fmt ' truncado")
+            fmt = list(struct.unpack("<HHIIHH", body[:16]))
+            if fmt[0] == 0xFFFE and len(body) >= 26:
+                # WAVE_FORMAT_EXTENSIBLE: el formato real son los 2 primeros bytes del SubFormat
+                fmt[0] = struct.unpack("<H", body[24:26])[0]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("El chunk 'data' aparece antes del chunk 'fmt '")
+            audio_format, num_channels, sample_rate, byte_rate, block_align, bits_per_sample = fmt
+            data_size = max(0, min(size, file_size - offset))
+            return WavInfo(path, audio_format, num_channels, sample_rate, byte_rate, block_align, bits_per_sample, offset, data_size, is_rf64)
+    if fmt is None:
+        raise ValueError("No se encontró el chunk 'fmt ' en el archivo WAV")
+    raise ValueError("No se encontró el chunk 'data' en el archivo WAV")
+
+
+# Errores con los que copy_file_range/sendfile indican que no sirven para este par de
+# archivos (otro sistema de archivos, kernel antiguo, destino no soportado...)
+_KERNEL_COPY_UNSUPPORTED = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EBADF,
+    errno.EOPNOTSUPP,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+    getattr(errno, "ENOTSOCK", errno.EINVAL),
+}
+
+
+def copy_file_data(src, src_offset: int, size: int, dst, dst_offset: int, buffer_size: int = COPY_BUFFER_SIZE) -> int:
+    """
+    Copia `size` bytes de `src` (desde src_offset) a `dst` (en dst_offset), ambos
+    archivos abiertos en modo binario. Usa os.copy_file_range y, si no está disponible,
+    os.sendfile, de modo que los datos no pasan por Python; como último recurso copia
+    con un buffer de tamaño fijo. Devuelve los bytes copiados.
+    La posición de `dst` queda al final de lo copiado.
+    """
+    dst.flush()
+    src_fd = src.fileno()
+    dst_fd = dst.fileno()
+    copied = 0
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied, src_offset + copied, dst_offset + copied)
+                if n == 0:
+                    raise IOError(f"Fin de archivo inesperado al copiar {getattr(src, 'name', src_fd)}")
+                copied += n
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+
+    if copied < size and hasattr(os, "sendfile"):
+        try:
+            # sendfile escribe en la posición actual del descriptor de destino
+            os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+            while copied < size:
+                n = os.sendfile(dst_fd, src_fd, src_offset + copied, size - copied)
+                if n == 0:
+                    raise IOError(f"Fin de archivo inesperado al copiar {getattr(src, 'name', src_fd)}")
+                copied += n
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+
+    if copied < size:
+        buffer = bytearray(min(buffer_size, size - copied))
+        view = memoryview(buffer)
+        src.seek(src_offset + copied)
+        dst.seek(dst_offset + copied)
+        while copied < size:
+            read = src.readinto(view[:min(len(buffer), size - copied)])
+            if not read:
+                raise IOError(f"Fin de archivo inesperado al copiar {getattr(src, 'name', src_fd)}")
+            dst.write(view[:read])
+            copied += read
+        dst.flush()
+
+    dst.seek(dst_offset + copied)
+    return copied
+
+
+def preallocate_file(file, size: int):
+    """Reserva espacio en disco para `size` bytes si el sistema lo permite (evita fragmentación)."""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(file.fileno(), 0, size)
+        except OSError:
+            pass  # Sistemas de archivos sin soporte: se crece al escribir
+
+
+class WavSegment:
+    """
+    Referencia al bloque de PCM de un archivo WAV en disco (ruta, offset y tamaño),
+    para poder copiarlo después sin mantener el audio en memoria.
+    """
+
+    __slots__ = ("path", "data_offset", "data_size", "mime_type")
+
+    def __init__(self, path: str, data_offset: int, data_size: int, mime_type: str | None):
+        self.path = path
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.mime_type = mime_type
+
+    def __repr__(self):
+        return f"WavSegment({self.path!r}, offset={self.data_offset}, size={self.data_size}, mime_type={self.mime_type!r})"
+
+
+def silence_bytes(size: int, bits_per_sample: int) -> bytes:
+    """`size` bytes de PCM en silencio: el PCM de 8 bits es sin signo y su cero es 0x80."""
+    return b"\x80" * size if bits_per_sample == 8 else bytes(size)
+
+
+def sync_file(path: str):
+    """Sincroniza con el disco un archivo ya cerrado y la entrada de su directorio."""
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+    fsync_directory(os.path.dirname(path))
+
+
+def fsync_directory(path: str):
+    """Sincroniza con el disco la entrada de directorio (tras un rename). No disponible en Windows."""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WavStreamWriter:
+    """
+    Escribe un archivo WAV de forma incremental.
+
+    Al abrir se reserva un encabezado provisional; cada llamada a write() añade PCM
+    al final y close() reescribe el encabezado con los tamaños RIFF/data reales.
+    Mientras tanto se escribe en {path}.part, que close() renombra a `path`: si el
+    proceso muere a mitad, nunca queda en `path` un WAV a medias que parezca completo.
+    Los parámetros de formato pueden fijarse en cualquier momento antes de close()
+    (por ejemplo, a partir del mime_type del primer chunk recibido).
+
+    Con reserve_ds64=True se reserva un encabezado de 80 bytes que close() escribe
+    como RF64 si el audio supera los 4 GB (o como RIFF con un chunk JUNK si no);
+    sin él, se usa el encabezado canónico de 44 bytes y superar los 4 GB es un error.
+    """
+
+    def __init__(self, path: str, sample_rate: int = 24000, bits_per_sample: int = 16, num_channels: int = 1, reserve_ds64: bool = False):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits_per_sample
+        self.num_channels = num_channels
+        self.reserve_ds64 = reserve_ds64
+        self.data_offset = RF64_HEADER_SIZE if reserve_ds64 else WAV_HEADER_SIZE
+        self.data_size = 0
+        self.mime_type = None
+        self._temp_path = f"{path}.part"
+        self._file = open(self._temp_path, "wb")
+        self._file.write(b"\x00" * self.data_offset)
+
+    def set_format_from_mime(self, mime_type: str):
+        """Ajusta tasa de muestreo y bits por muestra según el mime_type del audio."""
+        parameters = parse_audio_mime_type(mime_type)
+        self.sample_rate = parameters.get("rate") or 24000
+        self.bits_per_sample = parameters.get("bits_per_sample") or 16
+        self.mime_type = mime_type
+
+    def write(self, data):
+        """Añade PCM crudo (bytes, bytearray o memoryview) al final del archivo."""
+        self._file.write(data)
+        self.data_size += len(data)
+
+    def write_from_file(self, src, offset: int, size: int, buffer_size: int = COPY_BUFFER_SIZE) -> int:
+        """Añade `size` bytes de PCM de un archivo abierto `src` (desde `offset`) copiando en el kernel."""
+        copied = copy_file_data(src, offset, size, self._file, self.data_offset + self.data_size, buffer_size)
+        self.data_size += copied
+        return copied
+
+    def write_silence(self, duration_ms: float):
+        """Añade `duration_ms` milisegundos de silencio con el formato actual (0x80 en PCM de 8 bits sin signo, ceros en el resto)."""
+        block_align = self.num_channels * (self.bits_per_sample // 8)
+        remaining = int(self.sample_rate * duration_ms / 1000) * block_align
+        silence = silence_bytes(min(remaining, COPY_BUFFER_SIZE), self.bits_per_sample)
+        while remaining > 0:
+            size = min(remaining, len(silence))
+            self.write(memoryview(silence)[:size])
+            remaining -= size
+
+    def close(self) -> WavSegment:
+        """Corrige el encabezado con los tamaños finales, cierra el archivo y devuelve su WavSegment."""
+        if not self._file.closed:
+            header = build_wav_header(self.data_size, self.sample_rate, self.bits_per_sample, self.num_channels, reserve_ds64=self.reserve_ds64)
+            if len(header) != self.data_offset:
+                self.abort()
+                raise ValueError(f"{self.path}: el audio supera los 4 GB de RIFF y no se reservó espacio para RF64 (reserve_ds64)")
+            self._file.seek(0)
+            self._file.write(header)
+            self._file.close()
+            os.replace(self._temp_path, self.path)
+        return WavSegment(self.path, self.data_offset, self.data_size, self.mime_type)
+
+    def abort(self):
+        """Cierra y elimina el archivo parcial (por ejemplo, tras un intento fallido)."""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def copy_segment_data(segment: WavSegment, writer: WavStreamWriter, buffer_size: int = COPY_BUFFER_SIZE) -> int:
+    """
+    Copia el PCM de un WavSegment al final de un WavStreamWriter sin pasar los datos
+    por Python (o con un buffer fijo si el sistema no lo permite), de modo que la
+    memoria usada no depende del tamaño del segmento.
+    Devuelve los bytes copiados.
+    """
+    with open(segment.path, "rb") as src:
+        return writer.write_from_file(src, segment.data_offset, segment.data_size, buffer_size)
+
+
+class OrderedWavAssembler:
+    """
+    Construye un WAV combinado a medida que llegan los segmentos, respetando su orden.
+
+    Los segmentos pueden llegar en cualquier orden (desde varios hilos); se guardan
+    en un buffer de reordenamiento y se escriben en cuanto el prefijo anterior está
+    completo. Solo se retienen referencias (WavSegment) de los segmentos fuera de
+    orden, nunca su audio. Un índice sin audio (fallido) se registra con add(index, None).
+    Como el tamaño final no se conoce de antemano, se reserva el encabezado RF64: si
+    el combinado supera los 4 GB se escribe como RF64 en lugar de quedar corrupto.
+
+    segment_filter (opcional) transforma cada segmento antes de encolarlo (por
+    ejemplo, para recortar su silencio); se ejecuta fuera del lock, en el hilo que
+    llama a add(). Si falla, se usa el segmento sin transformar. gap_ms inserta ese
+    silencio entre segmentos consecutivos.
+
+    segment_positions registra (índice, posición en el PCM, tamaño) de cada segmento
+    escrito, para construir el índice de capítulos del combinado sin releerlo.
+    """
+
+    def __init__(self, output_path: str, total: int, segment_filter=None, gap_ms: float = 0):
+        self.output_path = output_path
+        self.total = total
+        self.segment_filter = segment_filter
+        self.gap_ms = gap_ms
+        self.mime_type = None
+        self.segments_written = 0
+        self.bytes_copied = 0
+        self.bytes_filtered_out = 0
+        self.filter_failures = 0
+        self.segment_positions: list[tuple[int, int, int]] = []
+        self.error = None
+        self._next_index = 0
+        self._pending: dict[int, WavSegment | None] = {}
+        self._lock = threading.Lock()
+        self._writer = WavStreamWriter(output_path, reserve_ds64=True)
+
+    def add(self, index: int, segment: WavSegment | None):
+        """Registra el resultado del índice dado y escribe todos los segmentos ya contiguos."""
+        if segment is not None and self.segment_filter is not None:
+            try:
+                filtered = self.segment_filter(segment)
+            except Exception:
+                filtered = None
+            with self._lock:
+                if filtered is None:
+                    self.filter_failures += 1
+                else:
+                    self.bytes_filtered_out += segment.data_size - filtered.data_size
+                    segment = filtered
+        with self._lock:
+            if self.error is not None:
+                return
+            self._pending[index] = segment
+            try:
+                while self._next_index in self._pending:
+                    ready_index = self._next_index
+                    ready = self._pending.pop(ready_index)
+                    self._next_index += 1
+                    if ready is None or not ready.data_size:
+                        continue
+                    if self.mime_type is None and ready.mime_type:
+                        # El primer segmento en orden define el formato del encabezado
+                        self.mime_type = ready.mime_type
+                        self._writer.set_format_from_mime(ready.mime_type)
+                    if self.segments_written and self.gap_ms > 0:
+                        self._writer.write_silence(self.gap_ms)
+                    position = self._writer.data_size
+                    copied = copy_segment_data(ready, self._writer)
+                    self.bytes_copied += copied
+                    self.segment_positions.append((ready_index, position, copied))
+                    self.segments_written += 1
+            except Exception as e:
+                self.error = e
+
+    @property
+    def complete(self) -> bool:
+        """Indica si ya se escribieron (u omitieron) todos los índices esperados."""
+        with self._lock:
+            return self._next_index >= self.total
+
+    def close(self) -> WavSegment | None:
+        """
+        Finaliza el encabezado del WAV combinado y devuelve su WavSegment.
+        Si no se escribió ningún segmento o hubo un error, elimina el archivo y devuelve None
+        (el error, si lo hubo, queda en self.error).
+        """
+        with self._lock:
+            if self.error is None and self._pending:
+                self.error = RuntimeError(f"Faltan segmentos por ensamblar: se esperaba el índice {self._next_index}")
+            if self.error is not None or self.segments_written == 0:
+                self._writer.abort()
+                return None
+            return self._writer.close()